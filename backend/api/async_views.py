@@ -0,0 +1,153 @@
+"""
+Async views for the crop, region and site read APIs.
+
+DRF viewsets are synchronous, so these are plain Django async views served
+under /api/async/. Reference data comes from the data repository, loaded
+off the event loop, and the suitability matrix is read with the async ORM;
+CPU-bound scoring is run on a bounded thread pool so it cannot starve
+I/O-bound requests on the event loop. Methods are checked by hand because
+require_GET only supports async views from Django 5.0.
+"""
+
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import (
+    HttpResponse,
+    HttpResponseNotAllowed,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from . import suitability
+from .cache import aget_data_version, make_etag, match_cache
+from .metrics import span
+from .pagination import REGION_FIELDS, astream_records, parse_fields
+from .repository import aget_repository
+from .scoring import get_region_columns, get_rules
+from .search import crop_not_found, resolve_crop
+from .sites import site_store
+from .views import crop_details
+
+SCORING_WORKERS = getattr(settings, 'ASYNC_SCORING_WORKERS', 4)
+
+_scoring_executor = ThreadPoolExecutor(
+    max_workers=SCORING_WORKERS, thread_name_prefix='scoring',
+)
+# Requests waiting for a scoring slot queue on their loop's semaphore instead
+# of piling onto the pool. Semaphores belong to the loop they are first used
+# on, so each running loop gets its own, created on first use.
+_scoring_slots = weakref.WeakKeyDictionary()
+
+
+def _loop_scoring_slots(loop) -> asyncio.Semaphore:
+    slots = _scoring_slots.get(loop)
+    if slots is None:
+        slots = _scoring_slots[loop] = asyncio.Semaphore(SCORING_WORKERS)
+    return slots
+
+
+async def run_scoring(func, *args):
+    """Run a CPU-bound function on the scoring pool, capped at SCORING_WORKERS."""
+    loop = asyncio.get_running_loop()
+    async with _loop_scoring_slots(loop):
+        return await loop.run_in_executor(_scoring_executor, func, *args)
+
+
+def _score_regions(crop, top_n, rules):
+    return get_region_columns().match(crop, top_n, rules)
+
+
+async def match_crop(request):
+    """Async variant of crops/match_crop."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    crop_name = request.GET.get('crop')
+    try:
+        top_n = int(request.GET.get('top_n', 3))
+    except ValueError:
+        top_n = -1
+
+    if not crop_name:
+        return JsonResponse({'error': 'Crop name required'}, status=400)
+    if top_n < 0:
+        return JsonResponse({'error': 'top_n must be a non-negative integer'}, status=400)
+
+    # Keyed by the default rules' digest like crops/match_crop
+    rules = await sync_to_async(get_rules)()
+    key = match_cache.key(
+        ' '.join(crop_name.lower().split()), top_n, 'default', rules.digest,
+        version=await aget_data_version(),
+    )
+    cached = match_cache.get(key)
+    if cached is None:
+        try:
+            with span('lookup'):
+                # The name index is built with the sync ORM on first use
+                crop = await sync_to_async(resolve_crop)(crop_name)
+            if not crop:
+                return JsonResponse(await sync_to_async(crop_not_found)(crop_name), status=404)
+
+            # Precomputed matrix first, then live scoring of all regions
+            with span('score'):
+                matches = []
+                if await sync_to_async(suitability.matrix_current)(rules):
+                    matches = [
+                        suitability.render_top_match(row, rules)
+                        async for row in suitability.top_matches_queryset(crop, top_n)
+                    ]
+                if not matches and top_n > 0:
+                    # Columns come from the snapshot or the data repository and
+                    # are loaded on the scoring pool if this version needs them
+                    matches = await run_scoring(_score_regions, crop, top_n, rules)
+
+            with span('render'):
+                body = JSONRenderer().render({
+                    'crop': crop.crop,
+                    'crop_details': crop_details(crop),
+                    'top_matches': matches
+                })
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+        cached = (make_etag(body), body)
+        match_cache.set(key, cached)
+
+    etag, body = cached
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return HttpResponseNotModified(headers={'ETag': etag})
+    return HttpResponse(body, content_type='application/json', headers={'ETag': etag})
+
+
+async def list_regions(request):
+    """Async variant of regions/list_regions, streamed as a JSON array."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    try:
+        fields = parse_fields(request.GET.get('fields'), REGION_FIELDS)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    regions = (await aget_repository()).regions
+    return StreamingHttpResponse(
+        astream_records(regions, REGION_FIELDS, fields),
+        content_type='application/json',
+    )
+
+
+async def list_sites(request):
+    """Async variant of mars-sites/list_sites."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    try:
+        return HttpResponse(await site_store.alist_body(), content_type='application/json')
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
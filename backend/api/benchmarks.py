@@ -0,0 +1,309 @@
+"""
+Microbenchmarks for the parsers, the matcher and response serialization.
+
+Synthetic regions and crops reproduce the messy formats of mars_regions.csv
+and mars_crops_enhanced.csv (hemisphere suffixes, Unicode minus signs,
+annotated and missing values, free-text pH) so timings reflect real input.
+Results are plain dictionaries that the benchmark command writes as JSON
+and compares against a saved baseline.
+"""
+
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from rest_framework.renderers import JSONRenderer
+
+from .models import MarsCrop, MarsRegion
+from .pagination import REGION_FIELDS, list_records, stream_records
+from .repository import RegionRecord
+from .scoring import RegionColumns
+from .utils import match_crop_to_regions, parse_latitude, parse_ph_range
+from .views import serialize_region
+
+DEFAULT_SIZES = [10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+
+_TERRAINS = [
+    'layered crater floor',
+    'flat plains / smooth plains',
+    'polar soil plain',
+    'smooth sandy/granule & pebble rich surface',
+    'well-drained loam-like regolith',
+    'sandy ripples',
+    'dust mantled highlands',
+    '',
+]
+
+_NOTES = [
+    '“Perchlorates inferred, oxychlorine presence”',
+    '“Dust enriched in Cl/S, nanophase Fe oxides”',
+    '“Shallow ground ice detected”',
+    '“Smooth granule/pebble‐rich surface with few rocks”',
+    '',
+]
+
+_SOIL_TEXTURES = [
+    'Well-drained, fertile loam to sandy loam; avoid heavy clay',
+    'Loose, deep, well-drained sandy loam or loam',
+    'Sandy, free-draining',
+    'Clay tolerant',
+    '',
+]
+
+_MOISTURE_REGIMES = [
+    'Consistent moisture, avoid waterlogging/drought stress',
+    'Even soil moisture, well drained',
+    'Dry between waterings',
+    '',
+]
+
+
+def _coordinate(rng: random.Random, limit: float, positive: str, negative: str) -> str:
+    value = rng.uniform(0, limit)
+    kind = rng.random()
+    if kind < 0.75:
+        return f'{value:.4f}°{rng.choice([positive, negative])}'
+    if kind < 0.85:
+        return f' (≈{value:.0f}°{positive}? position not in these sources)'
+    if kind < 0.92:
+        return f'{rng.uniform(-limit, limit):.3f}'
+    return rng.choice(['', ' (unknown)', ' (not found)'])
+
+
+def _measurement(rng: random.Random, low: float, high: float) -> str:
+    value = rng.uniform(low, high)
+    kind = rng.random()
+    if kind < 0.6:
+        return f'{value:.2f}'.replace('-', '−')
+    if kind < 0.75:
+        return f'{value:.1f} (Rocknest)'
+    if kind < 0.9:
+        return rng.choice([' (not directly measured)', ' (unknown)', ' (not found)'])
+    return ''
+
+
+def _region_ph(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.5:
+        return f'{rng.uniform(5.0, 9.5):.1f}'
+    if kind < 0.7:
+        return '"High (alkaline)"'
+    if kind < 0.85:
+        return f'~{rng.uniform(6.0, 8.5):.1f} (estimated)'
+    return rng.choice(['', ' (unknown)'])
+
+
+def _crop_ph(rng: random.Random) -> str:
+    low = round(rng.uniform(4.5, 7.0), 1)
+    high = round(low + rng.uniform(0.3, 2.0), 1)
+    kind = rng.random()
+    if kind < 0.6:
+        return f'{low}–{high}'
+    if kind < 0.75:
+        return f'{low} - {high} (tolerant)'
+    if kind < 0.9:
+        return f'{low}'
+    return rng.choice(['', 'unknown', 'Neutral'])
+
+
+def synthetic_regions(size: int, seed: int = 0) -> List[MarsRegion]:
+    """Return size unsaved MarsRegion instances with realistic messy values."""
+    rng = random.Random(seed)
+    regions = []
+    for index in range(size):
+        region = MarsRegion(
+            region=f'Synthetic Region {index}',
+            latitude_deg=_coordinate(rng, 90.0, 'N', 'S'),
+            longitude_deg=_coordinate(rng, 360.0, 'E', 'W'),
+            elevation_m=_measurement(rng, -8000.0, 20000.0),
+            perchlorate_wt_pct=_measurement(rng, 0.0, 1.2),
+            water_release_wt_pct=_measurement(rng, 0.0, 3.0),
+            ph=_region_ph(rng),
+            major_minerals='Feldspar 26%, Olivine 13%, Pyroxene 20%, Amorphous 35%',
+            terrain_type=rng.choice(_TERRAINS),
+            notes=rng.choice(_NOTES),
+        )
+        region.populate_numeric_fields()
+        regions.append(region)
+    return regions
+
+
+def synthetic_crops(size: int, seed: int = 0) -> List[MarsCrop]:
+    """Return size unsaved MarsCrop instances with realistic messy values."""
+    rng = random.Random(seed)
+    return [
+        MarsCrop(
+            crop=f'Synthetic Crop {index}',
+            germination_on_mars_simulant='Yes',
+            biomass=rng.choice(['High', 'Moderate', 'High (vs control)']),
+            flowered_seed=rng.choice(['Yes (seed set)', 'No', 'Did not seed in 50 days']),
+            notes='Synthetic benchmark crop',
+            preferred_ph_range=_crop_ph(rng),
+            terrain_soil_texture=rng.choice(_SOIL_TEXTURES),
+            temperature_range_c=rng.choice(['Day: 20–27, Night: 16–18', '15–18', '15–22']),
+            humidity_rh_range=rng.choice(['60–85% RH', 'High humidity', 'Moist environment']),
+            moisture_regime=rng.choice(_MOISTURE_REGIMES),
+        )
+        for index in range(size)
+    ]
+
+
+# Each benchmark takes (regions, crops) and returns the callable to time.
+def _bench_parse_ph_range(regions, crops):
+    values = [region.ph for region in regions]
+
+    def run():
+        for value in values:
+            parse_ph_range(value)
+    return run
+
+
+def _bench_parse_latitude(regions, crops):
+    values = [region.latitude_deg for region in regions]
+
+    def run():
+        for value in values:
+            parse_latitude(value)
+    return run
+
+
+def _bench_match_crop_to_regions(regions, crops):
+    crop = crops[0]
+    return lambda: match_crop_to_regions(crop, regions, 3)
+
+
+def _bench_columns_match(regions, crops):
+    columns = RegionColumns.from_regions(regions)
+    crop = crops[0]
+    return lambda: columns.match(crop, 3)
+
+
+def _bench_serialize_regions(regions, crops):
+    renderer = JSONRenderer()
+    return lambda: renderer.render([serialize_region(region) for region in regions])
+
+
+def _region_records(regions):
+    """The regions as the repository records the list endpoints serialize."""
+    return [RegionRecord._make(getattr(region, field) for field in RegionRecord._fields) for region in regions]
+
+
+def _bench_list_records(regions, crops):
+    records = _region_records(regions)
+    fields = list(REGION_FIELDS)
+    renderer = JSONRenderer()
+    return lambda: renderer.render(list_records(records, REGION_FIELDS, fields))
+
+
+def _bench_stream_records(regions, crops, output='json'):
+    records = _region_records(regions)
+    fields = list(REGION_FIELDS)
+
+    def run():
+        for _ in stream_records(records, REGION_FIELDS, fields, output):
+            pass
+    return run
+
+
+def _bench_stream_ndjson(regions, crops):
+    return _bench_stream_records(regions, crops, 'ndjson')
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    'parse_ph_range': _bench_parse_ph_range,
+    'parse_latitude': _bench_parse_latitude,
+    'match_crop_to_regions': _bench_match_crop_to_regions,
+    'columns_match': _bench_columns_match,
+    'serialize_regions': _bench_serialize_regions,
+    'list_records': _bench_list_records,
+    'stream_records': _bench_stream_records,
+    'stream_ndjson': _bench_stream_ndjson,
+}
+
+
+def time_callable(func: Callable, repeat: int, budget: float) -> List[float]:
+    """
+    Time func up to repeat times, stopping early once budget seconds have
+    been spent. At least one run is always made.
+    """
+    timings = []
+    spent = 0.0
+    while len(timings) < repeat and (not timings or spent < budget):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        timings.append(elapsed)
+        spent += elapsed
+    return timings
+
+
+def run_benchmarks(sizes: List[int], names: Optional[List[str]] = None, repeat: int = 5,
+                   budget: float = 10.0, seed: int = 0, progress: Callable = None) -> Dict:
+    """Run the selected benchmarks at every size and return the JSON report."""
+    names = names or list(BENCHMARKS)
+    results = []
+    for size in sizes:
+        regions = synthetic_regions(size, seed)
+        crops = synthetic_crops(8, seed)
+        for name in names:
+            timings = time_callable(BENCHMARKS[name](regions, crops), repeat, budget)
+            median = statistics.median(timings)
+            result = {
+                'name': name,
+                'size': size,
+                'runs': len(timings),
+                'min_s': min(timings),
+                'median_s': median,
+                'per_item_ns': median / size * 1e9,
+            }
+            results.append(result)
+            if progress:
+                progress(result)
+        del regions
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare_reports(baseline: Dict, current: Dict, threshold: float = 0.1) -> List[Dict]:
+    """
+    Compare the median timings of two reports.
+
+    Each (name, size) present in both gets a row with the current/baseline
+    ratio and a status of 'regression', 'improvement' or 'unchanged'
+    depending on whether it moved by more than threshold.
+    """
+    previous = {(r['name'], r['size']): r for r in baseline.get('results', [])}
+    rows = []
+    for result in current.get('results', []):
+        before = previous.get((result['name'], result['size']))
+        if before is None or before['median_s'] <= 0:
+            continue
+        ratio = result['median_s'] / before['median_s']
+        if ratio > 1 + threshold:
+            state = 'regression'
+        elif ratio < 1 - threshold:
+            state = 'improvement'
+        else:
+            state = 'unchanged'
+        rows.append({
+            'name': result['name'],
+            'size': result['size'],
+            'baseline_s': before['median_s'],
+            'current_s': result['median_s'],
+            'ratio': ratio,
+            'status': state,
+        })
+    return rows
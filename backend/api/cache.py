@@ -0,0 +1,168 @@
+"""
+Data-version counter and response caches for the API.
+
+Every cached value is keyed on the current data version, which load_csv_data
+and model saves bump, so stale entries are never served and simply age out
+of the cache. The version is persisted in the DataVersion table and cached
+for DATA_VERSION['CACHE_SECONDS'], so a bump in one process reaches every
+other process within that delay.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+
+DATA_VERSION_KEY = 'terraengine:data_version'
+
+_config = getattr(settings, 'DATA_VERSION', {})
+CACHE_SECONDS = _config.get('CACHE_SECONDS', 5)
+
+
+def get_data_version() -> int:
+    """Return the current reference data version."""
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        from .models import DataVersion
+
+        version = DataVersion.current()
+        cache.set(DATA_VERSION_KEY, version, CACHE_SECONDS)
+    return version
+
+
+async def aget_data_version() -> int:
+    """Async variant of get_data_version; the database is read off the event loop."""
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        version = await sync_to_async(get_data_version)()
+    return version
+
+
+def bump_data_version() -> int:
+    """Advance the data version, invalidating everything cached against it."""
+    from .models import DataVersion
+
+    version = DataVersion.bump()
+    cache.set(DATA_VERSION_KEY, version, CACHE_SECONDS)
+    return version
+
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class ResponseCache:
+    """
+    Two-tier cache of rendered responses.
+
+    The first tier is an in-process LRUCache. The optional second tier is a
+    Django cache backend (for example a FileBasedCache or a shared cache
+    server) named by its CACHES alias; hits there are promoted into the LRU.
+    """
+
+    def __init__(self, prefix: str, max_entries: int = 256, backend: str = None,
+                 timeout: int = 3600):
+        self.prefix = prefix
+        self.memory = LRUCache(max_entries)
+        self.backend_alias = backend
+        self.timeout = timeout
+        self.backend_hits = 0
+        self.backend_misses = 0
+
+    @property
+    def backend(self):
+        return caches[self.backend_alias] if self.backend_alias else None
+
+    def key(self, *parts, version: int = None) -> str:
+        """Build a cache key for the given or the current data version."""
+        if version is None:
+            version = get_data_version()
+        return ':'.join(str(part) for part in (self.prefix, version) + parts)
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or self.backend is None:
+            return value
+
+        value = self.backend.get(key)
+        if value is None:
+            self.backend_misses += 1
+            return None
+        self.backend_hits += 1
+        self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value, self.timeout)
+
+    def stats(self) -> dict:
+        stats = {'data_version': get_data_version(), 'memory': self.memory.stats()}
+        if self.backend is not None:
+            stats['backend'] = {
+                'alias': self.backend_alias,
+                'hits': self.backend_hits,
+                'misses': self.backend_misses,
+            }
+        return stats
+
+
+def make_etag(body: bytes) -> str:
+    """Return a strong ETag for a response body."""
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+_match_config = getattr(settings, 'MATCH_CACHE', {})
+match_cache = ResponseCache(
+    'match',
+    max_entries=_match_config.get('MAX_ENTRIES', 256),
+    backend=_match_config.get('BACKEND'),
+    timeout=_match_config.get('TIMEOUT', 3600),
+)
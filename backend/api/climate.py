@@ -0,0 +1,310 @@
+"""
+Seasonal surface climate and greenhouse heating over a Mars year.
+
+Every sol of a Mars year (sol 0 at the northern spring equinox, Ls = 0) is
+simulated for each region as NumPy arrays of shape (regions, sols):
+
+    orbit          Kepler's equation gives the solar longitude Ls and the
+                   sun distance of every sol
+    insolation     daily mean top-of-atmosphere flux from the latitude and
+                   solar declination, attenuated along the mean air mass by
+                   an optical depth that thins with elevation
+    temperature    radiative equilibrium of the daily mean and daytime mean
+                   absorbed flux plus the sky's infrared; the night is as
+                   far below the daily mean as the day is above it, and no
+                   surface cools below the CO2 frost point
+
+A greenhouse then holds the crop's day and night minimum temperatures from
+temperature_range_c: heat is lost through the envelope at U_VALUE per
+kelvin, and by day sunlight through the glazing offsets the loss. Heating
+is reported in kWh per m² of growing area. The annual heating of every
+(region, crop) pair is computed once per data version and cached, so
+ranking by it costs a lookup.
+
+This is a first-order model for comparing regions, not a thermal design.
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .cache import get_data_version
+from .repository import get_repository
+from .scoring import get_crop_profile
+
+_config = getattr(settings, 'CLIMATE', {})
+
+# Orbit
+SOLS_PER_YEAR = 669
+SOL_SECONDS = 88775.244
+OBLIQUITY_DEG = 25.19
+ECCENTRICITY = 0.0934
+PERIHELION_LS_DEG = 251.0
+SEMI_MAJOR_AXIS_AU = 1.5237
+SOLAR_CONSTANT = 1361.0  # W/m² at 1 AU
+
+# Atmosphere and surface. OPTICAL_DEPTH is the extinction of the total
+# (direct plus diffuse) flux at the elevation datum, well below the visible
+# dust opacity because dust scatters mostly forward.
+OPTICAL_DEPTH = _config.get('OPTICAL_DEPTH', 0.2)
+SKY_INFRARED = 25.0  # W/m² of downwelling infrared at the datum
+SCALE_HEIGHT_M = 11100.0
+ALBEDO = _config.get('ALBEDO', 0.25)
+EMISSIVITY = 0.95
+CO2_FROST_K = 148.0
+STEFAN_BOLTZMANN = 5.670374e-8
+KELVIN = 273.15
+
+# Greenhouse, per m² of growing area
+U_VALUE = _config.get('U_VALUE', 2.0)  # W/(m²·K) through the envelope
+GLAZING_TRANSMITTANCE = _config.get('GLAZING_TRANSMITTANCE', 0.6)
+
+# Distinct (latitude, elevation) pairs simulated per block.
+BLOCK_LOCATIONS = 1024
+
+
+def orbit(sols: int = SOLS_PER_YEAR):
+    """Solar longitude in radians and sun distance in AU at the middle of every sol."""
+    e = ECCENTRICITY
+    perihelion = math.radians(PERIHELION_LS_DEG)
+    # Mean anomaly at the equinox, from its true anomaly
+    true_anomaly = -perihelion
+    eccentric = 2 * math.atan(math.sqrt((1 - e) / (1 + e)) * math.tan(true_anomaly / 2))
+    start = eccentric - e * math.sin(eccentric)
+
+    mean_anomaly = start + 2 * np.pi * (np.arange(sols) + 0.5) / sols
+    eccentric = mean_anomaly.copy()
+    for _ in range(6):
+        eccentric -= (eccentric - e * np.sin(eccentric) - mean_anomaly) / (1 - e * np.cos(eccentric))
+    true_anomaly = 2 * np.arctan2(np.sqrt(1 + e) * np.sin(eccentric / 2),
+                                  np.sqrt(1 - e) * np.cos(eccentric / 2))
+    ls = np.mod(true_anomaly + perihelion, 2 * np.pi)
+    distance = SEMI_MAJOR_AXIS_AU * (1 - e * np.cos(eccentric))
+    return ls, distance
+
+
+def pressure_ratio(elevation_m):
+    """Surface pressure relative to the datum; NaN elevations count as the datum."""
+    return np.exp(-np.nan_to_num(np.asarray(elevation_m, dtype=float)) / SCALE_HEIGHT_M)
+
+
+def insolation(latitude_deg, elevation_m, ls, distance):
+    """
+    Daily mean surface flux (W/m²) and daylight fraction of every sol.
+
+    latitude_deg and elevation_m broadcast against the per-sol ls and
+    distance arrays.
+    """
+    latitude = np.radians(np.asarray(latitude_deg, dtype=float))
+    declination = np.arcsin(np.sin(np.radians(OBLIQUITY_DEG)) * np.sin(ls))
+    sin_product = np.sin(latitude) * np.sin(declination)
+    cos_product = np.cos(latitude) * np.cos(declination)
+    # Hour angle of sunset; 0 in polar night, pi in polar day
+    sunset = np.arccos(np.clip(-sin_product / np.maximum(cos_product, 1e-12), -1.0, 1.0))
+
+    top = SOLAR_CONSTANT / distance ** 2 / np.pi * (sunset * sin_product + cos_product * np.sin(sunset))
+    top = np.maximum(top, 0.0)
+    # Mean cosine of the solar zenith angle while the sun is up sets the air mass
+    mu = np.where(sunset > 0, top * np.pi / np.maximum(sunset, 1e-12) * distance ** 2 / SOLAR_CONSTANT, 1.0)
+    surface = top * np.exp(-OPTICAL_DEPTH * pressure_ratio(elevation_m) / np.maximum(mu, 0.05))
+    return surface, sunset / np.pi
+
+
+def surface_temperatures(flux, daylight, elevation_m):
+    """Daily mean, day and night surface temperatures in °C."""
+    sky = SKY_INFRARED * pressure_ratio(elevation_m)
+    emitted = EMISSIVITY * STEFAN_BOLTZMANN
+    mean = np.maximum(((1 - ALBEDO) * flux + sky) / emitted, 0.0) ** 0.25
+    day = ((1 - ALBEDO) * flux / np.maximum(daylight, 1e-6) + sky) / emitted
+    day = np.maximum(day ** 0.25, mean)
+    mean = np.maximum(mean, CO2_FROST_K)
+    day = np.maximum(day, CO2_FROST_K)
+    night = np.maximum(2 * mean - day, CO2_FROST_K)
+    return mean - KELVIN, day - KELVIN, night - KELVIN
+
+
+def heating_energy(flux, daylight, day_c, night_c, day_target_c, night_target_c):
+    """
+    Greenhouse heating in kWh/m² of every sol to hold the target day and
+    night temperatures, given the outside conditions of simulate().
+    """
+    day_seconds = daylight * SOL_SECONDS
+    daytime_flux = flux / np.maximum(daylight, 1e-6)
+    day_loss = U_VALUE * (day_target_c - day_c) - GLAZING_TRANSMITTANCE * daytime_flux
+    night_loss = U_VALUE * (night_target_c - night_c)
+    joules = (np.maximum(day_loss, 0.0) * day_seconds
+              + np.maximum(night_loss, 0.0) * (SOL_SECONDS - day_seconds))
+    return joules / 3.6e6
+
+
+def crop_targets(crop):
+    """(day, night) minimum temperatures in °C a crop must be held at, or None."""
+    profile = get_crop_profile(crop)
+    if not profile.has_temperature_range:
+        return None
+    day = profile.day_temp_min if profile.day_temp_min is not None else profile.temp_min
+    night = profile.night_temp_min if profile.night_temp_min is not None else profile.temp_min
+    return day, night
+
+
+def simulate(latitude_deg, elevation_m, sols: int = SOLS_PER_YEAR) -> Dict[str, np.ndarray]:
+    """Per-sol climate arrays of shape (locations, sols) for 1-D location inputs."""
+    ls, distance = orbit(sols)
+    latitude = np.asarray(latitude_deg, dtype=float)[:, None]
+    elevation = np.asarray(elevation_m, dtype=float)[:, None]
+    flux, daylight = insolation(latitude, elevation, ls, distance)
+    mean, day, night = surface_temperatures(flux, daylight, elevation)
+    return {
+        'ls': np.degrees(ls),
+        'insolation': flux,
+        'daylight': daylight,
+        'mean': mean,
+        'day': day,
+        'night': night,
+    }
+
+
+class GreenhouseBudget:
+    """Annual climate of every region and the heating each crop needs there."""
+
+    def __init__(self, regions, crops):
+        self.region_ids = np.array([region.id for region in regions], dtype=np.int64)
+        self.crop_columns = {crop.id: column for column, crop in enumerate(crops)}
+        latitude = np.array([np.nan if r.latitude_value is None else r.latitude_value for r in regions])
+        elevation = np.array([np.nan if r.elevation_value is None else r.elevation_value for r in regions])
+        targets = [crop_targets(crop) for crop in crops]
+
+        # Regions share few distinct locations; simulate each location once
+        known = ~np.isnan(latitude)
+        locations, inverse = np.unique(
+            np.stack([latitude[known], np.nan_to_num(elevation[known])], axis=1),
+            axis=0, return_inverse=True,
+        )
+        stats = np.full((len(locations), 3), np.nan)
+        heating = np.full((len(locations), len(crops)), np.nan)
+        for start in range(0, len(locations), BLOCK_LOCATIONS):
+            block = slice(start, start + BLOCK_LOCATIONS)
+            climate = simulate(locations[block, 0], locations[block, 1])
+            stats[block] = np.stack([
+                climate['mean'].mean(axis=1), climate['night'].min(axis=1), climate['day'].max(axis=1),
+            ], axis=1)
+            for column, target in enumerate(targets):
+                if target is not None:
+                    heating[block, column] = heating_energy(
+                        climate['insolation'], climate['daylight'], climate['day'], climate['night'], *target,
+                    ).sum(axis=1)
+
+        self.stats = np.full((len(regions), 3), np.nan)
+        self.stats[known] = stats[inverse.ravel()]
+        self.heating = np.full((len(regions), len(crops)), np.nan)
+        self.heating[known] = heating[inverse.ravel()]
+        self.order = np.argsort(self.region_ids, kind='stable')
+
+    def positions(self, region_ids) -> np.ndarray:
+        """Rows of the given region ids; unknown ids get -1."""
+        region_ids = np.asarray(region_ids, dtype=np.int64)
+        if not len(self.order):
+            return np.full(len(region_ids), -1, dtype=np.int64)
+        sorted_ids = self.region_ids[self.order]
+        rows = self.order[np.minimum(np.searchsorted(sorted_ids, region_ids), len(sorted_ids) - 1)]
+        return np.where(self.region_ids[rows] == region_ids, rows, -1)
+
+    def annual_heating(self, crop, region_ids) -> np.ndarray:
+        """Annual heating in kWh/m² of a crop in each region, NaN where unknown."""
+        column = self.crop_columns.get(getattr(crop, 'id', None))
+        rows = self.positions(region_ids)
+        if column is None:
+            return np.full(len(rows), np.nan)
+        return np.where(rows >= 0, self.heating[rows, column], np.nan)
+
+    def summary(self, crop, region_id) -> Dict:
+        """Annual climate and heating of one region for a crop."""
+        row = int(self.positions([region_id])[0])
+        if row < 0:
+            return {}
+        heating = self.annual_heating(crop, [region_id])[0]
+        mean, coldest, warmest = self.stats[row]
+        return {
+            'heating_kwh_m2': _rounded(heating, 1),
+            'mean_temperature_c': _rounded(mean, 1),
+            'min_temperature_c': _rounded(coldest, 1),
+            'max_temperature_c': _rounded(warmest, 1),
+        }
+
+
+def _rounded(value, digits) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def region_year(region, crop=None) -> Optional[Dict]:
+    """Sol by sol climate of one region, with the heating a crop needs there."""
+    if region.latitude_value is None:
+        return None
+    elevation = np.nan if region.elevation_value is None else region.elevation_value
+    climate = simulate([region.latitude_value], [elevation])
+    series = {
+        'ls_deg': np.round(climate['ls'], 2).tolist(),
+        'insolation_w_m2': np.round(climate['insolation'][0], 1).tolist(),
+        'daylight_fraction': np.round(climate['daylight'][0], 3).tolist(),
+        'day_temperature_c': np.round(climate['day'][0], 1).tolist(),
+        'night_temperature_c': np.round(climate['night'][0], 1).tolist(),
+    }
+    target = crop_targets(crop) if crop is not None else None
+    if target is not None:
+        heating = heating_energy(climate['insolation'][0], climate['daylight'][0],
+                                 climate['day'][0], climate['night'][0], *target)
+        series['heating_kwh_m2'] = np.round(heating, 3).tolist()
+    return {
+        'sols': SOLS_PER_YEAR,
+        'annual': {
+            'heating_kwh_m2': round(float(heating.sum()), 1) if target is not None else None,
+            'mean_temperature_c': round(float(climate['mean'][0].mean()), 1),
+            'min_temperature_c': round(float(climate['night'][0].min()), 1),
+            'max_temperature_c': round(float(climate['day'][0].max()), 1),
+        },
+        'series': series,
+    }
+
+
+def energy_matches(columns, crop, top_n: int, rules) -> List[Dict]:
+    """
+    Top matches ranked by score, equal scores by the least annual heating,
+    each with its greenhouse summary.
+    """
+    if top_n <= 0:
+        return []
+    budget = get_greenhouse_budget()
+    masks = rules.evaluate(columns, get_crop_profile(crop))
+    scores = rules.score(masks, len(columns))
+    heating = budget.annual_heating(crop, columns.ids)
+    order = np.lexsort((np.arange(len(scores)), np.where(np.isnan(heating), np.inf, heating), -scores))
+    matches = []
+    for index in order[:top_n].tolist():
+        match = columns.result(masks, scores, index, rules)
+        match['greenhouse'] = budget.summary(crop, int(columns.ids[index]))
+        matches.append(match)
+    return matches
+
+
+_budget = None
+_budget_key = None
+_budget_lock = threading.Lock()
+
+
+def get_greenhouse_budget() -> GreenhouseBudget:
+    """Return the heating of every (region, crop) pair, recomputed when the data version changes."""
+    global _budget, _budget_key
+
+    key = get_data_version()
+    if _budget is not None and _budget_key == key:
+        return _budget
+
+    with _budget_lock:
+        if _budget is None or _budget_key != key:
+            repository = get_repository()
+            _budget = GreenhouseBudget(repository.regions.records, repository.crops.records)
+            _budget_key = key
+    return _budget
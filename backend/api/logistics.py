@@ -0,0 +1,245 @@
+"""
+Traverse cost model between landing zones and regions.
+
+Origins are the exploration sites plus any depots configured in
+settings.LOGISTICS. The great-circle distance from every origin to every
+region with coordinates is computed in one vectorized pass and held as a
+float32 matrix, rebuilt when the data version changes. Traverse cost is
+expressed in equivalent flat kilometres: the distance plus a penalty per
+kilometre climbed and a smaller one per kilometre descended, so a route
+into a deep basin costs more to leave than to enter.
+
+Region elevations come from the parsed elevation column, falling back to
+the ingested elevation raster. Origins take the raster elevation, or that
+of the nearest region with a known elevation within ELEVATION_RADIUS_KM.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .cache import get_data_version
+from .raster import RasterStack, get_raster_stack
+from .repository import get_repository
+from .snapshot import get_snapshot
+from .spatial import MARS_RADIUS_KM, normalize_longitude, unit_vectors
+
+_config = getattr(settings, 'LOGISTICS', {})
+
+# Equivalent flat kilometres per kilometre of ascent and of descent.
+CLIMB_PENALTY = _config.get('CLIMB_PENALTY', 10.0)
+DESCENT_PENALTY = _config.get('DESCENT_PENALTY', 2.0)
+# How far an origin may borrow the elevation of a region.
+ELEVATION_RADIUS_KM = _config.get('ELEVATION_RADIUS_KM', 100.0)
+# Origins processed per block while building the matrix.
+BLOCK_ORIGINS = 256
+
+
+def distance_matrix(origin_vectors: np.ndarray, target_vectors: np.ndarray,
+                    block: int = BLOCK_ORIGINS) -> np.ndarray:
+    """
+    Great-circle distances in km between two sets of unit vectors.
+
+    The chord length follows from the dot product, |a - b|² = 2 - 2 a·b, so
+    each block of origins is a single matrix product.
+    """
+    distances = np.empty((len(origin_vectors), len(target_vectors)), dtype=np.float32)
+    for start in range(0, len(origin_vectors), block):
+        dots = origin_vectors[start:start + block] @ target_vectors.T
+        chord = np.sqrt(np.clip(2.0 - 2.0 * dots, 0.0, 4.0))
+        distances[start:start + block] = 2.0 * MARS_RADIUS_KM * np.arcsin(chord / 2.0)
+    return distances
+
+
+def traverse_cost(distance_km, origin_elevation, target_elevation) -> np.ndarray:
+    """
+    Cost in equivalent flat km of travelling distance_km between two
+    elevations in metres. Unknown elevations add no climb penalty.
+    """
+    rise = np.nan_to_num(np.asarray(target_elevation, dtype=float) - origin_elevation) / 1000.0
+    return (distance_km + CLIMB_PENALTY * np.maximum(rise, 0.0)
+            + DESCENT_PENALTY * np.maximum(-rise, 0.0))
+
+
+def sample_elevation(lat, lon) -> np.ndarray:
+    """Elevation in metres from the elevation raster, NaN where unavailable."""
+    lat = np.asarray(lat, dtype=float)
+    stack = get_raster_stack()
+    if stack is None or 'elevation' not in stack.layers or lat.size == 0:
+        return np.full(lat.shape, np.nan)
+    values, _ = RasterStack({'elevation': stack.layers['elevation']}).sample(lat, lon)
+    return values['elevation'].astype(float)
+
+
+class LogisticsMatrix:
+    """Distances from every origin to every region, with their elevations."""
+
+    def __init__(self, origins: List[Dict], region_ids, region_lat, region_lon, region_elevation):
+        self.origins = origins
+        self.origin_keys = {str(origin['id']): index for index, origin in enumerate(origins)}
+        self.region_ids = np.asarray(region_ids, dtype=np.int64)
+        self.region_vectors = unit_vectors(region_lat, normalize_longitude(region_lon))
+
+        elevation = np.asarray(region_elevation, dtype=float)
+        missing = np.isnan(elevation)
+        if missing.any():
+            elevation[missing] = sample_elevation(
+                np.asarray(region_lat, dtype=float)[missing],
+                np.asarray(region_lon, dtype=float)[missing],
+            )
+        self.region_elevation = elevation
+
+        origin_lat = np.array([origin['lat'] for origin in origins], dtype=float)
+        origin_lon = np.array([origin['lon'] for origin in origins], dtype=float)
+        self.origin_vectors = unit_vectors(origin_lat, normalize_longitude(origin_lon))
+        self.distance_km = distance_matrix(self.origin_vectors, self.region_vectors)
+        self.origin_elevation = self._origin_elevations(origin_lat, origin_lon)
+
+    def _origin_elevations(self, lat, lon) -> np.ndarray:
+        elevation = np.array([
+            np.nan if origin.get('elevation_m') is None else origin['elevation_m']
+            for origin in self.origins
+        ], dtype=float)
+        missing = np.isnan(elevation)
+        elevation[missing] = sample_elevation(lat[missing], lon[missing])
+
+        missing = np.flatnonzero(np.isnan(elevation))
+        elevation[missing] = self._nearest_elevation(self.distance_km[missing])
+        return elevation
+
+    def _nearest_elevation(self, distances: np.ndarray) -> np.ndarray:
+        """Elevation of the nearest region that has one, for each row of distances."""
+        result = np.full(len(distances), np.nan)
+        known = ~np.isnan(self.region_elevation)
+        if len(distances) and known.any():
+            distances = np.where(known, distances, np.inf)
+            nearest = np.argmin(distances, axis=1)
+            close = distances[np.arange(len(distances)), nearest] <= ELEVATION_RADIUS_KM
+            result[close] = self.region_elevation[nearest[close]]
+        return result
+
+    def __len__(self):
+        return len(self.origins)
+
+    def origin_index(self, key: str) -> Optional[int]:
+        return self.origin_keys.get(str(key))
+
+    def origin(self, index: int) -> Dict:
+        """Describe an origin, with the elevation the cost model uses."""
+        elevation = self.origin_elevation[index]
+        return dict(self.origins[index], elevation_m=None if np.isnan(elevation) else float(elevation))
+
+    def costs(self, origin: int) -> np.ndarray:
+        """Traverse cost from one origin to every region."""
+        return traverse_cost(
+            self.distance_km[origin], self.origin_elevation[origin], self.region_elevation,
+        )
+
+    def cost_matrix(self) -> np.ndarray:
+        """Traverse costs from every origin to every region as float32."""
+        return traverse_cost(
+            self.distance_km, self.origin_elevation[:, None], self.region_elevation[None, :],
+        ).astype(np.float32)
+
+    def ranked(self, costs: np.ndarray, distances: np.ndarray, limit: int = 10,
+               max_km: float = None) -> np.ndarray:
+        """Region positions in increasing cost, ties broken by position."""
+        if limit <= 0:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.arange(len(costs))
+        if max_km is not None:
+            candidates = candidates[distances <= max_km]
+        if limit < len(candidates):
+            # Partition first, keeping every region tied with the cutoff so
+            # the sorted cut is the same as a full stable sort
+            cutoff = np.partition(costs[candidates], limit - 1)[limit - 1]
+            candidates = candidates[costs[candidates] <= cutoff]
+        order = np.lexsort((candidates, costs[candidates]))
+        return candidates[order][:limit]
+
+    def route(self, origin: int, limit: int = 10, max_km: float = None) -> List[Dict]:
+        """Cheapest regions to reach from an origin."""
+        costs = self.costs(origin)
+        return self._results(costs, self.distance_km[origin], self.origin_elevation[origin],
+                             limit, max_km)
+
+    def route_from_point(self, lat: float, lon: float, elevation_m: float = None,
+                         limit: int = 10, max_km: float = None) -> List[Dict]:
+        """Like route, for an arbitrary location instead of a known origin."""
+        distances = distance_matrix(
+            unit_vectors(lat, float(normalize_longitude(lon)))[None, :], self.region_vectors,
+        )[0]
+        if elevation_m is None:
+            elevation_m = float(sample_elevation([lat], [lon])[0])
+            if np.isnan(elevation_m):
+                elevation_m = float(self._nearest_elevation(distances[None, :])[0])
+        costs = traverse_cost(distances, elevation_m, self.region_elevation)
+        return self._results(costs, distances, elevation_m, limit, max_km)
+
+    def _results(self, costs, distances, origin_elevation, limit, max_km) -> List[Dict]:
+        results = []
+        for position in self.ranked(costs, distances, limit, max_km).tolist():
+            elevation = self.region_elevation[position]
+            change = elevation - origin_elevation
+            results.append({
+                'region_id': int(self.region_ids[position]),
+                'distance_km': round(float(distances[position]), 3),
+                'elevation_change_m': None if np.isnan(change) else round(float(change), 1),
+                'cost_km': round(float(costs[position]), 3),
+            })
+        return results
+
+
+def load_origins() -> List[Dict]:
+    """Exploration sites followed by the depots configured in settings.LOGISTICS."""
+    origins = [
+        {'id': site.id, 'name': site.name, 'kind': 'site', 'lat': site.lat, 'lon': site.lon,
+         'elevation_m': None}
+        for site in get_repository().sites
+    ]
+    for depot in _config.get('DEPOTS', []):
+        origins.append({
+            'id': depot['id'],
+            'name': depot.get('name', depot['id']),
+            'kind': 'depot',
+            'lat': float(depot['lat']),
+            'lon': float(depot['lon']),
+            'elevation_m': depot.get('elevation_m'),
+        })
+    return origins
+
+
+_matrix = None
+_matrix_key = None
+_matrix_lock = threading.Lock()
+
+
+def get_logistics_matrix() -> LogisticsMatrix:
+    """Return the origin-to-region matrix, rebuilt when the data version changes."""
+    global _matrix, _matrix_key
+
+    key = get_data_version()
+    if _matrix is not None and _matrix_key == key:
+        return _matrix
+
+    with _matrix_lock:
+        if _matrix is None or _matrix_key != key:
+            snapshot = get_snapshot()
+            if snapshot is not None:
+                ids, lat, lon, elevation = snapshot.coordinates()
+                order = np.argsort(ids, kind='stable')
+                order = order[~(np.isnan(lat[order]) | np.isnan(lon[order]))]
+                ids, lat, lon, elevation = ids[order], lat[order], lon[order], elevation[order]
+            else:
+                rows = sorted(
+                    (region.id, region.latitude_value, region.longitude_value, region.elevation_value)
+                    for region in get_repository().regions
+                    if region.latitude_value is not None and region.longitude_value is not None
+                )
+                ids, lat, lon, elevation = zip(*rows) if rows else ((), (), (), ())
+                elevation = [np.nan if value is None else value for value in elevation]
+            _matrix = LogisticsMatrix(load_origins(), ids, lat, lon, elevation)
+            _matrix_key = key
+    return _matrix
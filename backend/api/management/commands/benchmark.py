@@ -0,0 +1,102 @@
+from django.core.management.base import BaseCommand, CommandError
+import json
+from api.benchmarks import BENCHMARKS, DEFAULT_SIZES, compare_reports, run_benchmarks
+
+
+def parse_list(value, cast=str):
+    return [cast(item.strip()) for item in value.split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the parsers, matcher and serializers on synthetic regions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default=','.join(str(size) for size in DEFAULT_SIZES),
+            help='Comma-separated region counts (default: 100 up to 1000000)',
+        )
+        parser.add_argument(
+            '--benchmarks',
+            default='',
+            help=f'Comma-separated subset of: {", ".join(BENCHMARKS)}',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Maximum timed runs per benchmark (default: 5)',
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=10.0,
+            help='Stop repeating a benchmark after this many seconds (default: 10)',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic data')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline JSON file to compare the results against')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.10,
+            help='Slowdown ratio flagged as a regression in --compare mode (default: 0.10)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = parse_list(options['sizes'], int)
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+        names = parse_list(options['benchmarks'])
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f'Unknown benchmarks: {", ".join(unknown)}')
+        if not sizes or min(sizes) < 1 or options['repeat'] < 1:
+            raise CommandError('--sizes and --repeat must be positive')
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], 'r', encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        report = run_benchmarks(
+            sizes, names, repeat=options['repeat'], budget=options['budget'],
+            seed=options['seed'], progress=self.report_result,
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline is not None:
+            self.compare(baseline, report, options['threshold'])
+        self.stdout.write(self.style.SUCCESS('Benchmarks completed!'))
+
+    def report_result(self, result):
+        self.stdout.write(
+            f'  {result["name"]:<24} {result["size"]:>9} regions  '
+            f'{result["median_s"] * 1000:10.2f} ms  {result["per_item_ns"]:10.0f} ns/region'
+        )
+
+    def compare(self, baseline, report, threshold):
+        rows = compare_reports(baseline, report, threshold)
+        self.stdout.write(f'Comparison against baseline (threshold {threshold:.0%}):')
+        for row in rows:
+            line = (
+                f'  {row["name"]:<24} {row["size"]:>9}  '
+                f'{row["baseline_s"] * 1000:10.2f} ms -> {row["current_s"] * 1000:10.2f} ms  '
+                f'x{row["ratio"]:.2f} {row["status"]}'
+            )
+            if row['status'] == 'regression':
+                line = self.style.ERROR(line)
+            elif row['status'] == 'improvement':
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
+
+        regressions = [row for row in rows if row['status'] == 'regression']
+        if regressions:
+            raise CommandError(
+                f'{len(regressions)} benchmark(s) regressed by more than {threshold:.0%}'
+            )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+import os
+import time
+from api.snapshot import SNAPSHOT_DIR, Snapshot, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Write the memory-mapped snapshot of regions and crops read by workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=SNAPSHOT_DIR,
+            help='Snapshot directory (default: settings.SNAPSHOT["DIR"])',
+        )
+
+    def handle(self, *args, **options):
+        directory = str(options['output'])
+        self.stdout.write(f'Writing snapshot to {directory}...')
+        started = time.perf_counter()
+        manifest = write_snapshot(directory)
+        elapsed = time.perf_counter() - started
+
+        size = sum(
+            os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+        )
+        self.stdout.write(
+            f'{manifest["regions"]} regions and {manifest["crops"]} crops '
+            f'({size / 1e6:.1f} MB) in {elapsed:.2f}s'
+        )
+
+        started = time.perf_counter()
+        Snapshot.open(directory).region_columns()
+        self.stdout.write(f'Snapshot maps in {(time.perf_counter() - started) * 1000:.1f} ms')
+        self.stdout.write(self.style.SUCCESS('Snapshot built successfully'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+import time
+from api import suitability
+from api.cache import bump_data_version
+
+
+class Command(BaseCommand):
+    help = 'Precompute the crop x region suitability matrix'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of matrix rows written per bulk insert (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Building suitability matrix...')
+        started = time.perf_counter()
+        written = suitability.rebuild_matrix(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        # Other processes re-read the matrix rules digest on the next version
+        bump_data_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Suitability matrix built: {written} crop/region pairs in {elapsed:.2f}s'
+        ))
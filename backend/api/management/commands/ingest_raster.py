@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+import time
+import numpy as np
+from api.cache import bump_data_version
+from api.raster import DEFAULT_TILE_SIZE, LAYER_UNITS, RASTER_ROOT, RasterLayer
+
+
+def open_source(path, dtype, width, height):
+    """Memory-map a .npy file or a headerless raw grid such as a MOLA .img."""
+    if path.endswith('.npy'):
+        source = np.load(path, mmap_mode='r')
+        if source.ndim != 2:
+            raise CommandError(f'{path} must hold a 2-D array, got shape {source.shape}')
+        return source
+    if not width or not height:
+        raise CommandError('--width and --height are required for raw raster files')
+    expected = width * height * np.dtype(dtype).itemsize
+    if os.path.getsize(path) != expected:
+        raise CommandError(
+            f'{path} is {os.path.getsize(path)} bytes, expected {expected} '
+            f'for {height}x{width} {dtype}'
+        )
+    return np.memmap(path, dtype=np.dtype(dtype), mode='r', shape=(height, width))
+
+
+class Command(BaseCommand):
+    help = 'Ingest a gridded layer into a tiled memory-mapped raster'
+
+    def add_arguments(self, parser):
+        parser.add_argument('layer', choices=list(LAYER_UNITS), help='Layer to (re)build')
+        parser.add_argument('file', help='Source grid: a .npy file or a raw binary grid')
+        parser.add_argument(
+            '--dtype',
+            default='<f4',
+            help='NumPy dtype of raw files, e.g. ">i2" for MOLA MEGDR (default: <f4)',
+        )
+        parser.add_argument('--width', type=int, help='Columns of a raw file')
+        parser.add_argument('--height', type=int, help='Rows of a raw file')
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply values by this')
+        parser.add_argument('--offset', type=float, default=0.0, help='Then add this')
+        parser.add_argument('--nodata', type=float, help='Source value marking missing pixels')
+        parser.add_argument('--north', type=float, default=90.0, help='Latitude of the top edge')
+        parser.add_argument('--south', type=float, default=-90.0, help='Latitude of the bottom edge')
+        parser.add_argument('--west', type=float, default=-180.0, help='Longitude of the left edge')
+        parser.add_argument('--east', type=float, default=180.0, help='Longitude of the right edge')
+        parser.add_argument(
+            '--tile-size',
+            type=int,
+            default=DEFAULT_TILE_SIZE,
+            help=f'Tile edge in pixels (default: {DEFAULT_TILE_SIZE})',
+        )
+        parser.add_argument('--root', default=RASTER_ROOT, help='Raster directory')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        if options['tile_size'] < 1:
+            raise CommandError('--tile-size must be at least 1')
+        if options['north'] <= options['south'] or options['east'] <= options['west']:
+            raise CommandError('The grid extent must have north > south and east > west')
+
+        source = open_source(path, options['dtype'], options['width'], options['height'])
+        height, width = source.shape
+        self.stdout.write(f'Ingesting {options["layer"]} from {path} ({height}x{width})...')
+        started = time.perf_counter()
+
+        layer = RasterLayer.create(
+            options['layer'], height, width, tile_size=options['tile_size'],
+            north=options['north'], south=options['south'],
+            west=options['west'], east=options['east'], root=options['root'],
+        )
+        # Copy one band of tile rows at a time so the source is never fully loaded
+        for row0 in range(0, height, layer.tile_size):
+            band = np.asarray(source[row0:row0 + layer.tile_size], dtype=np.float32)
+            if options['nodata'] is not None:
+                band = np.where(band == options['nodata'], np.nan, band)
+            layer.write_window(row0, 0, band * options['scale'] + options['offset'])
+        layer.publish()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{height * width} pixels in {elapsed:.2f}s written to {layer.path}'
+        )
+
+        # Rendered suitability tiles depend on the layers
+        version = bump_data_version()
+        self.stdout.write(f'Data version is now {version}')
+        self.stdout.write(self.style.SUCCESS(f'{options["layer"]} ingested successfully'))
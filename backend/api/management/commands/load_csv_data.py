@@ -1,58 +1,303 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 import csv
+import hashlib
 import os
+import time
 from django.conf import settings
-from api.models import MarsRegion, MarsCrop
+from django.db import transaction
+from django.db.models import Max
+from api import snapshot, suitability
+from api.cache import bump_data_version, get_data_version
+from api.models import IngestedFile, MarsRegion, MarsCrop, NUMERIC_REGION_FIELDS
+from api.utils import batched
+
+
+# CSV column for each MarsRegion field
+REGION_COLUMNS = {
+    'latitude_deg': 'Latitude_deg',
+    'longitude_deg': 'Longitude_deg',
+    'elevation_m': 'Elevation_m',
+    'perchlorate_wt_pct': 'Perchlorate_wt_pct',
+    'water_release_wt_pct': 'Water_release_wt_pct',
+    'ph': 'pH',
+    'major_minerals': 'Major_minerals',
+    'terrain_type': 'Terrain_type',
+    'notes': 'Notes',
+}
+
+# CSV column for each MarsCrop field
+CROP_COLUMNS = {
+    'germination_on_mars_simulant': 'Germination_on_MarsSimulant',
+    'biomass': 'Biomass',
+    'flowered_seed': 'Flowered/Seed',
+    'notes': 'Notes',
+    'preferred_ph_range': 'Preferred_pH_range',
+    'terrain_soil_texture': 'Terrain_Soil_texture',
+    'temperature_range_c': 'Temperature_range_C',
+    'humidity_rh_range': 'Humidity_RH_range',
+    'moisture_regime': 'Moisture_regime',
+}
+
+
+def read_csv_rows(path):
+    """Yield CSV rows one at a time with whitespace stripped from the header."""
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.DictReader(file)
+        if reader.fieldnames is None:
+            return
+        reader.fieldnames = [name.strip() for name in reader.fieldnames]
+        yield from reader
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def row_digest(key, values):
+    """Digest of a row's key and column values, stored as the row_hash."""
+    text = '\x1f'.join([key, *values])
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def raw_delete(model, ids):
+    """
+    Delete rows and the rows referencing them without signals; returns the
+    number of model rows deleted. The caller bumps the data version once.
+    """
+    for relation in model._meta.related_objects:
+        related = relation.related_model.objects.filter(**{f'{relation.field.name}__in': ids})
+        related._raw_delete(related.db)
+    rows = model.objects.filter(id__in=ids)
+    return rows._raw_delete(rows.db)
+
+
+def stamped_ids(model, lookup, generation, batch_size):
+    """
+    Yield the ids of the rows matching lookup=generation (e.g.
+    write_generation=3) in id order, batch_size at a time.
+    """
+    last_id = 0
+    while True:
+        ids = list(
+            model.objects.filter(**{lookup: generation, 'id__gt': last_id})
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def build_instances(rows, model, key_field, key_column, columns, stats):
+    """Validate CSV rows and turn them into unsaved model instances."""
+    for row in rows:
+        key = (row.get(key_column) or '').strip()
+        if not key:
+            stats['skipped'] += 1
+            continue
+        values = {field: row.get(column) or '' for field, column in columns.items()}
+        instance = model(**{key_field: key}, **values)
+        instance.row_hash = row_digest(key, values.values())
+        yield instance
 
 
 class Command(BaseCommand):
     help = 'Load Mars regions and crops data from CSV files'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--regions-file',
+            default=os.path.join(settings.BASE_DIR, 'data', 'mars_regions.csv'),
+            help='CSV file with Mars regions',
+        )
+        parser.add_argument(
+            '--crops-file',
+            default=os.path.join(settings.BASE_DIR, 'data', 'mars_crops_enhanced.csv'),
+            help='CSV file with Mars crops',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows written per bulk upsert (default: 1000)',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete rows whose key no longer appears in the CSV file',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rewrite every row even if the file and row digests are unchanged',
+        )
+        parser.add_argument(
+            '--progress-every',
+            type=int,
+            default=100000,
+            help='Report throughput after this many rows (default: 100000)',
+        )
+
     def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        changes = {}
+
         # Load Mars regions
-        regions_file = os.path.join(settings.BASE_DIR, 'data', 'mars_regions.csv')
+        regions_file = options['regions_file']
         if os.path.exists(regions_file):
             self.stdout.write('Loading Mars regions...')
-            with open(regions_file, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    MarsRegion.objects.get_or_create(
-                        region=row['Region'],
-                        defaults={
-                            'latitude_deg': row.get('Latitude_deg', ''),
-                            'longitude_deg': row.get('Longitude_deg', ''),
-                            'elevation_m': row.get('Elevation_m', ''),
-                            'perchlorate_wt_pct': row.get('Perchlorate_wt_pct', ''),
-                            'water_release_wt_pct': row.get('Water_release_wt_pct', ''),
-                            'ph': row.get('pH', ''),
-                            'major_minerals': row.get('Major_minerals', ''),
-                            'terrain_type': row.get('Terrain_type', ''),
-                            'notes': row.get('Notes', ''),
-                        }
-                    )
+            changes[MarsRegion] = self.load(
+                regions_file, MarsRegion, 'region', 'Region', REGION_COLUMNS,
+                NUMERIC_REGION_FIELDS, options,
+            )
             self.stdout.write(self.style.SUCCESS('Mars regions loaded successfully'))
 
         # Load Mars crops
-        crops_file = os.path.join(settings.BASE_DIR, 'data', 'mars_crops_enhanced.csv')
+        crops_file = options['crops_file']
         if os.path.exists(crops_file):
             self.stdout.write('Loading Mars crops...')
-            with open(crops_file, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    MarsCrop.objects.get_or_create(
-                        crop=row['Crop'],
-                        defaults={
-                            'germination_on_mars_simulant': row.get('Germination_on_MarsSimulant', ''),
-                            'biomass': row.get('Biomass', ''),
-                            'flowered_seed': row.get('Flowered/Seed', ''),
-                            'notes': row.get('Notes', ''),
-                            'preferred_ph_range': row.get('Preferred_pH_range', ''),
-                            'terrain_soil_texture': row.get('Terrain_Soil_texture', ''),
-                            'temperature_range_c': row.get('Temperature_range_C', ''),
-                            'humidity_rh_range': row.get('Humidity_RH_range', ''),
-                            'moisture_regime': row.get('Moisture_regime', ''),
-                        }
-                    )
+            changes[MarsCrop] = self.load(
+                crops_file, MarsCrop, 'crop', 'Crop', CROP_COLUMNS, [], options,
+            )
             self.stdout.write(self.style.SUCCESS('Mars crops loaded successfully'))
 
+        regions, crops = changes.get(MarsRegion), changes.get(MarsCrop)
+        if not any(stats['changed'] for stats in changes.values()):
+            self.stdout.write(f'No changes; data version stays at {get_data_version()}')
+            self.stdout.write(self.style.SUCCESS('Data loading completed!'))
+            return
+
+        # Bulk upserts bypass model signals, so refresh the matrix here:
+        # only the changed region columns unless a crop or the rules changed
+        if suitability.matrix_exists():
+            self.stdout.write('Rebuilding suitability matrix...')
+            if crops and crops['changed'] or not suitability.matrix_current():
+                suitability.rebuild_matrix(batch_size=options['batch_size'])
+            elif regions and (regions['new'] or regions['updated']):
+                for region_ids in stamped_ids(MarsRegion, 'write_generation', regions['generation'],
+                                              options['batch_size']):
+                    suitability.rebuild_regions(region_ids, batch_size=options['batch_size'])
+
+        # Workers fall back to the database until the snapshot matches again
+        if snapshot.snapshot_exists():
+            self.stdout.write('Rewriting data snapshot...')
+            snapshot.write_snapshot()
+
+        version = bump_data_version()
+        self.stdout.write(f'Data version is now {version}')
         self.stdout.write(self.style.SUCCESS('Data loading completed!'))
+
+    def load(self, path, model, key_field, key_column, columns, derived_fields, options):
+        """
+        Stream one CSV file into the database, writing only new and changed rows.
+
+        A file whose digest matches the last load is skipped unread. Otherwise
+        each row's digest is compared with the row_hash stored for its key and
+        only differing rows are upserted. Every row found is stamped with this
+        load's generation in load_generation, and every row written also in
+        write_generation, so pruning and matrix updates select rows in SQL and
+        memory use does not grow with the file. The stamp also marks keys an
+        earlier batch already loaded: the first occurrence of a key in the
+        file wins and later ones are skipped as duplicates. Returns the load
+        statistics.
+        """
+        batch_size = options['batch_size']
+        progress_every = options['progress_every']
+        table = model._meta.db_table
+        stats = {'read': 0, 'new': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0,
+                 'duplicates': 0, 'skipped': 0, 'changed': False, 'generation': None}
+
+        digest = file_digest(path)
+        ingested = IngestedFile.objects.filter(table=table).first()
+        if ingested and ingested.sha256 == digest and not options['force']:
+            self.stdout.write(f'  {path} is unchanged since the last load, skipping')
+            return stats
+
+        # Above any generation stamped so far, including by interrupted loads
+        generation = (model.objects.aggregate(last=Max('load_generation'))['last'] or 0) + 1
+        stats['generation'] = generation
+        update_fields = (list(columns) + derived_fields
+                         + ['row_hash', 'load_generation', 'write_generation', 'updated_at'])
+        next_report = progress_every
+        started = time.perf_counter()
+
+        instances = build_instances(
+            read_csv_rows(path), model, key_field, key_column, columns, stats,
+        )
+        for batch in batched(instances, batch_size):
+            stats['read'] += len(batch)
+            existing = {
+                key: (row_hash, loaded)
+                for key, row_hash, loaded in model.objects.filter(
+                    **{f'{key_field}__in': [getattr(obj, key_field) for obj in batch]}
+                ).values_list(key_field, 'row_hash', 'load_generation')
+            }
+            # Each key is written at most once per load, from its first row
+            unique = {}
+            for obj in batch:
+                key = getattr(obj, key_field)
+                if key in unique or existing.get(key, (None, None))[1] == generation:
+                    stats['duplicates'] += 1
+                else:
+                    unique[key] = obj
+            changed = []
+            unchanged = []
+            for key, obj in unique.items():
+                previous = existing.get(key, (None, None))[0]
+                if previous == obj.row_hash and not options['force']:
+                    stats['unchanged'] += 1
+                    unchanged.append(key)
+                    continue
+                stats['updated' if previous is not None else 'new'] += 1
+                if isinstance(obj, MarsRegion):
+                    obj.populate_numeric_fields()
+                obj.load_generation = obj.write_generation = generation
+                changed.append(obj)
+
+            with transaction.atomic():
+                if changed:
+                    model.objects.bulk_create(
+                        changed,
+                        update_conflicts=True,
+                        unique_fields=[key_field],
+                        update_fields=update_fields,
+                    )
+                if unchanged:
+                    model.objects.filter(**{f'{key_field}__in': unchanged}).update(load_generation=generation)
+
+            if progress_every and stats['read'] >= next_report:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'  {stats["read"]} rows ({stats["read"] / elapsed:.0f} rows/s)'
+                )
+                next_report += progress_every
+
+        if options['prune']:
+            for ids in stamped_ids(model, 'load_generation__lt', generation, batch_size):
+                # Raw deletes skip the per-row signals, each of which would
+                # bump the data version; handle() bumps it once
+                with transaction.atomic():
+                    stats['deleted'] += raw_delete(model, ids)
+
+        IngestedFile.objects.update_or_create(
+            table=table,
+            defaults={'path': str(path), 'sha256': digest,
+                      'rows': model.objects.filter(load_generation=generation).count()},
+        )
+        stats['changed'] = bool(stats['new'] or stats['updated'] or stats['deleted'])
+
+        elapsed = time.perf_counter() - started
+        rate = stats['read'] / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(
+            f'  {stats["read"]} rows in {elapsed:.2f}s ({rate:.0f} rows/s): '
+            f'{stats["new"]} new, {stats["updated"]} updated, {stats["unchanged"]} unchanged, '
+            f'{stats["deleted"]} deleted, {stats["duplicates"]} duplicate and '
+            f'{stats["skipped"]} invalid rows skipped'
+        )
+        return stats
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+import json
+import os
+from django.conf import settings
+from django.db import transaction
+from api.cache import bump_data_version
+from api.models import MarsSite
+
+
+class Command(BaseCommand):
+    help = 'Load Mars exploration sites from a JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            default=os.path.join(settings.BASE_DIR, 'data', 'mars_sites.json'),
+            help='JSON file with a list of sites',
+        )
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not os.path.exists(path):
+            raise CommandError(f'Sites file not found: {path}')
+
+        self.stdout.write('Loading Mars sites...')
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+
+        sites = [
+            MarsSite(
+                id=site['id'],
+                name=site['name'],
+                location=site.get('location', ''),
+                lat=site['lat'],
+                lon=site['lon'],
+                simulator_parameters=site.get('simulator_parameters', {}),
+            )
+            for site in data
+        ]
+        with transaction.atomic():
+            MarsSite.objects.bulk_create(
+                sites,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=['name', 'location', 'lat', 'lon', 'simulator_parameters', 'updated_at'],
+            )
+        bump_data_version()
+
+        self.stdout.write(self.style.SUCCESS(f'{len(sites)} Mars sites loaded successfully'))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+import time
+from api.raster import RASTER_ROOT, RasterLayer, get_raster_stack, score_grid
+from api.search import crop_not_found, resolve_crop
+
+
+class Command(BaseCommand):
+    help = 'Score every pixel of the ingested raster layers for a crop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('crop', help='Crop to score')
+        parser.add_argument(
+            '--name',
+            help='Name of the output layer (default: suitability_<crop id>)',
+        )
+        parser.add_argument(
+            '--root',
+            default=os.path.join(RASTER_ROOT, 'scores'),
+            help='Directory of the output layer (default: <RASTER_ROOT>/scores)',
+        )
+        parser.add_argument(
+            '--block-rows',
+            type=int,
+            help='Pixel rows scored at a time (default: one row of tiles)',
+        )
+
+    def handle(self, *args, **options):
+        if options['block_rows'] is not None and options['block_rows'] < 1:
+            raise CommandError('--block-rows must be at least 1')
+        crop = resolve_crop(options['crop'])
+        if crop is None:
+            not_found = crop_not_found(options['crop'])
+            hint = f' (did you mean: {", ".join(not_found["suggestions"])}?)' if not_found['suggestions'] else ''
+            raise CommandError(not_found['error'] + hint)
+        stack = get_raster_stack()
+        if stack is None:
+            raise CommandError('No raster layers have been ingested; run ingest_raster first')
+
+        grid = stack.grid
+        name = options['name'] or f'suitability_{crop.id}'
+        self.stdout.write(f'Scoring {crop.crop} on {grid.height}x{grid.width} pixels...')
+        started = time.perf_counter()
+
+        # Scores go straight into a tiled layer, so the grid is never held in memory
+        output = RasterLayer.create(
+            name, grid.height, grid.width, tile_size=grid.tile_size,
+            north=grid.north, south=grid.south, west=grid.west, east=grid.east,
+            units='score', root=options['root'],
+        )
+        score_grid(stack, crop, output, options['block_rows'])
+        output.publish()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{grid.height * grid.width} pixels in {elapsed:.2f}s written to {output.path}')
+        self.stdout.write(self.style.SUCCESS(f'{crop.crop} scored successfully'))
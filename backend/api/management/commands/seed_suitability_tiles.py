@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+import time
+from api.models import MarsCrop
+from api.search import crop_not_found, resolve_crop
+from api.tiles import MAX_ZOOM, tile_cache
+
+
+class Command(BaseCommand):
+    help = 'Pre-render suitability map tiles for the low zoom levels'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--crops',
+            default='all',
+            help='Comma-separated crop names, or "all" (default: all)',
+        )
+        parser.add_argument(
+            '--max-zoom',
+            type=int,
+            default=3,
+            help='Highest zoom level to seed (default: 3)',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete cached tiles of older data versions first',
+        )
+
+    def handle(self, *args, **options):
+        max_zoom = options['max_zoom']
+        if not 0 <= max_zoom <= MAX_ZOOM:
+            raise CommandError(f'--max-zoom must be between 0 and {MAX_ZOOM}')
+
+        if options['crops'].lower() == 'all':
+            crops = list(MarsCrop.objects.all())
+        else:
+            crops = []
+            for name in [n.strip() for n in options['crops'].split(',') if n.strip()]:
+                crop = resolve_crop(name)
+                if crop is None:
+                    not_found = crop_not_found(name)
+                    hint = f' (did you mean: {", ".join(not_found["suggestions"])}?)' if not_found['suggestions'] else ''
+                    raise CommandError(not_found['error'] + hint)
+                crops.append(crop)
+
+        if options['prune']:
+            removed = tile_cache.prune()
+            self.stdout.write(f'Removed tiles of {removed} older data version(s)')
+
+        started = time.perf_counter()
+        tiles = 0
+        for crop in crops:
+            for z in range(max_zoom + 1):
+                for x in range(2 ** z):
+                    for y in range(2 ** z):
+                        tile_cache.get(crop, z, x, y)
+                        tiles += 1
+            self.stdout.write(f'  {crop.crop}: zoom 0-{max_zoom}')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {tiles} tiles ({tile_cache.renders} rendered) in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,286 @@
+"""
+Per-request timing, in-process latency histograms and slow-request profiling.
+
+TimingMiddleware opens a RequestTimings for every request. Code on the hot
+paths wraps its phases in span(), and record_query, which api.signals
+installs on every database connection, counts queries and their time. The
+totals are sent back in a Server-Timing header and aggregated per endpoint
+for the Prometheus text exposition served at /api/metrics/.
+"""
+
+import cProfile
+import contextvars
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+_config = getattr(settings, 'REQUEST_METRICS', {})
+SERVER_TIMING = _config.get('SERVER_TIMING', True)
+PROFILE_SAMPLE_RATE = _config.get('PROFILE_SAMPLE_RATE', 0.0)
+PROFILE_SLOW_MS = _config.get('PROFILE_SLOW_MS', 500)
+PROFILE_DIR = _config.get('PROFILE_DIR')
+
+# Upper bounds in seconds, as used by the Prometheus client libraries
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestTimings:
+    """Spans and database work recorded while serving one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, seconds: float):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def add_query(self, seconds: float):
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total: float) -> str:
+        """Render the Server-Timing header value, durations in milliseconds."""
+        parts = [f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_queries} queries"']
+        parts += [f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.spans.items()]
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Return the timings of the request being served, if any."""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str):
+    """Time a block of code and add it to the current request's span."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add_span(name, time.perf_counter() - started)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries against the current request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - started)
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with per-span and database totals."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.spans: Dict[str, float] = {}
+
+    def observe(self, seconds: float, timings: RequestTimings):
+        self.count += 1
+        self.sum += seconds
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+        self.db_queries += timings.db_queries
+        self.db_seconds += timings.db_seconds
+        for name, value in timings.spans.items():
+            self.spans[name] = self.spans.get(name, 0.0) + value
+
+
+class MetricsRegistry:
+    """Thread-safe histograms keyed by (endpoint, method)."""
+
+    def __init__(self):
+        self._histograms: Dict[tuple, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint: str, method: str, seconds: float, timings: RequestTimings):
+        with self._lock:
+            histogram = self._histograms.get((endpoint, method))
+            if histogram is None:
+                histogram = self._histograms[(endpoint, method)] = LatencyHistogram()
+            histogram.observe(seconds, timings)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = [
+            '# HELP terraengine_request_duration_seconds Request latency by endpoint.',
+            '# TYPE terraengine_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for (endpoint, method), histogram in items:
+                labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(
+                        f'terraengine_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}'
+                    )
+                lines.append(
+                    f'terraengine_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}'
+                )
+                lines.append(f'terraengine_request_duration_seconds_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'terraengine_request_duration_seconds_count{{{labels}}} {histogram.count}')
+
+            lines += [
+                '# HELP terraengine_db_queries_total Database queries run by endpoint.',
+                '# TYPE terraengine_db_queries_total counter',
+            ]
+            for (endpoint, method), histogram in items:
+                labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+                lines.append(f'terraengine_db_queries_total{{{labels}}} {histogram.db_queries}')
+
+            lines += [
+                '# HELP terraengine_db_seconds_total Time spent executing database queries.',
+                '# TYPE terraengine_db_seconds_total counter',
+            ]
+            for (endpoint, method), histogram in items:
+                labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+                lines.append(f'terraengine_db_seconds_total{{{labels}}} {histogram.db_seconds}')
+
+            lines += [
+                '# HELP terraengine_span_seconds_total Time spent in instrumented spans.',
+                '# TYPE terraengine_span_seconds_total counter',
+            ]
+            for (endpoint, method), histogram in items:
+                for name, seconds in sorted(histogram.spans.items()):
+                    labels = f'endpoint="{_escape(endpoint)}",method="{method}",span="{name}"'
+                    lines.append(f'terraengine_span_seconds_total{{{labels}}} {seconds}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def _endpoint(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class TimingMiddleware:
+    """
+    Time every request, add a Server-Timing header and record its latency.
+
+    Streamed responses are timed until the response object is returned, not
+    until the last chunk is sent. A PROFILE_SAMPLE_RATE fraction of
+    synchronous requests runs under cProfile; profiles of requests slower
+    than PROFILE_SLOW_MS are logged and, with PROFILE_DIR set, saved there.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        profiler = None
+        if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+        try:
+            if profiler is not None:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, timings, profiler)
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, timings)
+        return response
+
+    def finish(self, request, response, timings, profiler=None):
+        total = timings.elapsed()
+        if SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing(total)
+        registry.observe(_endpoint(request), request.method, total, timings)
+        if profiler is not None and total * 1000 >= PROFILE_SLOW_MS:
+            try:
+                save_profile(profiler, request, total)
+            except OSError:
+                logger.exception('Could not save the profile of a slow request')
+
+
+def save_profile(profiler: cProfile.Profile, request, seconds: float):
+    """Log the hottest functions of a slow request and optionally save the profile."""
+    stats = pstats.Stats(profiler)
+    if PROFILE_DIR:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{_endpoint(request)}-{os.getpid()}.prof'
+        path = os.path.join(PROFILE_DIR, name.replace('/', '_'))
+        stats.dump_stats(path)
+        logger.warning('Slow request %s %s took %.0f ms, profile saved to %s',
+                       request.method, request.path, seconds * 1000, path)
+    else:
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:10]
+        summary = '; '.join(
+            f'{func[2]} ({os.path.basename(func[0])}:{func[1]}) {cumulative * 1000:.1f} ms'
+            for func, (_, _, _, cumulative, _) in top
+        )
+        logger.warning('Slow request %s %s took %.0f ms: %s',
+                       request.method, request.path, seconds * 1000, summary)
+
+
+def metrics_view(request):
+    """Serve the in-process metrics in the Prometheus text format."""
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,96 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:23
+
+from django.db import migrations, models
+
+from api.utils import parse_coordinate, parse_measurement
+
+
+def backfill_numeric_fields(apps, schema_editor):
+    MarsRegion = apps.get_model('api', 'MarsRegion')
+    regions = list(MarsRegion.objects.all())
+    for region in regions:
+        region.latitude_value, region.latitude_confidence = parse_coordinate(region.latitude_deg, 'NS')
+        region.longitude_value, region.longitude_confidence = parse_coordinate(region.longitude_deg, 'EW')
+        region.elevation_value, region.elevation_confidence = parse_measurement(region.elevation_m)
+        region.perchlorate_value, region.perchlorate_confidence = parse_measurement(region.perchlorate_wt_pct, signed=False)
+        region.water_release_value, region.water_release_confidence = parse_measurement(region.water_release_wt_pct, signed=False)
+        region.ph_value, region.ph_confidence = parse_measurement(region.ph, signed=False)
+    MarsRegion.objects.bulk_update(regions, [
+        'latitude_value', 'latitude_confidence',
+        'longitude_value', 'longitude_confidence',
+        'elevation_value', 'elevation_confidence',
+        'perchlorate_value', 'perchlorate_confidence',
+        'water_release_value', 'water_release_confidence',
+        'ph_value', 'ph_confidence',
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marsregion',
+            name='elevation_confidence',
+            field=models.CharField(choices=[('measured', 'Measured'), ('approximate', 'Approximate'), ('qualitative', 'Qualitative'), ('missing', 'Missing')], default='missing', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='elevation_value',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='latitude_confidence',
+            field=models.CharField(choices=[('measured', 'Measured'), ('approximate', 'Approximate'), ('qualitative', 'Qualitative'), ('missing', 'Missing')], default='missing', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='latitude_value',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='longitude_confidence',
+            field=models.CharField(choices=[('measured', 'Measured'), ('approximate', 'Approximate'), ('qualitative', 'Qualitative'), ('missing', 'Missing')], default='missing', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='longitude_value',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='perchlorate_confidence',
+            field=models.CharField(choices=[('measured', 'Measured'), ('approximate', 'Approximate'), ('qualitative', 'Qualitative'), ('missing', 'Missing')], default='missing', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='perchlorate_value',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='ph_confidence',
+            field=models.CharField(choices=[('measured', 'Measured'), ('approximate', 'Approximate'), ('qualitative', 'Qualitative'), ('missing', 'Missing')], default='missing', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='ph_value',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='water_release_confidence',
+            field=models.CharField(choices=[('measured', 'Measured'), ('approximate', 'Approximate'), ('qualitative', 'Qualitative'), ('missing', 'Missing')], default='missing', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='water_release_value',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_numeric_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:24
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicates(model, name_field):
+    """
+    Collapse rows sharing a name into the oldest one, which keeps its id
+    but takes the values of the most recently updated duplicate, as the
+    upserting loader would have left it.
+    """
+    names = (
+        model.objects.values(name_field)
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+        .values_list(name_field, flat=True)
+    )
+    for name in list(names):
+        rows = list(model.objects.filter(**{name_field: name}).order_by('updated_at', 'id'))
+        keep = min(rows, key=lambda row: row.id)
+        latest = rows[-1]
+        if latest.id != keep.id:
+            model.objects.filter(pk=keep.id).update(**{
+                field.attname: getattr(latest, field.attname)
+                for field in model._meta.concrete_fields
+                if not field.primary_key and field.name != 'created_at'
+            })
+        model.objects.filter(pk__in=[row.id for row in rows if row.id != keep.id]).delete()
+
+
+def merge_duplicate_names(apps, schema_editor):
+    merge_duplicates(apps.get_model('api', 'MarsCrop'), 'crop')
+    merge_duplicates(apps.get_model('api', 'MarsRegion'), 'region')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_region_numeric_fields'),
+    ]
+
+    operations = [
+        # Existing duplicates would make the unique constraints fail
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='marscrop',
+            name='crop',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='marsregion',
+            name='region',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+    ]
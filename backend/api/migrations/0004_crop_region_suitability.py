@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_unique_region_and_crop_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CropRegionSuitability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField()),
+                ('reasons', models.JSONField(default=list)),
+                ('crop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suitability', to='api.marscrop')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suitability', to='api.marsregion')),
+            ],
+            options={
+                'db_table': 'mars_crop_region_suitability',
+                'indexes': [models.Index(fields=['crop', '-score'], name='suitability_crop_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cropregionsuitability',
+            constraint=models.UniqueConstraint(fields=('crop', 'region'), name='unique_crop_region_suitability'),
+        ),
+    ]
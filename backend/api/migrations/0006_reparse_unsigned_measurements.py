@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:12
+
+from django.db import migrations
+from django.db.models import Q
+
+from api.utils import parse_measurement
+
+
+def reparse_unsigned_measurements(apps, schema_editor):
+    """Re-read pH and weight percents written with a Unicode minus as unsigned."""
+    MarsRegion = apps.get_model('api', 'MarsRegion')
+    DataVersion = apps.get_model('api', 'DataVersion')
+    CropRegionSuitability = apps.get_model('api', 'CropRegionSuitability')
+    regions = list(MarsRegion.objects.filter(
+        Q(ph__contains='−') | Q(perchlorate_wt_pct__contains='−') | Q(water_release_wt_pct__contains='−')
+    ))
+    if not regions:
+        return
+    for region in regions:
+        region.perchlorate_value, region.perchlorate_confidence = parse_measurement(region.perchlorate_wt_pct, signed=False)
+        region.water_release_value, region.water_release_confidence = parse_measurement(region.water_release_wt_pct, signed=False)
+        region.ph_value, region.ph_confidence = parse_measurement(region.ph, signed=False)
+    MarsRegion.objects.bulk_update(regions, [
+        'perchlorate_value', 'perchlorate_confidence',
+        'water_release_value', 'water_release_confidence',
+        'ph_value', 'ph_confidence',
+    ], batch_size=500)
+    # Scores computed from the old values are stale: drop the matrix so
+    # matching scores live until build_suitability_matrix runs again
+    CropRegionSuitability.objects.all().delete()
+    version, _ = DataVersion.objects.get_or_create(pk=1)
+    version.version += 1
+    version.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_ingest_digests_and_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(reparse_unsigned_measurements, migrations.RunPython.noop),
+    ]
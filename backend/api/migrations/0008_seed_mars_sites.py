@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:58
+
+import json
+import os
+
+from django.conf import settings
+from django.db import migrations
+
+
+def seed_mars_sites(apps, schema_editor):
+    """
+    Insert the sites of data/mars_sites.json that are not in mars_sites yet.
+
+    The sites used to be hard-coded in the views; without this a migrated
+    database serves no sites until load_sites runs. Existing rows are kept
+    as they are, so edited sites survive.
+    """
+    MarsSite = apps.get_model('api', 'MarsSite')
+    DataVersion = apps.get_model('api', 'DataVersion')
+    path = os.path.join(settings.BASE_DIR, 'data', 'mars_sites.json')
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+
+    existing = set(MarsSite.objects.values_list('id', flat=True))
+    sites = [
+        MarsSite(
+            id=site['id'],
+            name=site['name'],
+            location=site.get('location', ''),
+            lat=site['lat'],
+            lon=site['lon'],
+            simulator_parameters=site.get('simulator_parameters', {}),
+        )
+        for site in data
+        if site['id'] not in existing
+    ]
+    if not sites:
+        return
+    MarsSite.objects.bulk_create(sites)
+    # The site store caches per data version
+    version, _ = DataVersion.objects.get_or_create(pk=1)
+    version.version += 1
+    version.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_suitability_rules'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_mars_sites, migrations.RunPython.noop),
+    ]
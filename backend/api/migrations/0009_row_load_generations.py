@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_seed_mars_sites'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marscrop',
+            name='load_generation',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='marscrop',
+            name='write_generation',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='load_generation',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='marsregion',
+            name='write_generation',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False),
+        ),
+    ]
@@ -1,4 +1,21 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+
+from .utils import (
+    CONFIDENCE_APPROXIMATE,
+    CONFIDENCE_MEASURED,
+    CONFIDENCE_MISSING,
+    CONFIDENCE_QUALITATIVE,
+    parse_coordinate,
+    parse_measurement,
+)
+
+CONFIDENCE_CHOICES = [
+    (CONFIDENCE_MEASURED, 'Measured'),
+    (CONFIDENCE_APPROXIMATE, 'Approximate'),
+    (CONFIDENCE_QUALITATIVE, 'Qualitative'),
+    (CONFIDENCE_MISSING, 'Missing'),
+]
 
 
 class MarsSite(models.Model):
@@ -27,7 +44,7 @@ class MarsSite(models.Model):
 class MarsRegion(models.Model):
     """Model for Mars regions data."""
     
-    region = models.CharField(max_length=200)
+    region = models.CharField(max_length=200, unique=True)
     latitude_deg = models.CharField(max_length=50)
     longitude_deg = models.CharField(max_length=50)
     elevation_m = models.CharField(max_length=50, blank=True, null=True)
@@ -38,6 +55,26 @@ class MarsRegion(models.Model):
     terrain_type = models.CharField(max_length=200, blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
     
+    # Numeric values parsed from the text columns above, kept in sync on save
+    latitude_value = models.FloatField(blank=True, null=True, db_index=True)
+    latitude_confidence = models.CharField(max_length=12, choices=CONFIDENCE_CHOICES, default=CONFIDENCE_MISSING)
+    longitude_value = models.FloatField(blank=True, null=True, db_index=True)
+    longitude_confidence = models.CharField(max_length=12, choices=CONFIDENCE_CHOICES, default=CONFIDENCE_MISSING)
+    elevation_value = models.FloatField(blank=True, null=True, db_index=True)
+    elevation_confidence = models.CharField(max_length=12, choices=CONFIDENCE_CHOICES, default=CONFIDENCE_MISSING)
+    perchlorate_value = models.FloatField(blank=True, null=True, db_index=True)
+    perchlorate_confidence = models.CharField(max_length=12, choices=CONFIDENCE_CHOICES, default=CONFIDENCE_MISSING)
+    water_release_value = models.FloatField(blank=True, null=True, db_index=True)
+    water_release_confidence = models.CharField(max_length=12, choices=CONFIDENCE_CHOICES, default=CONFIDENCE_MISSING)
+    ph_value = models.FloatField(blank=True, null=True, db_index=True)
+    ph_confidence = models.CharField(max_length=12, choices=CONFIDENCE_CHOICES, default=CONFIDENCE_MISSING)
+    
+    # Digest of the CSV row last loaded by load_csv_data; cleared by saves
+    row_hash = models.CharField(max_length=32, blank=True, default='', editable=False)
+    # Generations of the last load_csv_data run that found and that wrote the row
+    load_generation = models.PositiveBigIntegerField(default=0, editable=False, db_index=True)
+    write_generation = models.PositiveBigIntegerField(default=0, editable=False, db_index=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -47,12 +84,41 @@ class MarsRegion(models.Model):
     
     def __str__(self):
         return self.region
+    
+    def populate_numeric_fields(self):
+        """Parse the text measurements into their numeric columns."""
+        self.latitude_value, self.latitude_confidence = parse_coordinate(self.latitude_deg, 'NS')
+        self.longitude_value, self.longitude_confidence = parse_coordinate(self.longitude_deg, 'EW')
+        self.elevation_value, self.elevation_confidence = parse_measurement(self.elevation_m)
+        self.perchlorate_value, self.perchlorate_confidence = parse_measurement(self.perchlorate_wt_pct, signed=False)
+        self.water_release_value, self.water_release_confidence = parse_measurement(self.water_release_wt_pct, signed=False)
+        self.ph_value, self.ph_confidence = parse_measurement(self.ph, signed=False)
+    
+    def save(self, *args, **kwargs):
+        self.populate_numeric_fields()
+        # Edited rows no longer match the CSV, so the next load rewrites them
+        self.row_hash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(NUMERIC_REGION_FIELDS) | {'row_hash'}
+        super().save(*args, **kwargs)
+
+
+# Columns written by MarsRegion.populate_numeric_fields
+NUMERIC_REGION_FIELDS = [
+    'latitude_value', 'latitude_confidence',
+    'longitude_value', 'longitude_confidence',
+    'elevation_value', 'elevation_confidence',
+    'perchlorate_value', 'perchlorate_confidence',
+    'water_release_value', 'water_release_confidence',
+    'ph_value', 'ph_confidence',
+]
 
 
 class MarsCrop(models.Model):
     """Model for Mars crops data."""
     
-    crop = models.CharField(max_length=200)
+    crop = models.CharField(max_length=200, unique=True)
     germination_on_mars_simulant = models.CharField(max_length=50)
     biomass = models.CharField(max_length=100)
     flowered_seed = models.CharField(max_length=100)
@@ -63,6 +129,12 @@ class MarsCrop(models.Model):
     humidity_rh_range = models.CharField(max_length=100, blank=True, null=True)
     moisture_regime = models.TextField(blank=True, null=True)
     
+    # Digest of the CSV row last loaded by load_csv_data; cleared by saves
+    row_hash = models.CharField(max_length=32, blank=True, default='', editable=False)
+    # Generations of the last load_csv_data run that found and that wrote the row
+    load_generation = models.PositiveBigIntegerField(default=0, editable=False, db_index=True)
+    write_generation = models.PositiveBigIntegerField(default=0, editable=False, db_index=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -72,3 +144,113 @@ class MarsCrop(models.Model):
     
     def __str__(self):
         return self.crop
+    
+    def save(self, *args, **kwargs):
+        self.row_hash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'row_hash'}
+        super().save(*args, **kwargs)
+
+
+# Ingest bookkeeping columns that are not part of the reference data itself
+BOOKKEEPING_FIELDS = ('row_hash', 'load_generation', 'write_generation', 'created_at', 'updated_at')
+
+
+class CropRegionSuitability(models.Model):
+    """Precomputed match score of one crop in one region."""
+    
+    crop = models.ForeignKey(MarsCrop, on_delete=models.CASCADE, related_name='suitability')
+    region = models.ForeignKey(MarsRegion, on_delete=models.CASCADE, related_name='suitability')
+    score = models.IntegerField()
+    # Reason codes of the rules the matrix was built with (SuitabilityRules)
+    reasons = models.JSONField(default=list)
+    
+    class Meta:
+        db_table = 'mars_crop_region_suitability'
+        constraints = [
+            models.UniqueConstraint(fields=['crop', 'region'], name='unique_crop_region_suitability'),
+        ]
+        indexes = [
+            models.Index(fields=['crop', '-score'], name='suitability_crop_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.crop} in {self.region}: {self.score}'
+
+
+class SuitabilityRules(models.Model):
+    """
+    Digest of the rule set the suitability matrix was built with, a single row.
+    
+    The matrix is only served while this matches the digest of the current
+    default rules; after the rules change it is skipped until rebuilt.
+    """
+    
+    digest = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'suitability_rules'
+    
+    def __str__(self):
+        return self.digest
+    
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('digest', flat=True).first()
+    
+    @classmethod
+    def record(cls, digest: str):
+        cls.objects.update_or_create(pk=1, defaults={'digest': digest})
+
+
+class DataVersion(models.Model):
+    """
+    Persisted reference data version, a single row.
+    
+    Every process reads it through api.cache.get_data_version, so a load in
+    one process invalidates the caches of all others, and the version
+    survives restarts together with anything cached on disk against it.
+    """
+    
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'data_version'
+    
+    def __str__(self):
+        return str(self.version)
+    
+    @classmethod
+    def current(cls) -> int:
+        version = cls.objects.filter(pk=1).values_list('version', flat=True).first()
+        return 1 if version is None else version
+    
+    @classmethod
+    def bump(cls) -> int:
+        """Increment the version atomically and return the new value."""
+        with transaction.atomic():
+            row, _ = cls.objects.select_for_update().get_or_create(pk=1)
+            row.version = F('version') + 1
+            row.save(update_fields=['version', 'updated_at'])
+            row.refresh_from_db(fields=['version'])
+        return row.version
+
+
+class IngestedFile(models.Model):
+    """Content digest of the CSV file last loaded into a table by load_csv_data."""
+    
+    table = models.CharField(max_length=100, unique=True)
+    path = models.CharField(max_length=500)
+    sha256 = models.CharField(max_length=64)
+    rows = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'ingested_files'
+        ordering = ['table']
+    
+    def __str__(self):
+        return f'{self.table}: {self.path}'
@@ -0,0 +1,155 @@
+"""
+Keyset pagination, field projection and streaming output for list endpoints.
+"""
+
+import base64
+import binascii
+import json
+
+from .utils import batched
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 2000
+
+# API field name -> model field for MarsRegion
+REGION_FIELDS = {
+    'id': 'id',
+    'name': 'region',
+    'latitude': 'latitude_deg',
+    'longitude': 'longitude_deg',
+    'elevation': 'elevation_m',
+    'perchlorate_wt_pct': 'perchlorate_wt_pct',
+    'water_release_wt_pct': 'water_release_wt_pct',
+    'ph': 'ph',
+    'major_minerals': 'major_minerals',
+    'terrain_type': 'terrain_type',
+    'notes': 'notes',
+}
+
+# API field name -> model field for MarsCrop
+CROP_FIELDS = {
+    'id': 'id',
+    'name': 'crop',
+    'germination': 'germination_on_mars_simulant',
+    'biomass': 'biomass',
+    'flowered_seed': 'flowered_seed',
+    'notes': 'notes',
+    'preferred_ph_range': 'preferred_ph_range',
+    'soil_texture': 'terrain_soil_texture',
+    'temperature_range': 'temperature_range_c',
+    'humidity_range': 'humidity_rh_range',
+    'moisture_regime': 'moisture_regime',
+}
+
+
+def parse_fields(value, field_map):
+    """
+    Return the API fields selected by a comma-separated ?fields= value.
+
+    All fields are returned when value is empty. Raises ValueError for
+    unknown field names.
+    """
+    if not value:
+        return list(field_map)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in field_map]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    return fields
+
+
+def parse_limit(value):
+    """Return the page size for a ?limit= value, capped at MAX_PAGE_SIZE."""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(sort_value, pk):
+    """Encode the sort key of the last row on a page as an opaque cursor."""
+    payload = json.dumps([sort_value, pk], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor. Raises ValueError if it is invalid."""
+    try:
+        sort_value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+    return sort_value, pk
+
+
+def _render_record(record, field_map, fields):
+    return {name: getattr(record, field_map[name]) for name in fields}
+
+
+def paginate_records(table, field_map, fields, limit, cursor=None):
+    """
+    Return one page of a repository RecordTable, already sorted by
+    (sort_field, id), and the next cursor.
+
+    The cursor holds the sort key of the last record seen and its position
+    is found by bisection, so the cost of a page does not grow with its
+    position in the table.
+    """
+    start = 0
+    if cursor:
+        sort_value, pk = decode_cursor(cursor)
+        try:
+            start = table.after(sort_value, pk)
+        except TypeError:
+            raise ValueError('Invalid cursor')
+
+    records = table.records[start:start + limit + 1]
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        last = records[-1]
+        next_cursor = encode_cursor(getattr(last, table.sort_field), last.id)
+    return [_render_record(record, field_map, fields) for record in records], next_cursor
+
+
+def list_records(records, field_map, fields):
+    """Return every repository record projected onto fields."""
+    return [_render_record(record, field_map, fields) for record in records]
+
+
+def _encode_stream(rendered, output):
+    """Encode rendered rows as JSON array or NDJSON chunks of STREAM_CHUNK_SIZE rows."""
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+    if output == 'ndjson':
+        for chunk in batched(rendered, STREAM_CHUNK_SIZE):
+            yield ''.join(encode(row) + '\n' for row in chunk).encode('utf-8')
+        return
+
+    yield b'['
+    separator = ''
+    for chunk in batched(rendered, STREAM_CHUNK_SIZE):
+        parts = []
+        for row in chunk:
+            parts.append(separator + encode(row))
+            separator = ','
+        yield ''.join(parts).encode('utf-8')
+    yield b']'
+
+
+def stream_records(records, field_map, fields, output='json'):
+    """
+    Yield repository records as encoded JSON array or NDJSON chunks.
+
+    Records are rendered and written one chunk at a time, so the response
+    body is never held in memory.
+    """
+    return _encode_stream((_render_record(record, field_map, fields) for record in records), output)
+
+
+async def astream_records(records, field_map, fields, output='json'):
+    """Async variant of stream_records for async streaming responses."""
+    for chunk in stream_records(records, field_map, fields, output):
+        yield chunk
@@ -0,0 +1,209 @@
+"""
+Multi-process sharded scoring for very large region sets.
+
+The arrays of a RegionColumns instance are copied once into shared memory
+and every worker of a process pool maps them on start-up, so tasks only
+carry the crop criteria and a (start, end) shard. Each shard returns its own
+top-N candidates, which are merged in the parent with the same ordering as
+RegionColumns.match: higher score first, then lower position.
+
+Workers are started with the "spawn" method: forking a threaded server can
+copy a lock another thread holds and hang the child. Scoring modules are
+imported inside functions so that spawned workers can set up Django before
+touching any model code.
+
+Requests borrow the scorer of the current columns through parallel_scorer().
+When the data version changes the old scorer is retired rather than closed:
+its pool and shared memory are released once the last request still
+scoring on it is done.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+from django.conf import settings
+
+_config = getattr(settings, 'PARALLEL_SCORING', {})
+ENABLED = _config.get('ENABLED', False)
+WORKERS = _config.get('WORKERS') or os.cpu_count() or 1
+SHARD_SIZE = _config.get('SHARD_SIZE', 500000)
+MIN_REGIONS = _config.get('MIN_REGIONS', 200000)
+START_METHOD = _config.get('START_METHOD', 'spawn')
+
+# Shared-memory arrays of the current worker process, set by _attach
+_worker_arrays = None
+_worker_blocks = []
+
+
+def _attach(layout: Dict[str, Tuple[str, str, tuple]]):
+    """Pool initializer: map the shared region arrays into this worker."""
+    global _worker_arrays
+
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+    arrays = {}
+    for name, (block_name, dtype, shape) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    _worker_arrays = arrays
+
+
+def _score_shard(criteria, rules_config, start: int, end: int, top_n: int):
+    """Score rows start:end and return the global positions and scores of its top_n."""
+    from .ruleset import compile_ruleset
+    from .scoring import RegionColumns, top_indices
+
+    columns = RegionColumns.from_arrays(
+        {name: array[start:end] for name, array in _worker_arrays.items()}
+    )
+    # Rules travel with the task so every shard scores with the parent's rules
+    scores = columns.score(criteria, compile_ruleset(rules_config))
+    order = top_indices(scores, top_n)
+    return order + start, scores[order]
+
+
+class ParallelScorer:
+    """Process pool scoring one RegionColumns instance held in shared memory."""
+
+    def __init__(self, columns, workers: int = WORKERS, shard_size: int = SHARD_SIZE):
+        self.columns = columns
+        self.shard_size = max(1, shard_size)
+        self._blocks = []
+        # Requests scoring on this instance, and whether it has been replaced
+        self._users = 0
+        self._retired = False
+        self._state_lock = threading.Lock()
+
+        layout = {}
+        for name, array in columns.arrays().items():
+            # Zero-sized blocks are not allowed, so empty tables get one byte
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            layout[name] = (block.name, array.dtype.str, array.shape)
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=_attach, initargs=(layout,),
+            mp_context=multiprocessing.get_context(START_METHOD),
+        )
+
+    def __len__(self):
+        return len(self.columns)
+
+    def shards(self) -> List[Tuple[int, int]]:
+        """Contiguous (start, end) row ranges of at most shard_size rows."""
+        size = len(self.columns)
+        return [(start, min(start + self.shard_size, size))
+                for start in range(0, size, self.shard_size)]
+
+    def top_positions(self, criteria, rules, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the positions and scores of the top_n regions, best first."""
+        futures = [
+            self._pool.submit(_score_shard, criteria, rules.config, start, end, top_n)
+            for start, end in self.shards()
+        ]
+        parts = [future.result() for future in futures]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        positions = np.concatenate([part[0] for part in parts])
+        scores = np.concatenate([part[1] for part in parts])
+        order = np.lexsort((positions, -scores))[:top_n]
+        return positions[order], scores[order]
+
+    def match(self, crop, top_n: int = 3, rules=None) -> List[Dict]:
+        """Same result as RegionColumns.match, scored across the process pool."""
+        from .scoring import get_crop_profile, get_rules
+
+        if top_n <= 0:
+            return []
+        rules = rules or get_rules()
+        criteria = get_crop_profile(crop)
+        positions, _ = self.top_positions(criteria, rules, top_n)
+
+        # Only the winners are re-evaluated in the parent to render reasons
+        winners = self.columns.take(positions)
+        masks = winners.evaluate(criteria, rules)
+        scores = rules.score(masks, len(winners))
+        return [winners.result(masks, scores, i, rules) for i in range(len(winners))]
+
+    def acquire(self):
+        with self._state_lock:
+            self._users += 1
+
+    def release(self):
+        """End one request's use; a retired scorer closes with its last user."""
+        with self._state_lock:
+            self._users -= 1
+            idle = self._retired and self._users == 0
+        if idle:
+            self.close()
+
+    def retire(self):
+        """Close once no request is scoring on this instance any more."""
+        with self._state_lock:
+            self._retired = True
+            idle = self._users == 0
+        if idle:
+            self.close()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+@atexit.register
+def _close_scorer():
+    if _scorer is not None:
+        _scorer.close()
+
+
+@contextmanager
+def parallel_scorer(columns):
+    """Borrow the scorer for columns, replacing the one built for older data."""
+    global _scorer
+
+    with _scorer_lock:
+        if _scorer is None or _scorer.columns is not columns:
+            previous, _scorer = _scorer, ParallelScorer(columns)
+            if previous is not None:
+                previous.retire()
+        # Taken under the lock so a concurrent replacement cannot close it first
+        scorer = _scorer
+        scorer.acquire()
+    try:
+        yield scorer
+    finally:
+        scorer.release()
+
+
+def match_regions(crop, top_n: int = 3, rules=None) -> List[Dict]:
+    """
+    Match a crop against all regions, sharding across processes when enabled
+    in PARALLEL_SCORING and the table has at least MIN_REGIONS rows.
+    """
+    from .scoring import get_region_columns
+
+    columns = get_region_columns()
+    if ENABLED and WORKERS > 1 and len(columns) >= MIN_REGIONS:
+        with parallel_scorer(columns) as scorer:
+            return scorer.match(crop, top_n, rules)
+    return columns.match(crop, top_n, rules)
@@ -0,0 +1,348 @@
+"""
+Tiled, memory-mapped raster layers and per-pixel suitability scoring.
+
+Each layer is a global (or regional) equirectangular grid stored under
+RASTER_ROOT as two files: <name>.npy holds float32 values laid out as
+(tile rows, tile columns, tile_size, tile_size) so that every tile is one
+contiguous block, and <name>.json describes the grid. Layers are opened
+with np.load(mmap_mode='r'), so a windowed read only pages in the tiles it
+overlaps. Missing values are stored as NaN. New layers are written under
+temporary names and moved over the live files once complete, so workers
+that have a layer mapped keep reading the old file.
+
+Pixels are scored with the same rules as regions: a window of the layers
+is turned into RegionColumns arrays and evaluated for a crop.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+RASTER_ROOT = getattr(settings, 'RASTER_ROOT', os.path.join(settings.BASE_DIR, 'data', 'rasters'))
+DEFAULT_TILE_SIZE = 256
+
+# Layers known to the scorer and the units they are stored in
+LAYER_UNITS = {
+    'elevation': 'm',
+    'temperature': 'K',
+    'hydrogen': 'wt% water-equivalent hydrogen',
+    'perchlorate': 'wt%',
+    'ph': 'pH',
+}
+
+
+class RasterLayer:
+    """One tiled float32 grid with its geographic extent."""
+
+    def __init__(self, path: str, meta: Dict, tiles: np.ndarray):
+        self.path = path
+        self.meta = meta
+        self.tiles = tiles
+        # Suffix of the temporary files of a created layer until it is published
+        self.pending = None
+        self.name = meta['name']
+        self.height = meta['height']
+        self.width = meta['width']
+        self.tile_size = meta['tile_size']
+        self.north, self.south = meta['north'], meta['south']
+        self.west, self.east = meta['west'], meta['east']
+
+    @staticmethod
+    def paths(name: str, root: str = None) -> Tuple[str, str]:
+        root = root or RASTER_ROOT
+        return os.path.join(root, f'{name}.npy'), os.path.join(root, f'{name}.json')
+
+    @classmethod
+    def open(cls, name: str, root: str = None) -> 'RasterLayer':
+        """Open an ingested layer read-only. Raises FileNotFoundError if missing."""
+        data_path, meta_path = cls.paths(name, root)
+        with open(meta_path, 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        return cls(data_path, meta, np.load(data_path, mmap_mode='r'))
+
+    @classmethod
+    def create(cls, name: str, height: int, width: int, tile_size: int = DEFAULT_TILE_SIZE,
+               north: float = 90.0, south: float = -90.0, west: float = -180.0,
+               east: float = 180.0, units: str = None, root: str = None) -> 'RasterLayer':
+        """
+        Create an empty (all-NaN) writable layer on disk. It replaces the
+        layer of the same name when publish() is called.
+        """
+        root = root or RASTER_ROOT
+        os.makedirs(root, exist_ok=True)
+        data_path, meta_path = cls.paths(name, root)
+        suffix = f'.{os.getpid()}.tmp'
+        tiles = np.lib.format.open_memmap(
+            data_path + suffix, mode='w+', dtype=np.float32,
+            shape=(-(-height // tile_size), -(-width // tile_size), tile_size, tile_size),
+        )
+        tiles[:] = np.nan
+        meta = {
+            'name': name,
+            'units': units if units is not None else LAYER_UNITS.get(name, ''),
+            'height': height,
+            'width': width,
+            'tile_size': tile_size,
+            'north': north,
+            'south': south,
+            'west': west,
+            'east': east,
+        }
+        with open(meta_path + suffix, 'w', encoding='utf-8') as file:
+            json.dump(meta, file, indent=2)
+        layer = cls(data_path, meta, tiles)
+        layer.pending = suffix
+        return layer
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.height, self.width
+
+    @property
+    def is_global(self) -> bool:
+        """True when the layer wraps around in longitude."""
+        return abs((self.east - self.west) - 360.0) < 1e-9
+
+    def same_grid(self, other: 'RasterLayer') -> bool:
+        return (self.shape == other.shape
+                and (self.north, self.south, self.west, self.east)
+                == (other.north, other.south, other.west, other.east))
+
+    def _tile_ranges(self, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+        """Yield (tile, start, end) pieces of a pixel range split at tile edges."""
+        size = self.tile_size
+        for tile in range(start // size, (end - 1) // size + 1):
+            yield tile, max(start, tile * size), min(end, (tile + 1) * size)
+
+    def read_window(self, row0: int, row1: int, col0: int, col1: int) -> np.ndarray:
+        """
+        Return pixels [row0:row1, col0:col1] as a float32 array.
+
+        Only the tiles overlapping the window are read. Pixels outside the
+        grid are NaN.
+        """
+        out = np.full((max(row1 - row0, 0), max(col1 - col0, 0)), np.nan, dtype=np.float32)
+        r0, r1 = max(row0, 0), min(row1, self.height)
+        c0, c1 = max(col0, 0), min(col1, self.width)
+        if r0 >= r1 or c0 >= c1:
+            return out
+
+        size = self.tile_size
+        for ty, ra, rb in self._tile_ranges(r0, r1):
+            for tx, ca, cb in self._tile_ranges(c0, c1):
+                out[ra - row0:rb - row0, ca - col0:cb - col0] = self.tiles[
+                    ty, tx, ra - ty * size:rb - ty * size, ca - tx * size:cb - tx * size
+                ]
+        return out
+
+    def write_window(self, row0: int, col0: int, values: np.ndarray):
+        """Write a block of pixels starting at (row0, col0) into the tiles."""
+        rows, cols = values.shape
+        size = self.tile_size
+        for ty, ra, rb in self._tile_ranges(row0, row0 + rows):
+            for tx, ca, cb in self._tile_ranges(col0, col0 + cols):
+                self.tiles[ty, tx, ra - ty * size:rb - ty * size, ca - tx * size:cb - tx * size] = (
+                    values[ra - row0:rb - row0, ca - col0:cb - col0]
+                )
+
+    def pixel_index(self, lat, lon) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the row and column of the pixel containing each location and
+        a mask of the locations that fall inside the grid.
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        if self.is_global:
+            lon = self.west + (lon - self.west) % 360.0
+        rows = np.floor((self.north - lat) / (self.north - self.south) * self.height).astype(np.int64)
+        cols = np.floor((lon - self.west) / (self.east - self.west) * self.width).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+        return np.clip(rows, 0, self.height - 1), np.clip(cols, 0, self.width - 1), inside
+
+    def sample(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Gather single pixels; only the pages holding them are read."""
+        size = self.tile_size
+        return np.asarray(self.tiles[rows // size, cols // size, rows % size, cols % size])
+
+    def flush(self):
+        if hasattr(self.tiles, 'flush'):
+            self.tiles.flush()
+
+    def publish(self):
+        """Flush a created layer and move its files over the live ones."""
+        self.flush()
+        if self.pending is None:
+            return
+        data_path, meta_path = self.paths(self.name, os.path.dirname(self.path))
+        # Data first: readers look for the layer by its .json file
+        os.replace(data_path + self.pending, data_path)
+        os.replace(meta_path + self.pending, meta_path)
+        self.pending = None
+
+    def row_latitudes(self, row0: int, row1: int) -> np.ndarray:
+        """Latitude of the centre of each pixel row in [row0, row1)."""
+        step = (self.north - self.south) / self.height
+        return self.north - (np.arange(row0, row1) + 0.5) * step
+
+    def col_longitudes(self, col0: int, col1: int) -> np.ndarray:
+        """Longitude of the centre of each pixel column in [col0, col1)."""
+        step = (self.east - self.west) / self.width
+        return self.west + (np.arange(col0, col1) + 0.5) * step
+
+
+class RasterStack:
+    """Layers sharing one grid, read together window by window."""
+
+    def __init__(self, layers: Dict[str, RasterLayer]):
+        if not layers:
+            raise ValueError('A raster stack needs at least one layer')
+        grid = next(iter(layers.values()))
+        for layer in layers.values():
+            if not layer.same_grid(grid):
+                raise ValueError(f'Layer "{layer.name}" is not on the same grid as "{grid.name}"')
+        self.layers = layers
+        self.grid = grid
+
+    @classmethod
+    def open(cls, names=None, root: str = None) -> 'RasterStack':
+        """Open the named layers, or every known layer that has been ingested."""
+        root = root or RASTER_ROOT
+        if names is None:
+            names = [name for name in LAYER_UNITS
+                     if os.path.exists(RasterLayer.paths(name, root)[1])]
+        return cls({name: RasterLayer.open(name, root) for name in names})
+
+    def read_window(self, row0: int, row1: int, col0: int, col1: int) -> Dict[str, np.ndarray]:
+        return {name: layer.read_window(row0, row1, col0, col1)
+                for name, layer in self.layers.items()}
+
+    def sample(self, lat, lon) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Return the layer values at each location and the latitude of the
+        pixel centres they come from. Locations outside the grid are NaN.
+        """
+        rows, cols, inside = self.grid.pixel_index(lat, lon)
+        values = {}
+        for name, layer in self.layers.items():
+            sampled = layer.sample(rows, cols)
+            values[name] = np.where(inside, sampled, np.nan).astype(np.float32)
+        latitudes = self.grid.north - (rows + 0.5) * (self.grid.north - self.grid.south) / self.grid.height
+        return values, latitudes
+
+    def windows(self, block_rows: int = None) -> Iterator[Tuple[int, int]]:
+        """Yield (row0, row1) bands of whole tile rows covering the grid."""
+        block_rows = block_rows or self.grid.tile_size
+        for row0 in range(0, self.grid.height, block_rows):
+            yield row0, min(row0 + block_rows, self.grid.height)
+
+
+def pixel_columns(values: Dict[str, np.ndarray], latitude: np.ndarray):
+    """
+    Turn a window of layer values into RegionColumns for scoring.
+
+    latitude is broadcast against the values, so a window can pass one
+    latitude per row as a column vector.
+
+    Water-equivalent hydrogen stands in for the water release measured at
+    landing sites. Pixels carry no terrain or notes text, so those rules
+    never apply.
+    """
+    from .scoring import RegionColumns
+
+    shape = next(iter(values.values())).shape
+    missing = np.full(shape, np.nan, dtype=np.float32)
+    no = np.zeros(shape, dtype=bool)
+    ph = values.get('ph', missing)
+    perchlorate = values.get('perchlorate', missing)
+    water = values.get('hydrogen', missing)
+    # The temperature layer is stored in kelvin, crop ranges are in °C
+    temperature = values['temperature'] - 273.15 if 'temperature' in values else missing
+    latitude = np.broadcast_to(np.asarray(latitude, dtype=np.float32), shape)
+
+    arrays = {
+        'ph': ph,
+        'latitude': latitude,
+        'perchlorate': perchlorate,
+        'perchlorate_valid': ~np.isnan(perchlorate),
+        'water': water,
+        'water_valid': ~np.isnan(water),
+        'temperature': temperature,
+        'terrain_loam': no,
+        'terrain_sandy': no,
+        'terrain_drained': no,
+        'notes_ice': no,
+        'notes_dust': no,
+        'has_ph_text': ~np.isnan(ph),
+        'has_perchlorate_text': ~np.isnan(perchlorate),
+        'has_terrain': no,
+    }
+    return RegionColumns.from_arrays({name: array.ravel() for name, array in arrays.items()})
+
+
+def score_window(stack: RasterStack, criteria, row0: int, row1: int,
+                 col0: int, col1: int) -> np.ndarray:
+    """Score every pixel of a window for a crop; returns an int8 array."""
+    values = stack.read_window(row0, row1, col0, col1)
+    columns = pixel_columns(values, stack.grid.row_latitudes(row0, row1)[:, None])
+    return columns.score(criteria).astype(np.int8).reshape(row1 - row0, col1 - col0)
+
+
+def score_grid(stack: RasterStack, crop, output: Optional[RasterLayer] = None,
+               block_rows: int = None) -> Optional[np.ndarray]:
+    """
+    Score the whole grid for a crop one band of tile rows at a time.
+
+    Scores are written into output when given (for example a layer made
+    with RasterLayer.create, as the score_raster command does) and None is
+    returned; otherwise they are returned as an in-memory array, so large
+    grids should pass an output. A created output is published by the
+    caller.
+    """
+    from .scoring import get_crop_profile
+
+    criteria = get_crop_profile(crop)
+    grid = stack.grid
+    scores = None if output is not None else np.empty(grid.shape, dtype=np.int8)
+    for row0, row1 in stack.windows(block_rows):
+        band = score_window(stack, criteria, row0, row1, 0, grid.width)
+        if output is not None:
+            output.write_window(row0, 0, band.astype(np.float32))
+        else:
+            scores[row0:row1] = band
+    if output is not None:
+        output.flush()
+    return scores
+
+
+_stack = None
+_stack_key = None
+_stack_lock = threading.Lock()
+
+
+def get_raster_stack() -> Optional[RasterStack]:
+    """
+    Return the stack of ingested layers, reopened when a layer changes on
+    disk, or None when no layer has been ingested.
+    """
+    global _stack, _stack_key
+
+    key = tuple(
+        (name, os.path.getmtime(path))
+        for name in LAYER_UNITS
+        for path in [RasterLayer.paths(name)[0]]
+        if os.path.exists(path)
+    )
+    if not key:
+        return None
+    if _stack is not None and _stack_key == key:
+        return _stack
+
+    with _stack_lock:
+        if _stack is None or _stack_key != key:
+            _stack = RasterStack.open([name for name, _ in key])
+            _stack_key = key
+    return _stack
@@ -0,0 +1,140 @@
+"""
+Read-only in-process copy of the reference tables.
+
+Regions, crops and sites change only when data is loaded, so read endpoints
+serve them from a DataRepository instead of querying the ORM per request.
+A repository is loaded with one query per table the first time it is
+needed for a data version. It holds tuples of immutable slotted records in
+the models' default ordering, plus lookups by id. Each data version
+gets a new, fully built repository that replaces the old one with a single
+reference assignment. Readers take the repository once per request, so a
+reload never exposes a half-built state.
+
+Records carry the model field names, so serializers, scoring and the name
+index accept them in place of model instances.
+"""
+
+import bisect
+import threading
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from asgiref.sync import sync_to_async
+
+from .cache import aget_data_version, get_data_version
+from .models import BOOKKEEPING_FIELDS, MarsCrop, MarsRegion, MarsSite
+
+
+def _record_fields(model) -> Tuple[str, ...]:
+    """Concrete field names of a model, without the ingest bookkeeping."""
+    return tuple(
+        field.attname for field in model._meta.concrete_fields
+        if field.attname not in BOOKKEEPING_FIELDS
+    )
+
+
+class RegionRecord(namedtuple('RegionRecord', _record_fields(MarsRegion))):
+    """Immutable MarsRegion row."""
+    __slots__ = ()
+
+
+class CropRecord(namedtuple('CropRecord', _record_fields(MarsCrop))):
+    """Immutable MarsCrop row."""
+    __slots__ = ()
+
+
+class SiteRecord(namedtuple('SiteRecord', _record_fields(MarsSite))):
+    """Immutable MarsSite row."""
+    __slots__ = ()
+
+
+class RecordTable:
+    """Records in (sort_field, id) order, with lookups by id and cursor position."""
+
+    def __init__(self, records: Sequence, sort_field: str):
+        self.sort_field = sort_field
+        self.records = tuple(sorted(records, key=lambda record: (getattr(record, sort_field), record.id)))
+        self.keys = [(getattr(record, sort_field), record.id) for record in self.records]
+        self.by_id = {record.id: record for record in self.records}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def after(self, sort_value, pk) -> int:
+        """Position of the first record sorted after (sort_value, pk)."""
+        return bisect.bisect_right(self.keys, (sort_value, pk))
+
+    def in_order(self, ids) -> List:
+        """Records for ids in the given order, skipping unknown ids."""
+        by_id = self.by_id
+        return [by_id[pk] for pk in ids if pk in by_id]
+
+
+class DataRepository:
+    """Regions, crops and sites of one data version."""
+
+    def __init__(self, version, regions, crops, sites):
+        self.version = version
+        self.regions = RecordTable(regions, 'region')
+        self.crops = RecordTable(crops, 'crop')
+        self.sites = RecordTable(sites, 'name')
+
+    @classmethod
+    def load(cls, version) -> 'DataRepository':
+        def records(model, record):
+            return [record._make(row) for row in model.objects.values_list(*record._fields)]
+
+        return cls(
+            version,
+            records(MarsRegion, RegionRecord),
+            records(MarsCrop, CropRecord),
+            records(MarsSite, SiteRecord),
+        )
+
+    def stats(self) -> Dict:
+        return {
+            'data_version': self.version,
+            'regions': len(self.regions),
+            'crops': len(self.crops),
+            'sites': len(self.sites),
+        }
+
+
+_repository: Optional[DataRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_repository() -> DataRepository:
+    """Return the repository of the current data version, loading it if needed."""
+    global _repository
+
+    version = get_data_version()
+    repository = _repository
+    if repository is not None and repository.version == version:
+        return repository
+
+    with _repository_lock:
+        if _repository is None or _repository.version != version:
+            # Build completely before publishing so readers see old or new, never partial
+            _repository = DataRepository.load(version)
+        return _repository
+
+
+async def aget_repository() -> DataRepository:
+    """Async variant of get_repository; loading runs off the event loop."""
+    repository = _repository
+    if repository is not None and repository.version == await aget_data_version():
+        return repository
+    return await sync_to_async(get_repository)()
+
+
+def repository_stats() -> Optional[Dict]:
+    """Sizes and data version of the loaded repository, without loading one."""
+    repository = _repository
+    return None if repository is None else repository.stats()
@@ -0,0 +1,270 @@
+"""
+Declarative scoring rules compiled into vectorized evaluators.
+
+A rule set is a JSON document listing groups of outcomes. Each outcome has
+a reason code, a weight, a reason template and a predicate over region
+columns and crop criteria:
+
+    {"flag": "terrain_loam"}                 boolean region column
+    {"known": "latitude"}                    numeric region column is not NaN
+    {"field": "water", "op": "gt", "value": 1.5}
+    {"field": "latitude", "op": "abs_le", "value": 15}
+    {"field": "ph", "between": [{"crop": "ph_min"}, {"crop": "ph_max"}]}
+    {"crop": "wants_loam"}                   crop criteria flag
+    {"all": [...]}, {"any": [...]}, {"not": {...}}
+
+In an exclusive group an outcome only applies where no earlier outcome of
+the group did. Rule sets are compiled once into closures over NumPy arrays
+and cached by the SHA-256 of their canonical JSON. Region-only predicates
+are cached on the columns they were evaluated for, and crop-only predicates
+are folded to constants before any array work, so a crop evaluation does
+no interpretation beyond combining a few masks.
+"""
+
+import hashlib
+import json
+import operator
+import os
+import re
+import threading
+from typing import Callable, Dict, Iterable, List
+
+import numpy as np
+
+RULES_DIR = os.path.join(os.path.dirname(__file__), 'rules')
+PROFILE_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+
+_COMPARISONS = {
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+    'eq': operator.eq,
+}
+
+
+class Predicate:
+    """A compiled predicate: fn(columns, criteria) -> bool array or bool."""
+
+    def __init__(self, key: str, fn: Callable, region_only: bool, crop_only: bool):
+        self.key = key
+        self.fn = fn
+        self.region_only = region_only
+        self.crop_only = crop_only
+
+
+class RuleSetCompiler:
+    """Compile predicate specs, recording the fields they read."""
+
+    def __init__(self):
+        self.region_fields = set()
+        self.crop_attributes = set()
+
+    def bound(self, value):
+        """Return (getter(criteria), depends_on_crop) for a number or crop reference."""
+        if isinstance(value, dict) and set(value) == {'crop'}:
+            name = value['crop']
+            self.crop_attributes.add(name)
+            return (lambda criteria: getattr(criteria, name)), True
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            number = float(value)
+            return (lambda criteria: number), False
+        raise ValueError(f'Expected a number or {{"crop": ...}}, got {value!r}')
+
+    def compile(self, spec) -> Predicate:
+        if not isinstance(spec, dict) or not spec:
+            raise ValueError(f'Invalid predicate: {spec!r}')
+        key = json.dumps(spec, sort_keys=True)
+
+        if 'all' in spec or 'any' in spec:
+            return self._combine(spec, key)
+        if 'not' in spec:
+            inner = self.compile(spec['not'])
+
+            def negate(columns, criteria):
+                value = _evaluate(inner, columns, criteria)
+                return (not value) if isinstance(value, bool) else ~value
+            return Predicate(key, negate, inner.region_only, inner.crop_only)
+        if 'crop' in spec:
+            name = spec['crop']
+            self.crop_attributes.add(name)
+            return Predicate(key, lambda columns, criteria: bool(getattr(criteria, name)), False, True)
+        if 'flag' in spec:
+            name = spec['flag']
+            self.region_fields.add(name)
+            return Predicate(key, lambda columns, criteria: getattr(columns, name), True, False)
+        if 'known' in spec:
+            name = spec['known']
+            self.region_fields.add(name)
+            return Predicate(key, lambda columns, criteria: ~np.isnan(getattr(columns, name)), True, False)
+        if 'field' in spec:
+            return self._compare(spec, key)
+        raise ValueError(f'Unknown predicate: {spec!r}')
+
+    def _combine(self, spec, key) -> Predicate:
+        conjunction = 'all' in spec
+        children = [self.compile(child) for child in spec['all' if conjunction else 'any']]
+        # Crop-only terms first, so a False/True constant short-circuits
+        children.sort(key=lambda child: not child.crop_only)
+        stop = False if conjunction else True
+        combine = operator.and_ if conjunction else operator.or_
+
+        def evaluate(columns, criteria):
+            result = not stop
+            for child in children:
+                value = _evaluate(child, columns, criteria)
+                if isinstance(value, bool):
+                    if value is stop:
+                        return stop
+                    continue
+                result = value if isinstance(result, bool) else combine(result, value)
+            return result
+
+        return Predicate(
+            key, evaluate,
+            all(child.region_only for child in children),
+            all(child.crop_only for child in children),
+        )
+
+    def _compare(self, spec, key) -> Predicate:
+        name = spec['field']
+        self.region_fields.add(name)
+
+        if 'between' in spec:
+            (low, low_crop), (high, high_crop) = (self.bound(v) for v in spec['between'])
+
+            def between(columns, criteria):
+                values = getattr(columns, name)
+                return (low(criteria) <= values) & (values <= high(criteria))
+            return Predicate(key, between, not (low_crop or high_crop), False)
+
+        op = spec.get('op', '')
+        absolute = op.startswith('abs_')
+        compare = _COMPARISONS.get(op[4:] if absolute else op)
+        if compare is None:
+            raise ValueError(f'Unknown comparison "{op}"')
+        value, value_crop = self.bound(spec.get('value'))
+
+        def comparison(columns, criteria):
+            values = getattr(columns, name)
+            return compare(np.abs(values) if absolute else values, value(criteria))
+        return Predicate(key, comparison, not value_crop, False)
+
+
+def _evaluate(predicate: Predicate, columns, criteria):
+    """Evaluate a predicate, reusing region-only results cached on columns."""
+    if not predicate.region_only:
+        return predicate.fn(columns, criteria)
+    cache = columns.mask_cache
+    mask = cache.get(predicate.key)
+    if mask is None:
+        mask = cache[predicate.key] = predicate.fn(columns, criteria)
+    return mask
+
+
+class CompiledRuleSet:
+    """Outcomes of a rule set in reason order, ready to evaluate."""
+
+    def __init__(self, config: Dict, digest: str):
+        self.config = config
+        self.digest = digest
+        self.name = config.get('name', digest[:12])
+        self.version = config.get('version', 1)
+
+        compiler = RuleSetCompiler()
+        self.outcomes = []  # (code, predicate, group index, exclusive)
+        self.weights: Dict[str, int] = {}
+        self.templates: Dict[str, str] = {}
+        for index, group in enumerate(config.get('groups', [])):
+            exclusive = bool(group.get('exclusive', False))
+            for outcome in group.get('outcomes', []):
+                code = outcome['code']
+                if code in self.templates:
+                    raise ValueError(f'Duplicate reason code "{code}"')
+                self.outcomes.append((code, compiler.compile(outcome['when']), index, exclusive))
+                self.weights[code] = int(outcome.get('weight', 0))
+                self.templates[code] = outcome.get('reason', code)
+        self.region_fields = compiler.region_fields
+        self.crop_attributes = compiler.crop_attributes
+        self.codes = list(self.templates)
+
+    def evaluate(self, columns, criteria) -> Dict[str, np.ndarray]:
+        """Return one boolean mask per outcome for every region in columns."""
+        size = len(columns)
+        masks = {}
+        taken = {}
+        for code, predicate, group, exclusive in self.outcomes:
+            value = _evaluate(predicate, columns, criteria)
+            if isinstance(value, bool) or np.ndim(value) == 0:
+                mask = np.full(size, bool(value))
+            else:
+                mask = np.asarray(value, dtype=bool)
+            if exclusive:
+                if group in taken:
+                    mask = mask & ~taken[group]
+                    taken[group] = taken[group] | mask
+                else:
+                    taken[group] = mask
+            masks[code] = mask
+        return masks
+
+    def score(self, masks: Dict[str, np.ndarray], size: int) -> np.ndarray:
+        """Sum the weights of every outcome that applies to each region."""
+        scores = np.zeros(size, dtype=np.int64)
+        for code, weight in self.weights.items():
+            if weight:
+                scores += weight * masks[code]
+        return scores
+
+    def render(self, codes: Iterable[str], **values) -> List[str]:
+        """Turn reason codes into text using the region's measured values."""
+        return [self.templates[code].format(**values) for code in codes]
+
+
+def ruleset_digest(config: Dict) -> str:
+    return hashlib.sha256(
+        json.dumps(config, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    ).hexdigest()
+
+
+_compiled: Dict[str, CompiledRuleSet] = {}
+_files: Dict[str, tuple] = {}
+_lock = threading.Lock()
+
+
+def compile_ruleset(config: Dict) -> CompiledRuleSet:
+    """Compile a rule set, reusing the compiled form of identical configs."""
+    digest = ruleset_digest(config)
+    rules = _compiled.get(digest)
+    if rules is None:
+        rules = CompiledRuleSet(config, digest)
+        with _lock:
+            rules = _compiled.setdefault(digest, rules)
+    return rules
+
+
+def load_ruleset(name: str, directory: str = None) -> CompiledRuleSet:
+    """
+    Compile the rule set stored as <name>.json, re-reading the file only
+    when it changes. Raises ValueError for invalid names or rule sets.
+    """
+    if not PROFILE_NAME.match(name or ''):
+        raise ValueError(f'Invalid scoring profile "{name}"')
+    path = os.path.join(directory or RULES_DIR, f'{name}.json')
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        raise ValueError(f'Unknown scoring profile "{name}"')
+
+    cached = _files.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as file:
+        rules = compile_ruleset(json.load(file))
+    _files[path] = (mtime, rules)
+    return rules
+
+
+def available_profiles(directory: str = None) -> List[str]:
+    directory = directory or RULES_DIR
+    return sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
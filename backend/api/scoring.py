@@ -0,0 +1,428 @@
+"""
+Columnar scoring engine for crop-to-region matching.
+
+Region attributes are parsed once into NumPy arrays so that every rule group
+of the matching algorithm can be evaluated for all regions in a single pass.
+"""
+
+import threading
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from .cache import LRUCache, get_data_version
+from .ruleset import CompiledRuleSet, load_ruleset
+from .utils import (
+    CONFIDENCE_MEASURED,
+    parse_humidity_range,
+    parse_ph_range,
+    parse_temperature_range,
+    tokenize_features,
+)
+
+# MarsRegion columns read by RegionColumns, in row order.
+REGION_COLUMN_FIELDS = (
+    'id',
+    'region',
+    'ph',
+    'perchlorate_wt_pct',
+    'terrain_type',
+    'notes',
+    'latitude_value',
+    'ph_value',
+    'perchlorate_value',
+    'perchlorate_confidence',
+    'water_release_value',
+    'water_release_confidence',
+)
+
+
+# RegionColumns arrays read by evaluate(); the has_* flags are derived from text.
+SCORING_ARRAYS = (
+    'ph',
+    'latitude',
+    'perchlorate',
+    'perchlorate_valid',
+    'water',
+    'water_valid',
+    'temperature',
+    'terrain_loam',
+    'terrain_sandy',
+    'terrain_drained',
+    'notes_ice',
+    'notes_dust',
+    'has_ph_text',
+    'has_perchlorate_text',
+    'has_terrain',
+)
+
+
+# CropProfile attributes that scoring rules may refer to.
+CRITERIA_ATTRIBUTES = (
+    'ph_min',
+    'ph_max',
+    'has_ph_range',
+    'temp_min',
+    'temp_max',
+    'day_temp_min',
+    'day_temp_max',
+    'night_temp_min',
+    'night_temp_max',
+    'has_temperature_range',
+    'humidity_min',
+    'humidity_max',
+    'has_humidity_range',
+    'has_soil_texture',
+    'wants_loam',
+    'wants_sandy',
+    'wants_well_drained',
+    'wants_moisture',
+)
+
+
+def _mentions(tokens: frozenset, stem: str) -> bool:
+    return any(stem in token for token in tokens)
+
+
+class CropProfile:
+    """
+    Crop requirements parsed once into numeric intervals and feature tokens.
+
+    Temperatures are in °C and humidity in % RH; bounds that the crop data
+    does not give are None. Instances are immutable by convention and
+    shared between requests through get_crop_profile().
+    """
+
+    __slots__ = CRITERIA_ATTRIBUTES + ('crop_id', 'soil_tokens', 'moisture_tokens')
+
+    def __init__(self, crop):
+        self.crop_id = getattr(crop, 'id', None)
+        self.ph_min, self.ph_max = parse_ph_range(crop.preferred_ph_range)
+        self.has_ph_range = self.ph_min is not None and self.ph_max is not None
+
+        day, night = parse_temperature_range(crop.temperature_range_c)
+        self.day_temp_min, self.day_temp_max = day
+        self.night_temp_min, self.night_temp_max = night
+        known = [t for t in day + night if t is not None]
+        self.temp_min = min(known) if known else None
+        self.temp_max = max(known) if known else None
+        self.has_temperature_range = bool(known)
+
+        self.humidity_min, self.humidity_max = parse_humidity_range(crop.humidity_rh_range)
+        self.has_humidity_range = self.humidity_min is not None
+
+        self.soil_tokens = tokenize_features(crop.terrain_soil_texture)
+        self.moisture_tokens = tokenize_features(crop.moisture_regime)
+        self.has_soil_texture = bool((crop.terrain_soil_texture or '').strip())
+        self.wants_loam = _mentions(self.soil_tokens, 'loam')
+        self.wants_sandy = _mentions(self.soil_tokens, 'sandy')
+        self.wants_well_drained = 'well-drained' in self.soil_tokens
+        self.wants_moisture = _mentions(self.moisture_tokens, 'moisture')
+
+    def __repr__(self):
+        return f'<CropProfile crop={self.crop_id} pH={self.ph_min}-{self.ph_max} T={self.temp_min}-{self.temp_max}>'
+
+
+_crop_profiles = LRUCache(max_entries=1024)
+
+
+def get_crop_profile(crop) -> CropProfile:
+    """
+    Return the parsed profile of a crop, built once per data version.
+
+    Crop saves bump the data version, so edited requirements are re-parsed.
+    Unsaved crops have no stable key and are parsed on every call.
+    """
+    crop_id = getattr(crop, 'id', None)
+    if crop_id is None:
+        return CropProfile(crop)
+    key = (get_data_version(), crop_id)
+    profile = _crop_profiles.get(key)
+    if profile is None:
+        profile = CropProfile(crop)
+        _crop_profiles.set(key, profile)
+    return profile
+
+
+class RegionColumns:
+    """
+    Region attributes held as parallel NumPy arrays.
+
+    Numeric columns use NaN for missing values; the accompanying boolean masks
+    record which rules apply to each region. Raw text is kept in plain lists
+    because it is only needed to render the top matches.
+    """
+
+    def __init__(self, ids, names, ph_text, perchlorate_text, terrain_text,
+                 ph, latitude, perchlorate, perchlorate_valid,
+                 water, water_valid, temperature, terrain_loam, terrain_sandy,
+                 terrain_drained, notes_ice, notes_dust):
+        self.ids = ids
+        self.names = names
+        self.ph_text = ph_text
+        self.perchlorate_text = perchlorate_text
+        self.terrain_text = terrain_text
+
+        self.ph = ph
+        self.latitude = latitude
+        self.perchlorate = perchlorate
+        self.perchlorate_valid = perchlorate_valid
+        self.water = water
+        self.water_valid = water_valid
+        self.temperature = temperature
+        self.terrain_loam = terrain_loam
+        self.terrain_sandy = terrain_sandy
+        self.terrain_drained = terrain_drained
+        self.notes_ice = notes_ice
+        self.notes_dust = notes_dust
+
+        self.has_ph_text = np.array([bool(t) for t in ph_text], dtype=bool)
+        self.has_perchlorate_text = np.array(
+            [bool(t) for t in perchlorate_text], dtype=bool
+        )
+        self.has_terrain = np.array([bool(t) for t in terrain_text], dtype=bool)
+        # Region-only rule predicates, filled in by api.ruleset
+        self.mask_cache = {}
+
+    def __len__(self):
+        return len(self.ph)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Return the arrays read by evaluate(), keyed by attribute name."""
+        return {name: getattr(self, name) for name in SCORING_ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'RegionColumns':
+        """
+        Build text-free columns from the arrays of another instance.
+
+        The result can be scored but not rendered, which is all worker
+        processes scoring shared-memory shards need.
+        """
+        columns = cls.__new__(cls)
+        columns.ids = None
+        columns.names = columns.ph_text = columns.perchlorate_text = columns.terrain_text = None
+        for name in SCORING_ARRAYS:
+            setattr(columns, name, arrays[name])
+        columns.mask_cache = {}
+        return columns
+
+    def take(self, indices) -> 'RegionColumns':
+        """Return a new instance holding only the given rows."""
+        indices = np.asarray(indices, dtype=np.int64)
+        return RegionColumns(
+            ids=self.ids[indices],
+            names=[self.names[i] for i in indices],
+            ph_text=[self.ph_text[i] for i in indices],
+            perchlorate_text=[self.perchlorate_text[i] for i in indices],
+            terrain_text=[self.terrain_text[i] for i in indices],
+            **{name: getattr(self, name)[indices] for name in SCORING_ARRAYS
+               if not name.startswith('has_')},
+        )
+
+    @classmethod
+    def from_queryset(cls, queryset) -> 'RegionColumns':
+        """Build columns straight from the parsed numeric database columns."""
+        return cls.from_rows(queryset.values_list(*REGION_COLUMN_FIELDS))
+
+    @classmethod
+    def from_regions(cls, regions: Iterable) -> 'RegionColumns':
+        """Build columns from MarsRegion instances."""
+        return cls.from_rows(
+            tuple(getattr(region, field) for field in REGION_COLUMN_FIELDS)
+            for region in regions
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Iterable) -> 'RegionColumns':
+        """Build columns from tuples ordered as REGION_COLUMN_FIELDS."""
+        ids, names, ph_text, perchlorate_text, terrain_text = [], [], [], [], []
+        ph, latitude, perchlorate, water = [], [], [], []
+        perchlorate_valid, water_valid = [], []
+        terrain_loam, terrain_sandy, terrain_drained = [], [], []
+        notes_ice, notes_dust = [], []
+
+        for (pk, name, ph_str, perchlorate_str, terrain_type, notes,
+             latitude_value, ph_value, perchlorate_value, perchlorate_confidence,
+             water_value, water_confidence) in rows:
+            ids.append(-1 if pk is None else pk)
+            names.append(name)
+            ph_text.append(ph_str)
+            perchlorate_text.append(perchlorate_str)
+            terrain_text.append(terrain_type)
+
+            ph.append(np.nan if ph_value is None else ph_value)
+            latitude.append(np.nan if latitude_value is None else latitude_value)
+
+            # Only plain numbers count for the perchlorate and water rules;
+            # annotated values such as "0.4 (Rocknest)" are reported as unclear.
+            valid = perchlorate_confidence == CONFIDENCE_MEASURED
+            perchlorate_valid.append(valid)
+            perchlorate.append(perchlorate_value if valid else np.nan)
+            valid = water_confidence == CONFIDENCE_MEASURED
+            water_valid.append(valid)
+            water.append(water_value if valid else np.nan)
+
+            terrain = (terrain_type or '').lower()
+            terrain_loam.append('loam' in terrain)
+            terrain_sandy.append('sandy' in terrain)
+            terrain_drained.append('drained' in terrain)
+
+            notes = (notes or '').lower()
+            notes_ice.append('ice' in notes)
+            notes_dust.append('dust' in notes)
+
+        return cls(
+            ids=np.array(ids, dtype=np.int64),
+            names=names,
+            ph_text=ph_text,
+            perchlorate_text=perchlorate_text,
+            terrain_text=terrain_text,
+            ph=np.array(ph, dtype=float),
+            latitude=np.array(latitude, dtype=float),
+            perchlorate=np.array(perchlorate, dtype=float),
+            perchlorate_valid=np.array(perchlorate_valid, dtype=bool),
+            water=np.array(water, dtype=float),
+            water_valid=np.array(water_valid, dtype=bool),
+            # Landing sites record no surface temperature; raster pixels do
+            temperature=np.full(len(ids), np.nan),
+            terrain_loam=np.array(terrain_loam, dtype=bool),
+            terrain_sandy=np.array(terrain_sandy, dtype=bool),
+            terrain_drained=np.array(terrain_drained, dtype=bool),
+            notes_ice=np.array(notes_ice, dtype=bool),
+            notes_dust=np.array(notes_dust, dtype=bool),
+        )
+
+    def evaluate(self, criteria: CropProfile, rules: CompiledRuleSet = None) -> Dict[str, np.ndarray]:
+        """Evaluate every rule group and return one boolean mask per outcome."""
+        return (rules or get_rules()).evaluate(self, criteria)
+
+    def score(self, criteria: CropProfile, rules: CompiledRuleSet = None) -> np.ndarray:
+        """Return the integer score of every region for the given crop."""
+        rules = rules or get_rules()
+        return rules.score(rules.evaluate(self, criteria), len(self))
+
+    def outcomes(self, masks: Dict[str, np.ndarray], index: int) -> List[str]:
+        """Return the reason codes that apply to a single region, in rule order."""
+        return [code for code in masks if masks[code][index]]
+
+    def reasons(self, masks: Dict[str, np.ndarray], index: int,
+                rules: CompiledRuleSet = None) -> List[str]:
+        """Render the human-readable reasons for a single region."""
+        return (rules or get_rules()).render(
+            self.outcomes(masks, index),
+            ph=float(self.ph[index]),
+            perchlorate=float(self.perchlorate[index]),
+            water=float(self.water[index]),
+            temperature=float(self.temperature[index]),
+        )
+
+    def result(self, masks: Dict[str, np.ndarray], scores: np.ndarray, index: int,
+               rules: CompiledRuleSet = None) -> Dict:
+        """Build the match dictionary returned by the API for one region."""
+        latitude = self.latitude[index]
+        return {
+            'region': self.names[index],
+            'score': int(scores[index]),
+            'reasons': self.reasons(masks, index, rules),
+            'latitude': None if np.isnan(latitude) else float(latitude),
+            'perchlorate': self.perchlorate_text[index],
+            'ph': self.ph_text[index],
+            'terrain': self.terrain_text[index],
+        }
+
+    def match(self, crop, top_n: int = 3, rules: CompiledRuleSet = None) -> List[Dict]:
+        """Score all regions for a crop and return the top_n matches."""
+        rules = rules or get_rules()
+        criteria = get_crop_profile(crop)
+        masks = rules.evaluate(self, criteria)
+        scores = rules.score(masks, len(self))
+
+        order = top_indices(scores, top_n)
+        return [self.result(masks, scores, int(i), rules) for i in order]
+
+
+def top_indices(scores: np.ndarray, top_n: int) -> np.ndarray:
+    """
+    Return the indices of the top_n scores, best first.
+
+    Regions with equal scores keep their input order, as with a stable sort.
+    Only the selected candidates are sorted, so the cost is O(R + N log N).
+    """
+    if top_n < 0 or top_n >= len(scores):
+        return np.argsort(-scores, kind='stable')[:top_n]
+    if top_n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Unique keys: higher score first, then lower position first.
+    keys = scores.astype(np.int64) * len(scores) - np.arange(len(scores))
+    candidates = np.argpartition(-keys, top_n - 1)[:top_n]
+    return candidates[np.argsort(-keys[candidates])]
+
+
+# Profile used when none is requested, from api/rules/default.json. Like any
+# profile it is re-read when the file changes, so callers fetch it through
+# get_rules() instead of holding on to it.
+DEFAULT_PROFILE = 'default'
+
+
+def get_rules(profile: str = None) -> CompiledRuleSet:
+    """
+    Return the compiled rules of a scoring profile, or the default rules.
+
+    Raises ValueError for unknown profiles and for rules that read region
+    columns or crop criteria the scorer does not provide.
+    """
+    profile = profile or DEFAULT_PROFILE
+    rules = load_ruleset(profile)
+    unknown = sorted((rules.region_fields - set(SCORING_ARRAYS))
+                     | (rules.crop_attributes - set(CRITERIA_ATTRIBUTES)))
+    if unknown:
+        raise ValueError(f'Scoring profile "{profile}" uses unknown fields: {", ".join(unknown)}')
+    return rules
+
+
+def render_reasons(codes: Iterable[str], ph=None, perchlorate=None, water=None,
+                   temperature=None, rules: CompiledRuleSet = None) -> List[str]:
+    """
+    Turn reason codes into text using the region's measured values.
+
+    Missing values render as NaN, the same as RegionColumns.reasons renders
+    them, so a template formats identically on the matrix and live paths.
+    """
+    values = {'ph': ph, 'perchlorate': perchlorate, 'water': water, 'temperature': temperature}
+    return (rules or get_rules()).render(
+        codes, **{name: np.nan if value is None else float(value) for name, value in values.items()}
+    )
+
+
+_region_columns = None
+_region_columns_version = None
+_region_columns_lock = threading.Lock()
+
+
+def get_region_columns() -> RegionColumns:
+    """
+    Return columns for all regions, reloaded when the data version changes.
+
+    Columns are mapped from the data snapshot when a current one exists and
+    built from the data repository otherwise.
+    """
+    from .repository import get_repository
+    from .snapshot import get_snapshot
+
+    global _region_columns, _region_columns_version
+
+    version = get_data_version()
+    if _region_columns is not None and _region_columns_version == version:
+        return _region_columns
+
+    with _region_columns_lock:
+        if _region_columns is None or _region_columns_version != version:
+            snapshot = get_snapshot()
+            if snapshot is not None:
+                _region_columns = snapshot.region_columns()
+            else:
+                _region_columns = RegionColumns.from_regions(get_repository().regions)
+            _region_columns_version = version
+    return _region_columns
@@ -0,0 +1,225 @@
+"""
+In-memory crop name index for autocomplete and name resolution.
+
+Every crop is indexed under its full name, the common and scientific names
+split out of entries such as "Tomato (Solanum lycopersicum)" and the extra
+aliases in CROP_ALIASES. Terms are normalized (case, accents, punctuation)
+and kept in a sorted list for prefix lookups and a trigram posting map for
+substring and typo-tolerant lookups, so a query only ever touches the few
+terms that share a trigram with it. The index is rebuilt when the data
+version changes.
+
+Resolving a name to a single crop is stricter than search: only exact
+names and aliases and unambiguous (word) prefixes resolve, so a query
+never silently answers for a different crop. Substring and fuzzy matches
+are offered as suggestions instead.
+"""
+
+import bisect
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from .cache import get_data_version
+from .repository import get_repository
+
+# Extra names a crop is known by, keyed by the common part of its name.
+CROP_ALIASES = {
+    'tomato': ['Solanum lycopersicum'],
+    'carrot': ['Daucus carota'],
+    'cress': ['garden cress', 'Lepidium sativum'],
+    'field mustard': ['Brassica rapa', 'turnip rape'],
+    'rye': ['cereal rye', 'Secale cereale'],
+    'common vetch': ['Vicia sativa', 'vetch'],
+    'moringa oleifera': ['moringa', 'drumstick tree'],
+}
+
+# Match kinds, best first; a crop is ranked by its best matching term.
+EXACT = 0
+PREFIX = 1
+WORD_PREFIX = 2
+SUBSTRING = 3
+FUZZY = 4
+MATCH_KINDS = ('exact', 'prefix', 'word_prefix', 'substring', 'fuzzy')
+# Match kinds precise enough to resolve a name to a crop.
+RESOLVE_KINDS = ('exact', 'prefix', 'word_prefix')
+
+# Trigram similarity below which a fuzzy candidate is dropped.
+MIN_SIMILARITY = 0.3
+
+_SCIENTIFIC_NAME = re.compile(r'^[A-Z][a-z]+ [a-z]+$')
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse everything but letters and digits."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def trigrams(term: str) -> set:
+    """Trigrams of a normalized term, padded so word starts weigh more."""
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def crop_terms(name: str) -> List[tuple]:
+    """Return (term, is_alias) pairs a crop name is indexed under."""
+    terms = [(name, False)]
+    match = re.match(r'^(.*?)\s*\((.*)\)\s*$', name)
+    common = match.group(1) if match else name
+    if match:
+        terms.append((common, True))
+        # Parenthesised binomials are scientific names; "(hydroponic)" is not
+        if _SCIENTIFIC_NAME.match(match.group(2).strip()):
+            terms.append((match.group(2).strip(), True))
+    terms.extend((alias, True) for alias in CROP_ALIASES.get(normalize(common), []))
+
+    seen = set()
+    result = []
+    for term, is_alias in terms:
+        key = normalize(term)
+        if key and key not in seen:
+            seen.add(key)
+            result.append((key, is_alias))
+    return result
+
+
+class CropNameIndex:
+    """Prefix and trigram index from normalized names and aliases to crop ids."""
+
+    def __init__(self, crops):
+        self.crops: Dict[int, object] = {}
+        self.terms: List[tuple] = []  # (term, crop id, is_alias)
+        self.postings = defaultdict(list)
+        for crop in sorted(crops, key=lambda crop: crop.id):
+            self.crops[crop.id] = crop
+            for term, is_alias in crop_terms(crop.crop):
+                position = len(self.terms)
+                self.terms.append((term, crop.id, is_alias))
+                for gram in trigrams(term):
+                    self.postings[gram].append(position)
+        self.trigram_sets = [trigrams(term) for term, _, _ in self.terms]
+        # Every word start of every term, for prefix lookups by bisection
+        self.prefixes = sorted(
+            (term[start:], position)
+            for position, (term, _, _) in enumerate(self.terms)
+            for start in [0] + [m.end() for m in re.finditer(' ', term)]
+        )
+
+    def __len__(self):
+        return len(self.crops)
+
+    def _candidates(self, query: str) -> set:
+        positions = set()
+        index = bisect.bisect_left(self.prefixes, (query,))
+        while index < len(self.prefixes) and self.prefixes[index][0].startswith(query):
+            positions.add(self.prefixes[index][1])
+            index += 1
+        for gram in trigrams(query):
+            positions.update(self.postings.get(gram, ()))
+        return positions
+
+    def _rank(self, query: str, query_grams: set, position: int) -> Optional[tuple]:
+        term, crop_id, is_alias = self.terms[position]
+        grams = self.trigram_sets[position]
+        similarity = len(query_grams & grams) / len(query_grams | grams)
+        if term == query:
+            kind = EXACT
+        elif term.startswith(query):
+            kind = PREFIX
+        elif f' {query}' in f' {term}':
+            kind = WORD_PREFIX
+        elif query in term:
+            kind = SUBSTRING
+        elif similarity >= MIN_SIMILARITY:
+            kind = FUZZY
+        else:
+            return None
+        # Names before aliases and shorter names first break ties deterministically
+        return (kind, -similarity, is_alias, len(self.crops[crop_id].crop), crop_id), term
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Return up to limit crops matching query, best first."""
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        query_grams = trigrams(query)
+
+        best = {}
+        for position in self._candidates(query):
+            ranked = self._rank(query, query_grams, position)
+            if ranked is None:
+                continue
+            crop_id = self.terms[position][1]
+            if crop_id not in best or ranked[0] < best[crop_id][0]:
+                best[crop_id] = ranked
+
+        results = []
+        for key, term in sorted(best.values())[:limit]:
+            crop = self.crops[key[-1]]
+            results.append({
+                'id': crop.id,
+                'crop': crop.crop,
+                'matched': term,
+                'match': MATCH_KINDS[key[0]],
+                'similarity': round(-key[1], 3),
+            })
+        return results
+
+    def resolve(self, query: str):
+        """
+        Return the crop a name refers to, or None.
+
+        Exact names and aliases resolve, as do prefixes and word prefixes
+        shared by the terms of a single crop; anything looser or ambiguous
+        does not.
+        """
+        results = self.search(query, limit=len(self.crops))
+        if not results or results[0]['match'] not in RESOLVE_KINDS:
+            return None
+        best = results[0]
+        if best['match'] != 'exact' and any(
+            result['match'] == best['match'] and result['id'] != best['id'] for result in results
+        ):
+            return None
+        return self.crops[best['id']]
+
+    def suggest(self, query: str, limit: int = 5) -> List[str]:
+        """Names of the crops closest to a query that did not resolve."""
+        return [result['crop'] for result in self.search(query, limit)]
+
+
+_crop_index = None
+_crop_index_key = None
+_crop_index_lock = threading.Lock()
+
+
+def get_crop_index() -> CropNameIndex:
+    """Return the crop name index, rebuilding it after data changes."""
+    global _crop_index, _crop_index_key
+
+    key = get_data_version()
+    if _crop_index is not None and _crop_index_key == key:
+        return _crop_index
+
+    with _crop_index_lock:
+        if _crop_index is None or _crop_index_key != key:
+            _crop_index = CropNameIndex(get_repository().crops)
+            _crop_index_key = key
+    return _crop_index
+
+
+def resolve_crop(name: str):
+    """Resolve a user-supplied crop name to a MarsCrop, or None."""
+    return get_crop_index().resolve(name)
+
+
+def crop_not_found(name: str) -> Dict:
+    """Error body for a crop name that did not resolve, with suggestions."""
+    return {
+        'error': f'Crop "{name}" not found',
+        'suggestions': get_crop_index().suggest(name),
+    }
@@ -0,0 +1,57 @@
+"""
+Model signal handlers that keep derived data in sync with the reference tables,
+plus the hook that instruments new database connections.
+"""
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import suitability
+from .cache import bump_data_version
+from .metrics import record_query
+from .models import IngestedFile, MarsCrop, MarsRegion, MarsSite
+
+
+@receiver(post_save, sender=MarsCrop)
+def update_crop_suitability(sender, instance, raw=False, **kwargs):
+    """Recompute the suitability row of a saved crop."""
+    if raw or not suitability.matrix_current():
+        return
+    suitability.rebuild_crop(instance)
+
+
+@receiver(post_save, sender=MarsRegion)
+def update_region_suitability(sender, instance, raw=False, **kwargs):
+    """Recompute the suitability column of a saved region."""
+    if raw or not suitability.matrix_current():
+        return
+    suitability.rebuild_region(instance)
+
+
+@receiver(post_save, sender=MarsCrop)
+@receiver(post_save, sender=MarsRegion)
+@receiver(post_save, sender=MarsSite)
+@receiver(post_delete, sender=MarsCrop)
+@receiver(post_delete, sender=MarsRegion)
+@receiver(post_delete, sender=MarsSite)
+def invalidate_caches(sender, **kwargs):
+    """Bump the data version so cached responses are recomputed."""
+    bump_data_version()
+
+
+@receiver(post_save, sender=MarsCrop)
+@receiver(post_save, sender=MarsRegion)
+@receiver(post_delete, sender=MarsCrop)
+@receiver(post_delete, sender=MarsRegion)
+def forget_ingested_file(sender, raw=False, **kwargs):
+    """Edited tables no longer match their CSV, so the next load reads it again."""
+    if not raw:
+        IngestedFile.objects.filter(table=sender._meta.db_table).delete()
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Count the queries of every new connection against the current request."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
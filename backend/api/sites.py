@@ -0,0 +1,73 @@
+"""
+Warm in-process store of serialized Mars exploration sites.
+"""
+
+import threading
+
+from rest_framework.renderers import JSONRenderer
+
+from .repository import aget_repository, get_repository
+
+
+def serialize_site(site):
+    """Return the API representation of a MarsSite."""
+    return {
+        'id': site.id,
+        'name': site.name,
+        'location': site.location,
+        'lat': site.lat,
+        'lon': site.lon,
+        'simulator_parameters': site.simulator_parameters,
+    }
+
+
+class SiteStore:
+    """
+    Map of site id to its pre-rendered JSON body.
+
+    The map and the rendered list are rebuilt only when the data version
+    changes, so serving a site is a dict lookup returning shared bytes.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._by_id = {}
+        self._list_body = b'[]'
+        self._lock = threading.Lock()
+
+    def _swap(self, sites, version):
+        renderer = JSONRenderer()
+        by_id = {site.id: renderer.render(serialize_site(site)) for site in sites}
+        # Swap in complete structures so readers never see a partial map
+        with self._lock:
+            self._list_body = b'[' + b','.join(by_id.values()) + b']'
+            self._by_id = by_id
+            self._version = version
+
+    def _refresh(self):
+        repository = get_repository()
+        if repository.version != self._version:
+            self._swap(repository.sites, repository.version)
+
+    async def _arefresh(self):
+        repository = await aget_repository()
+        if repository.version != self._version:
+            self._swap(repository.sites, repository.version)
+
+    def list_body(self) -> bytes:
+        """Return the JSON body listing every site."""
+        self._refresh()
+        return self._list_body
+
+    async def alist_body(self) -> bytes:
+        """Async variant of list_body using the async ORM."""
+        await self._arefresh()
+        return self._list_body
+
+    def get_body(self, site_id):
+        """Return the JSON body of one site, or None if it does not exist."""
+        self._refresh()
+        return self._by_id.get(site_id)
+
+
+site_store = SiteStore()
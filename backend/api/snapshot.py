@@ -0,0 +1,258 @@
+"""
+Columnar snapshot of the reference data, memory-mapped by every worker.
+
+The build_snapshot command writes the region scoring columns, coordinates
+and text columns as .npy files next to a manifest, plus the crop rows as
+JSON. Text columns are stored as a UTF-8 blob with an offsets array, so no
+Python strings are built until a row is rendered. Workers open the files
+with mmap_mode='r': the pages are shared through the OS page cache and a
+cold worker has its region columns ready without querying the database.
+
+A snapshot is only used while its fingerprint (row counts, highest ids and
+last update times of the region and crop tables) matches the database and
+its format matches this code; otherwise callers fall back to the ORM.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .cache import get_data_version
+from .models import BOOKKEEPING_FIELDS, MarsCrop, MarsRegion
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+MANIFEST = 'manifest.json'
+CROPS = 'crops.json'
+
+# Region text columns kept for rendering matches, as RegionColumns names them.
+TEXT_COLUMNS = ('names', 'ph_text', 'perchlorate_text', 'terrain_text')
+# Region coordinates for the spatial index and the logistics matrix.
+COORDINATE_FIELDS = ('latitude_value', 'longitude_value', 'elevation_value')
+# MarsCrop fields restored from the snapshot; ingest bookkeeping is left out.
+CROP_FIELDS = tuple(
+    field.attname for field in MarsCrop._meta.concrete_fields
+    if field.attname not in BOOKKEEPING_FIELDS
+)
+
+_config = getattr(settings, 'SNAPSHOT', {})
+SNAPSHOT_DIR = _config.get('DIR', os.path.join(settings.BASE_DIR, 'data', 'snapshot'))
+
+
+class StringTable:
+    """Read-only sequence of optional strings stored as one UTF-8 blob."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, null: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+        self.null = null
+
+    @classmethod
+    def encode(cls, values: List[Optional[str]]) -> 'StringTable':
+        encoded = [(value or '').encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(data) for data in encoded])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        null = np.array([value is None for value in values], dtype=bool)
+        return cls(blob, offsets, null)
+
+    def __len__(self):
+        return len(self.null)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        if self.null[index]:
+            return None
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+
+def data_fingerprint() -> Dict[str, list]:
+    """Summarize the region and crop tables cheaply enough to check at boot."""
+    fingerprint = {}
+    for model in (MarsRegion, MarsCrop):
+        summary = model.objects.aggregate(rows=Count('id'), last_id=Max('id'), updated=Max('updated_at'))
+        fingerprint[model._meta.db_table] = [
+            summary['rows'],
+            summary['last_id'],
+            summary['updated'].isoformat() if summary['updated'] else None,
+        ]
+    return fingerprint
+
+
+def _scoring_arrays():
+    from .scoring import SCORING_ARRAYS
+
+    return list(SCORING_ARRAYS)
+
+
+def write_snapshot(directory: str = None) -> Dict:
+    """
+    Write a snapshot of the current database and return its manifest.
+
+    Files are written to a temporary directory that then replaces the old
+    snapshot, so workers never open a half-written one; workers that still
+    map the old files keep reading them until they reopen.
+    """
+    from .scoring import RegionColumns
+
+    directory = str(directory or SNAPSHOT_DIR)
+    fingerprint = data_fingerprint()
+    columns = RegionColumns.from_queryset(MarsRegion.objects.all())
+    coordinates = list(MarsRegion.objects.values_list('id', *COORDINATE_FIELDS))
+    by_id = {row[0]: row[1:] for row in coordinates}
+
+    arrays = dict(columns.arrays(), ids=columns.ids)
+    for index, field in enumerate(COORDINATE_FIELDS):
+        arrays[field] = np.array([
+            np.nan if by_id[pk][index] is None else by_id[pk][index] for pk in columns.ids.tolist()
+        ], dtype=float)
+
+    temp = f'{directory}.{os.getpid()}.tmp'
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+    for name, array in arrays.items():
+        np.save(os.path.join(temp, f'{name}.npy'), np.ascontiguousarray(array))
+    for name in TEXT_COLUMNS:
+        table = StringTable.encode(getattr(columns, name))
+        np.save(os.path.join(temp, f'{name}.blob.npy'), table.blob)
+        np.save(os.path.join(temp, f'{name}.offsets.npy'), table.offsets)
+        np.save(os.path.join(temp, f'{name}.null.npy'), table.null)
+
+    crops = [
+        {field: getattr(crop, field) for field in CROP_FIELDS}
+        for crop in MarsCrop.objects.order_by('id')
+    ]
+    with open(os.path.join(temp, CROPS), 'w', encoding='utf-8') as file:
+        json.dump(crops, file, ensure_ascii=False)
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'fingerprint': fingerprint,
+        'regions': len(columns),
+        'crops': len(crops),
+        'arrays': sorted(arrays),
+        'scoring_arrays': _scoring_arrays(),
+        'text_columns': list(TEXT_COLUMNS),
+    }
+    with open(os.path.join(temp, MANIFEST), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+
+    old = f'{directory}.{os.getpid()}.old'
+    if os.path.exists(directory):
+        os.replace(directory, old)
+    os.replace(temp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+class Snapshot:
+    """A snapshot directory opened with every array memory-mapped."""
+
+    def __init__(self, directory: str, manifest: Dict):
+        self.directory = directory
+        self.manifest = manifest
+        self.arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+            for name in manifest['arrays']
+        }
+        self.strings = {
+            name: StringTable(*(
+                np.load(os.path.join(directory, f'{name}.{part}.npy'), mmap_mode='r')
+                for part in ('blob', 'offsets', 'null')
+            ))
+            for name in manifest['text_columns']
+        }
+
+    @classmethod
+    def open(cls, directory: str = None) -> Optional['Snapshot']:
+        """Open a snapshot, or return None if there is none or its format is stale."""
+        directory = str(directory or SNAPSHOT_DIR)
+        try:
+            with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if (manifest.get('format') != SNAPSHOT_FORMAT
+                or manifest.get('scoring_arrays') != _scoring_arrays()
+                or manifest.get('text_columns') != list(TEXT_COLUMNS)):
+            logger.warning('Ignoring snapshot in %s written in an older format', directory)
+            return None
+        return cls(directory, manifest)
+
+    def is_current(self) -> bool:
+        return self.manifest['fingerprint'] == data_fingerprint()
+
+    def __len__(self):
+        return self.manifest['regions']
+
+    def region_columns(self):
+        """RegionColumns over the mapped arrays; rows are in MarsRegion default order."""
+        from .scoring import RegionColumns
+
+        columns = RegionColumns.from_arrays(self.arrays)
+        columns.ids = self.arrays['ids']
+        for name, table in self.strings.items():
+            setattr(columns, name, table)
+        return columns
+
+    def coordinates(self, fields=COORDINATE_FIELDS) -> List[np.ndarray]:
+        """Region ids followed by the requested coordinate arrays."""
+        return [self.arrays['ids']] + [self.arrays[field] for field in fields]
+
+    def crops(self) -> List[MarsCrop]:
+        """Unsaved MarsCrop instances carrying the snapshot rows and ids."""
+        with open(os.path.join(self.directory, CROPS), 'r', encoding='utf-8') as file:
+            return [MarsCrop(**row) for row in json.load(file)]
+
+
+def snapshot_exists(directory: str = None) -> bool:
+    return os.path.exists(os.path.join(str(directory or SNAPSHOT_DIR), MANIFEST))
+
+
+_snapshot = None
+_snapshot_key = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> Optional[Snapshot]:
+    """
+    Return the mapped snapshot if it matches the database, else None.
+
+    The check runs once per data version; the files are reopened only when
+    the manifest changes on disk.
+    """
+    global _snapshot, _snapshot_key
+
+    if not _config.get('ENABLED', True):
+        return None
+    path = os.path.join(str(SNAPSHOT_DIR), MANIFEST)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    key = (get_data_version(), mtime)
+    if _snapshot_key == key:
+        return _snapshot
+
+    with _snapshot_lock:
+        if _snapshot_key != key:
+            snapshot = _snapshot
+            if snapshot is None or _snapshot_key is None or _snapshot_key[1] != mtime:
+                snapshot = Snapshot.open()
+            if snapshot is not None and not snapshot.is_current():
+                logger.warning('Snapshot in %s does not match the database; '
+                               'run build_snapshot to refresh it', SNAPSHOT_DIR)
+                snapshot = None
+            _snapshot = snapshot
+            _snapshot_key = key
+    return _snapshot
@@ -0,0 +1,192 @@
+"""
+In-process spatial index over region coordinates.
+
+Points are bucketed into a regular latitude/longitude grid and stored sorted
+by cell, so every row of cells touched by a query maps to one contiguous
+slice of the arrays. Candidates from those slices are filtered exactly, with
+great-circle distances computed on the Mars sphere.
+"""
+
+import math
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+from .cache import get_data_version
+from .repository import get_repository
+from .snapshot import get_snapshot
+
+# Mean volumetric radius of Mars in kilometres.
+MARS_RADIUS_KM = 3389.5
+
+
+def normalize_longitude(lon):
+    """Wrap longitudes (scalar or array) into the range [-180, 180)."""
+    return (np.asarray(lon, dtype=float) + 180.0) % 360.0 - 180.0
+
+
+def unit_vectors(lat, lon) -> np.ndarray:
+    """Convert latitude/longitude arrays in degrees to unit vectors."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def great_circle_km(vectors: np.ndarray, origin: np.ndarray) -> np.ndarray:
+    """Distance in km from origin to each unit vector, using the chord formula."""
+    chord = np.linalg.norm(vectors - origin, axis=-1)
+    return 2.0 * MARS_RADIUS_KM * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+
+
+class SpatialIndex:
+    """Latitude/longitude grid index over a set of points with integer ids."""
+
+    def __init__(self, ids, lat, lon, cell_deg: float = 1.0):
+        self.cell_deg = cell_deg
+        self.n_rows = int(math.ceil(180.0 / cell_deg))
+        self.n_cols = int(math.ceil(360.0 / cell_deg))
+
+        ids = np.asarray(ids, dtype=np.int64)
+        lat = np.asarray(lat, dtype=float)
+        lon = normalize_longitude(lon)
+
+        cells = self._row(lat) * self.n_cols + self._col(lon)
+        order = np.argsort(cells, kind='stable')
+
+        self.ids = ids[order]
+        self.lat = lat[order]
+        self.lon = lon[order]
+        self.vectors = unit_vectors(self.lat, self.lon)
+        # starts[c]:starts[c + 1] is the slice of points that fall in cell c
+        self.starts = np.searchsorted(
+            cells[order], np.arange(self.n_rows * self.n_cols + 1)
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _row(self, lat):
+        rows = np.floor((np.asarray(lat) + 90.0) / self.cell_deg).astype(np.int64)
+        return np.clip(rows, 0, self.n_rows - 1)
+
+    def _col(self, lon):
+        cols = np.floor((np.asarray(lon) + 180.0) / self.cell_deg).astype(np.int64)
+        return np.clip(cols, 0, self.n_cols - 1)
+
+    def _candidates(self, min_lat, max_lat, lon_ranges) -> np.ndarray:
+        """Positions of points in the grid cells covering the given ranges."""
+        row_start, row_end = int(self._row(min_lat)), int(self._row(max_lat))
+        slices = []
+        for row in range(row_start, row_end + 1):
+            base = row * self.n_cols
+            for min_lon, max_lon in lon_ranges:
+                start = self.starts[base + int(self._col(min_lon))]
+                end = self.starts[base + int(self._col(max_lon)) + 1]
+                if end > start:
+                    slices.append(np.arange(start, end))
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    @staticmethod
+    def _lon_ranges(min_lon: float, max_lon: float) -> List[Tuple[float, float]]:
+        """Split a longitude interval into non-wrapping pieces in [-180, 180)."""
+        if max_lon - min_lon >= 360.0:
+            return [(-180.0, 180.0)]
+        min_lon = float(normalize_longitude(min_lon))
+        max_lon = float(normalize_longitude(max_lon))
+        if min_lon <= max_lon:
+            return [(min_lon, max_lon)]
+        return [(min_lon, 180.0), (-180.0, max_lon)]
+
+    def within_bbox(self, min_lat: float, max_lat: float,
+                    min_lon: float, max_lon: float) -> np.ndarray:
+        """
+        Return the ids of points inside a latitude/longitude box.
+
+        A box whose min_lon is greater than its max_lon crosses the 180°
+        meridian.
+        """
+        return self.ids[self.bbox_positions(min_lat, max_lat, min_lon, max_lon)]
+
+    def bbox_positions(self, min_lat: float, max_lat: float,
+                       min_lon: float, max_lon: float) -> np.ndarray:
+        """Like within_bbox, but return positions into ids, lat and lon."""
+        lon_ranges = self._lon_ranges(min_lon, max_lon)
+        candidates = self._candidates(min_lat, max_lat, lon_ranges)
+
+        lat = self.lat[candidates]
+        lon = self.lon[candidates]
+        inside = (lat >= min_lat) & (lat <= max_lat)
+        in_lon = np.zeros(len(candidates), dtype=bool)
+        for range_min, range_max in lon_ranges:
+            in_lon |= (lon >= range_min) & (lon <= range_max)
+        return candidates[inside & in_lon]
+
+    def near(self, lat: float, lon: float, radius_km: float,
+             limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return ids and distances (km) of points within radius_km of a location,
+        nearest first.
+        """
+        angle = radius_km / MARS_RADIUS_KM
+        angle_deg = math.degrees(angle)
+        min_lat = max(lat - angle_deg, -90.0)
+        max_lat = min(lat + angle_deg, 90.0)
+
+        # Longitude half-width of the circle's bounding box; the full circle of
+        # longitudes is needed once the cap reaches a pole.
+        if angle >= math.pi or min_lat <= -90.0 or max_lat >= 90.0:
+            lon_ranges = [(-180.0, 180.0)]
+        else:
+            ratio = math.sin(angle) / math.cos(math.radians(lat))
+            if ratio >= 1.0:
+                lon_ranges = [(-180.0, 180.0)]
+            else:
+                half_width = math.degrees(math.asin(ratio))
+                lon_ranges = self._lon_ranges(lon - half_width, lon + half_width)
+
+        candidates = self._candidates(min_lat, max_lat, lon_ranges)
+        origin = unit_vectors(lat, lon)
+        distances = great_circle_km(self.vectors[candidates], origin)
+
+        inside = distances <= radius_km
+        candidates = candidates[inside]
+        distances = distances[inside]
+        order = np.argsort(distances, kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        return self.ids[candidates[order]], distances[order]
+
+
+_region_index = None
+_region_index_key = None
+_region_index_lock = threading.Lock()
+
+
+def get_region_index() -> SpatialIndex:
+    """Return the spatial index over all regions, rebuilding it after changes."""
+    global _region_index, _region_index_key
+
+    key = get_data_version()
+    if _region_index is not None and _region_index_key == key:
+        return _region_index
+
+    with _region_index_lock:
+        if _region_index is None or _region_index_key != key:
+            snapshot = get_snapshot()
+            if snapshot is not None:
+                ids, lat, lon = snapshot.coordinates(('latitude_value', 'longitude_value'))
+                known = ~(np.isnan(lat) | np.isnan(lon))
+                ids, lat, lon = ids[known], lat[known], lon[known]
+            else:
+                rows = [
+                    (region.id, region.latitude_value, region.longitude_value)
+                    for region in get_repository().regions
+                    if region.latitude_value is not None and region.longitude_value is not None
+                ]
+                ids, lat, lon = zip(*rows) if rows else ((), (), ())
+            _region_index = SpatialIndex(ids, lat, lon)
+            _region_index_key = key
+    return _region_index
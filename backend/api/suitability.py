@@ -0,0 +1,191 @@
+"""
+Persisted crop x region suitability matrix.
+
+Scores and reason codes for every crop/region pair are stored in
+CropRegionSuitability so that matching a crop becomes an indexed top-N
+lookup. The full matrix is built by the build_suitability_matrix command;
+model signals then recompute single rows (crops) or columns (regions), and
+load_csv_data the columns of the regions it changed.
+
+The matrix records the digest of the rules it was built with. Once the
+default rules (api/rules/default.json, re-read when it changes) differ from
+them, readers score live and partial updates are skipped until the matrix
+is rebuilt.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.db import transaction
+
+from .cache import get_data_version
+from .models import CropRegionSuitability, MarsCrop, MarsRegion, SuitabilityRules
+from .ruleset import CompiledRuleSet
+from .scoring import CropProfile, RegionColumns, get_rules, render_reasons
+from .utils import batched
+
+
+def _suitability_rows(crop, columns: RegionColumns, rules: CompiledRuleSet):
+    """Yield unsaved CropRegionSuitability rows for one crop over all columns."""
+    # Parsed afresh: the save signal that calls this runs before the data
+    # version bump that would invalidate a cached profile
+    masks = columns.evaluate(CropProfile(crop), rules)
+    scores = rules.score(masks, len(columns))
+    codes = rules.codes
+    applies = np.stack([masks[code] for code in codes], axis=1)
+
+    for index in range(len(columns)):
+        yield CropRegionSuitability(
+            crop_id=crop.id,
+            region_id=int(columns.ids[index]),
+            score=int(scores[index]),
+            reasons=[codes[j] for j in np.flatnonzero(applies[index])],
+        )
+
+
+def _write(rows, batch_size: int) -> int:
+    written = 0
+    for batch in batched(rows, batch_size):
+        CropRegionSuitability.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def matrix_exists() -> bool:
+    """Return True once the matrix has been built."""
+    return CropRegionSuitability.objects.exists()
+
+
+_matrix_digest = None
+_matrix_digest_key = None
+_matrix_digest_lock = threading.Lock()
+
+
+def matrix_digest() -> Optional[str]:
+    """Digest of the rules the matrix was built with, read once per data version."""
+    global _matrix_digest, _matrix_digest_key
+
+    key = get_data_version()
+    if _matrix_digest_key == key:
+        return _matrix_digest
+
+    with _matrix_digest_lock:
+        if _matrix_digest_key != key:
+            _matrix_digest = SuitabilityRules.current() if matrix_exists() else None
+            _matrix_digest_key = key
+    return _matrix_digest
+
+
+def matrix_current(rules: CompiledRuleSet = None) -> bool:
+    """Return True when the matrix exists and was built with the given or current default rules."""
+    return matrix_digest() == (rules or get_rules()).digest
+
+
+def _forget_matrix_digest():
+    global _matrix_digest_key
+    _matrix_digest_key = None
+
+
+def rebuild_matrix(batch_size: int = 1000) -> int:
+    """Recompute every crop/region pair and return the number of rows written."""
+    rules = get_rules()
+    columns = RegionColumns.from_queryset(MarsRegion.objects.all())
+    written = 0
+    with transaction.atomic():
+        CropRegionSuitability.objects.all().delete()
+        for crop in MarsCrop.objects.all():
+            written += _write(_suitability_rows(crop, columns, rules), batch_size)
+        SuitabilityRules.record(rules.digest)
+    _forget_matrix_digest()
+    return written
+
+
+def rebuild_crop(crop, batch_size: int = 1000) -> int:
+    """Recompute the matrix row of a single crop; a stale matrix is left alone."""
+    rules = get_rules()
+    if not matrix_current(rules):
+        return 0
+    columns = RegionColumns.from_queryset(MarsRegion.objects.all())
+    with transaction.atomic():
+        CropRegionSuitability.objects.filter(crop_id=crop.id).delete()
+        return _write(_suitability_rows(crop, columns, rules), batch_size)
+
+
+def rebuild_region(region, batch_size: int = 1000) -> int:
+    """Recompute the matrix column of a single region; a stale matrix is left alone."""
+    rules = get_rules()
+    if not matrix_current(rules):
+        return 0
+    columns = RegionColumns.from_regions([region])
+    written = 0
+    with transaction.atomic():
+        CropRegionSuitability.objects.filter(region_id=region.id).delete()
+        for crop in MarsCrop.objects.all():
+            written += _write(_suitability_rows(crop, columns, rules), batch_size)
+    return written
+
+
+def rebuild_regions(region_ids, batch_size: int = 1000) -> int:
+    """Recompute the matrix columns of several regions, batch_size at a time."""
+    rules = get_rules()
+    if not matrix_current(rules):
+        return 0
+    crops = list(MarsCrop.objects.all())
+    written = 0
+    with transaction.atomic():
+        for ids in batched(region_ids, batch_size):
+            CropRegionSuitability.objects.filter(region_id__in=ids).delete()
+            columns = RegionColumns.from_queryset(MarsRegion.objects.filter(id__in=ids))
+            for crop in crops:
+                written += _write(_suitability_rows(crop, columns, rules), batch_size)
+    return written
+
+
+def top_matches_queryset(crop, top_n: int = 3):
+    """Queryset of the top_n matrix rows of a crop, for render_top_match."""
+    return (
+        CropRegionSuitability.objects
+        .filter(crop_id=crop.id)
+        .order_by('-score', 'region__region', 'region_id')
+        .values_list(
+            'score', 'reasons', 'region__region', 'region__latitude_value',
+            'region__perchlorate_wt_pct', 'region__ph', 'region__terrain_type',
+            'region__ph_value', 'region__perchlorate_value', 'region__water_release_value',
+        )[:top_n]
+    )
+
+
+def render_top_match(row, rules: CompiledRuleSet = None) -> Dict:
+    """Build the match dictionary for one row of top_matches_queryset."""
+    (score, reasons, name, latitude, perchlorate_text, ph_text, terrain,
+     ph, perchlorate, water) = row
+    return {
+        'region': name,
+        'score': score,
+        # Landing sites record no surface temperature, as in RegionColumns.from_regions
+        'reasons': render_reasons(reasons, ph=ph, perchlorate=perchlorate, water=water,
+                                  temperature=None, rules=rules),
+        'latitude': latitude,
+        'perchlorate': perchlorate_text,
+        'ph': ph_text,
+        'terrain': terrain,
+    }
+
+
+def top_matches(crop, top_n: int = 3, rules: CompiledRuleSet = None) -> Optional[List[Dict]]:
+    """
+    Return the top_n precomputed matches for a crop under the given or the
+    default rules.
+
+    Returns None when the crop has no rows in the matrix or the matrix was
+    built with other rules, in which case the caller should score the
+    regions directly.
+    """
+    rules = rules or get_rules()
+    if not matrix_current(rules):
+        return None
+    matches = [render_top_match(row, rules) for row in top_matches_queryset(crop, top_n)]
+    if not matches and top_n > 0:
+        return None
+    return matches
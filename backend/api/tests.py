@@ -0,0 +1,235 @@
+import random
+import re
+
+from django.test import SimpleTestCase
+
+from .models import MarsCrop, MarsRegion
+from .scoring import RegionColumns
+from .utils import parse_latitude, parse_ph_range
+
+
+def legacy_match_crop_to_regions(crop, regions, top_n=3):
+    """
+    The per-region loop match_crop_to_regions ran before the columnar
+    engine, kept verbatim as the oracle the engine is checked against.
+    """
+    scores = []
+
+    # Parse crop requirements
+    crop_ph_min, crop_ph_max = parse_ph_range(crop.preferred_ph_range)
+    crop_soil_texture = (crop.terrain_soil_texture or '').lower()
+    crop_temp_range = (crop.temperature_range_c or '').lower()
+    crop_moisture = (crop.moisture_regime or '').lower()
+
+    for region in regions:
+        score = 0
+        reasons = []
+
+        # 1. pH compatibility
+        if region.ph and crop_ph_min is not None and crop_ph_max is not None:
+            region_ph = parse_latitude(region.ph)  # Reusing parser for simplicity
+            if region_ph is None:
+                # Try to extract numeric pH value
+                ph_match = re.search(r'(\d+\.?\d*)', region.ph)
+                if ph_match:
+                    region_ph = float(ph_match.group(1))
+
+            if region_ph is not None:
+                if crop_ph_min <= region_ph <= crop_ph_max:
+                    score += 3
+                    reasons.append(f"pH compatible ({region_ph:.1f})")
+                else:
+                    score -= 1
+                    reasons.append(f"pH mismatch ({region_ph:.1f})")
+        else:
+            reasons.append("pH data unavailable")
+
+        # 2. Soil texture compatibility
+        region_terrain = (region.terrain_type or '').lower()
+        if region_terrain and crop_soil_texture:
+            # Check for compatible soil types
+            if 'loam' in crop_soil_texture and 'loam' in region_terrain:
+                score += 2
+                reasons.append("Loam soil match")
+            elif 'sandy' in crop_soil_texture and 'sandy' in region_terrain:
+                score += 2
+                reasons.append("Sandy soil match")
+            elif 'well-drained' in crop_soil_texture and 'drained' in region_terrain:
+                score += 1
+                reasons.append("Drainage compatibility")
+
+        # 3. Temperature feasibility based on latitude
+        region_lat = parse_latitude(region.latitude_deg)
+        if region_lat is not None:
+            # Equatorial regions (good for most crops)
+            if -15 <= region_lat <= 15:
+                score += 2
+                reasons.append("Equatorial climate")
+            # Mid-latitude regions
+            elif -40 <= region_lat <= 40:
+                score += 1
+                reasons.append("Moderate climate")
+            # Polar regions (challenging)
+            else:
+                score -= 1
+                reasons.append("Polar climate")
+
+        # 4. Perchlorate penalty
+        if region.perchlorate_wt_pct:
+            try:
+                perchlorate = float(region.perchlorate_wt_pct)
+                if perchlorate > 0.5:
+                    score -= 3
+                    reasons.append(f"High perchlorate ({perchlorate}%)")
+                elif perchlorate > 0.3:
+                    score -= 1
+                    reasons.append(f"Moderate perchlorate ({perchlorate}%)")
+                else:
+                    score += 1
+                    reasons.append(f"Low perchlorate ({perchlorate}%)")
+            except (ValueError, TypeError):
+                reasons.append("Perchlorate data unclear")
+
+        # 5. Water availability bonus
+        if region.water_release_wt_pct:
+            try:
+                water = float(region.water_release_wt_pct)
+                if water > 1.5:
+                    score += 2
+                    reasons.append(f"Good water availability ({water}%)")
+                elif water > 1.0:
+                    score += 1
+                    reasons.append(f"Moderate water ({water}%)")
+            except (ValueError, TypeError):
+                pass
+
+        # 6. Special considerations
+        region_notes = (region.notes or '').lower()
+        if 'ice' in region_notes and 'moisture' in crop_moisture:
+            score += 1
+            reasons.append("Water ice potential")
+
+        if 'dust' in region_notes:
+            score -= 1
+            reasons.append("Dust challenges")
+
+        scores.append({
+            'region': region.region,
+            'score': score,
+            'reasons': reasons,
+            'latitude': region_lat,
+            'perchlorate': region.perchlorate_wt_pct,
+            'ph': region.ph,
+            'terrain': region.terrain_type
+        })
+
+    # Sort by score (descending) and return top_n
+    sorted_scores = sorted(scores, key=lambda x: x['score'], reverse=True)
+    return sorted_scores[:top_n]
+
+
+def make_region(name, **fields):
+    """Unsaved MarsRegion with its numeric columns parsed as on save."""
+    region = MarsRegion(region=name, **{
+        'latitude_deg': '', 'longitude_deg': '', 'elevation_m': '', 'perchlorate_wt_pct': '',
+        'water_release_wt_pct': '', 'ph': '', 'terrain_type': '', 'notes': '', **fields,
+    })
+    region.populate_numeric_fields()
+    return region
+
+
+def comparable(matches):
+    """
+    Matches without the latitude value.
+
+    The oracle drops the sign of latitudes written with a Unicode minus
+    ('−20' reads as 20); the engine keeps it. Bands are symmetric, so
+    scores and reasons are unaffected.
+    """
+    return [{key: value for key, value in match.items() if key != 'latitude'} for match in matches]
+
+
+# Messy values seen in the landing site and gridded region data
+LATITUDES = ['4.5895°S', '68°N', '4.502384°N', '40°S', '15°N', '(≈68°N?)', '−20', '−4.5°S',
+             '12.3', '-45.2', '15', 'abc', '', None]
+PH_VALUES = ['High (alkaline)', '7.5', '8', '6.5–7.0', '~7.5 (estimated)', '−3', '-3',
+             ' (unknown)', '(≈7.8)', '', None]
+PERCHLORATES = ['0.4 (Rocknest)', '0.6', '0.5', '0.31', '0.3', '0.1', '−0.4', ' (not directly measured)',
+                ' (unknown)', '', None]
+WATERS = ['2.0', '1.5', '1.2', '1.0', '−2', '~1.8', 'x', '', None]
+TERRAINS = ['layered crater floor', 'flat plains / smooth plains', 'sandy loam', 'well drained',
+            'Drained Sandy', 'smooth sandy/granule & pebble rich surface', '', None]
+NOTES = ['Dust and ice', 'ICE', '“Dust enriched in Cl/S”', 'justice', '', None]
+
+CROP_PH = ['6.2–6.8', '6.0-7.5', '6', '5.5 to 7.0', 'unknown', 'x', '', None]
+CROP_TEXTURES = ['Well-drained, fertile loam', 'sandy', 'well-drained', 'clay', '', None]
+CROP_TEMPERATURES = ['Day: 20–27, Night: 16–18', '15–18', '', None]
+CROP_MOISTURE = ['Consistent moisture', 'Moist', '', None]
+
+
+class MatchParityTest(SimpleTestCase):
+    """RegionColumns.match must score, explain and order like the original loop."""
+
+    def assert_parity(self, crop, regions, top_n):
+        expected = legacy_match_crop_to_regions(crop, regions, top_n)
+        actual = RegionColumns.from_regions(regions).match(crop, top_n)
+        self.assertEqual(comparable(actual), comparable(expected))
+
+    def test_messy_region_values(self):
+        regions = [
+            make_region('Gale Crater (Rocknest)', latitude_deg='4.5895°S', ph='High (alkaline)',
+                        perchlorate_wt_pct='0.4 (Rocknest)', water_release_wt_pct='2.0',
+                        terrain_type='layered crater floor'),
+            make_region('Phoenix', latitude_deg='(≈68°N?)', ph='7.7', perchlorate_wt_pct='0.6',
+                        notes='Water ice in the shallow subsurface'),
+            make_region('Unicode minus', latitude_deg='−20', ph='−3', perchlorate_wt_pct='−0.4',
+                        water_release_wt_pct='−2'),
+            make_region('Unknowns', latitude_deg='4.5°N', ph=' (unknown)', perchlorate_wt_pct=' (unknown)'),
+            make_region('Free text', ph='~7.5 (estimated)', terrain_type='sandy loam', notes='dust storms'),
+        ]
+        crops = [
+            MarsCrop(crop='Tomato', preferred_ph_range='6.2–6.8', terrain_soil_texture='Well-drained, fertile loam',
+                     temperature_range_c='Day: 20–27, Night: 16–18', moisture_regime='Consistent moisture'),
+            MarsCrop(crop='Alkaline', preferred_ph_range='7.0–8.0', terrain_soil_texture='sandy'),
+            MarsCrop(crop='No ranges'),
+        ]
+        for crop in crops:
+            with self.subTest(crop=crop.crop):
+                self.assert_parity(crop, regions, len(regions))
+
+    def test_ties_keep_input_order(self):
+        regions = [make_region(f'Grid {i}', latitude_deg='4.5895°S', ph='7.0') for i in range(6)]
+        regions.insert(3, make_region('Better', latitude_deg='4.5895°S', ph='7.0', water_release_wt_pct='2.0'))
+        crop = MarsCrop(crop='Tomato', preferred_ph_range='6.0–7.5')
+        for top_n in (0, 1, 3, len(regions)):
+            with self.subTest(top_n=top_n):
+                self.assert_parity(crop, regions, top_n)
+        self.assertEqual(
+            [match['region'] for match in RegionColumns.from_regions(regions).match(crop, 4)],
+            ['Better', 'Grid 0', 'Grid 1', 'Grid 2'],
+        )
+
+    def test_randomized_parity(self):
+        rng = random.Random(20261017)
+        for trial in range(200):
+            regions = [
+                make_region(
+                    f'R{rng.randrange(12)}',
+                    latitude_deg=rng.choice(LATITUDES) or '',
+                    ph=rng.choice(PH_VALUES),
+                    perchlorate_wt_pct=rng.choice(PERCHLORATES),
+                    water_release_wt_pct=rng.choice(WATERS),
+                    terrain_type=rng.choice(TERRAINS),
+                    notes=rng.choice(NOTES),
+                )
+                for _ in range(rng.randrange(30))
+            ]
+            crop = MarsCrop(
+                crop='Crop',
+                preferred_ph_range=rng.choice(CROP_PH),
+                terrain_soil_texture=rng.choice(CROP_TEXTURES),
+                temperature_range_c=rng.choice(CROP_TEMPERATURES),
+                moisture_regime=rng.choice(CROP_MOISTURE),
+            )
+            with self.subTest(trial=trial):
+                self.assert_parity(crop, regions, rng.choice([0, 1, 3, 5, 100]))
@@ -0,0 +1,266 @@
+"""
+Per-crop suitability heatmap tiles for the map.
+
+Tiles follow the z/x/y Web Mercator scheme used by the OpenLayers basemap.
+When raster layers have been ingested every tile pixel is scored from the
+raster pixel beneath it; otherwise regions are drawn as coloured dots using
+scores computed once per crop. Rendered PNGs are kept in an in-process LRU
+backed by a directory on disk, both keyed by the data version and the
+digest of the default rules, so panning only renders tiles that have never
+been seen for the current data and rules. The
+first tile a process writes for a new data version prunes the directory
+down to the KEEP_VERSIONS newest versions, so disk use stays bounded.
+"""
+
+import math
+import os
+import shutil
+import struct
+import zlib
+from typing import Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .cache import LRUCache, get_data_version
+from .raster import get_raster_stack, pixel_columns
+from .scoring import get_crop_profile, get_region_columns, get_rules
+from .spatial import get_region_index
+
+TILE_SIZE = 256
+MAX_ZOOM = 12
+# Web Mercator stops short of the poles
+MAX_LATITUDE = math.degrees(math.atan(math.sinh(math.pi)))
+
+# Scores mapped to the ends of the colour ramp
+SCORE_MIN = -6
+SCORE_MAX = 10
+ALPHA = 170
+# Radius in pixels of a region dot when no raster is available
+REGION_DOT_RADIUS = 5
+
+_config = getattr(settings, 'TILE_CACHE', {})
+
+# Data versions kept on disk; more than one so processes that have not seen
+# the latest bump yet do not delete the tiles of those that have.
+KEEP_VERSIONS = _config.get('KEEP_VERSIONS', 2)
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Encode an (height, width, 4) uint8 array as a PNG using only zlib."""
+    height, width, _ = rgba.shape
+    # Each scanline is prefixed with filter type 0 (none)
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b''))
+
+
+def colorize(scores: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Map scores to a red-yellow-green ramp; invalid pixels are transparent."""
+    t = np.clip((scores.astype(float) - SCORE_MIN) / (SCORE_MAX - SCORE_MIN), 0.0, 1.0)
+    rgba = np.zeros(scores.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = np.where(t < 0.5, 215, np.round(215 * (1 - t) * 2)).astype(np.uint8)
+    rgba[..., 1] = np.where(t < 0.5, np.round(48 + 2 * t * (200 - 48)), 200).astype(np.uint8)
+    rgba[..., 2] = 40
+    rgba[..., 3] = np.where(valid, ALPHA, 0)
+    return rgba
+
+
+def _row_latitude(row: float, n: int) -> float:
+    """Latitude of a fractional tile row at a zoom level with n tiles per side."""
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+
+def tile_bounds(z: int, x: int, y: int, margin: float = 0.0) -> Tuple[float, float, float, float]:
+    """
+    Return (min_lat, max_lat, min_lon, max_lon) of a tile, optionally grown
+    by margin tiles on every side.
+    """
+    n = 2 ** z
+    return (
+        _row_latitude(y + 1 + margin, n),
+        _row_latitude(y - margin, n),
+        (x - margin) / n * 360.0 - 180.0,
+        (x + 1 + margin) / n * 360.0 - 180.0,
+    )
+
+
+def tile_pixel_coordinates(z: int, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitude and longitude of the centre of every pixel of a tile."""
+    n = 2 ** z
+    offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lon = (x + offsets) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    shape = (TILE_SIZE, TILE_SIZE)
+    return np.broadcast_to(lat[:, None], shape), np.broadcast_to(lon[None, :], shape)
+
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def _render_raster(stack, crop, z: int, x: int, y: int, rules) -> np.ndarray:
+    lat, lon = tile_pixel_coordinates(z, x, y)
+    values, latitudes = stack.sample(lat, lon)
+    columns = pixel_columns(values, latitudes)
+    scores = columns.score(get_crop_profile(crop), rules).reshape(TILE_SIZE, TILE_SIZE)
+    valid = np.zeros((TILE_SIZE, TILE_SIZE), dtype=bool)
+    for layer in values.values():
+        valid |= ~np.isnan(layer)
+    return colorize(scores, valid)
+
+
+_region_scores = LRUCache(max_entries=64)
+
+
+def region_scores(crop, rules) -> Tuple[np.ndarray, np.ndarray]:
+    """Region ids (sorted) and their scores for a crop, computed once per version and rules."""
+    key = (get_data_version(), rules.digest, crop.id)
+    cached = _region_scores.get(key)
+    if cached is None:
+        columns = get_region_columns()
+        order = np.argsort(columns.ids, kind='stable')
+        cached = (columns.ids[order], columns.score(get_crop_profile(crop), rules)[order])
+        _region_scores.set(key, cached)
+    return cached
+
+
+def _render_regions(crop, z: int, x: int, y: int, rules) -> np.ndarray:
+    n = 2 ** z
+    empty = np.zeros((TILE_SIZE, TILE_SIZE), dtype=bool)
+
+    # Widen the box by the dot radius so dots straddling the edge are drawn
+    index = get_region_index()
+    positions = index.bbox_positions(*tile_bounds(z, x, y, REGION_DOT_RADIUS / TILE_SIZE))
+    ids = index.ids[positions]
+    sorted_ids, sorted_scores = region_scores(crop, rules)
+    if len(ids) == 0 or len(sorted_ids) == 0:
+        return colorize(empty.astype(np.int64), empty)
+
+    slots = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    found = sorted_ids[slots] == ids
+    region_score = sorted_scores[slots[found]]
+    lat = np.clip(index.lat[positions[found]], -MAX_LATITUDE, MAX_LATITUDE)
+    lon = index.lon[positions[found]]
+
+    # Longitude of the tile's west edge, so dots near the seam wrap correctly
+    west = x / n * 360.0 - 180.0
+    px = ((lon - west) % 360.0) / 360.0 * n * TILE_SIZE
+    px = np.where(px > (n - 0.5) * TILE_SIZE, px - n * TILE_SIZE, px)
+    lat = np.radians(lat)
+    py = ((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * n - y) * TILE_SIZE
+
+    # Stamp a disk per region; where dots overlap the best score wins
+    rows, cols = np.mgrid[-REGION_DOT_RADIUS:REGION_DOT_RADIUS + 1,
+                          -REGION_DOT_RADIUS:REGION_DOT_RADIUS + 1]
+    disk = rows ** 2 + cols ** 2 <= REGION_DOT_RADIUS ** 2
+    r = (np.floor(py).astype(np.int64)[:, None] + rows[disk][None, :]).ravel()
+    c = (np.floor(px).astype(np.int64)[:, None] + cols[disk][None, :]).ravel()
+    dot_scores = np.repeat(region_score, disk.sum())
+    inside = (r >= 0) & (r < TILE_SIZE) & (c >= 0) & (c < TILE_SIZE)
+
+    best = np.full((TILE_SIZE, TILE_SIZE), np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(best, (r[inside], c[inside]), dot_scores[inside])
+    valid = best != np.iinfo(np.int64).min
+    return colorize(np.where(valid, best, 0), valid)
+
+
+def render_tile(crop, z: int, x: int, y: int, rules=None) -> bytes:
+    """Render one suitability tile as PNG bytes, scored with the given or default rules."""
+    rules = rules or get_rules()
+    stack = get_raster_stack()
+    if stack is not None:
+        rgba = _render_raster(stack, crop, z, x, y, rules)
+    else:
+        rgba = _render_regions(crop, z, x, y, rules)
+    return encode_png(rgba)
+
+
+class TileCache:
+    """In-process LRU of tile PNGs backed by <directory>/<version>/<rules>/... files."""
+
+    def __init__(self, directory: Optional[str], max_entries: int = 1024,
+                 keep_versions: int = KEEP_VERSIONS):
+        self.directory = directory
+        self.memory = LRUCache(max_entries)
+        self.keep_versions = max(1, keep_versions)
+        self.disk_hits = 0
+        self.renders = 0
+        # Data version this process last pruned the directory for
+        self._pruned_version = None
+
+    def _path(self, version: int, digest: str, crop_id: int, z: int, x: int, y: int) -> str:
+        return os.path.join(self.directory, str(version), digest[:16], str(crop_id), str(z), str(x), f'{y}.png')
+
+    def get(self, crop, z: int, x: int, y: int) -> bytes:
+        """Return a tile from memory, then disk, rendering it on a full miss."""
+        version = get_data_version()
+        rules = get_rules()
+        key = (version, rules.digest, crop.id, z, x, y)
+        body = self.memory.get(key)
+        if body is not None:
+            return body
+
+        path = self._path(version, rules.digest, crop.id, z, x, y) if self.directory else None
+        if path and os.path.exists(path):
+            with open(path, 'rb') as file:
+                body = file.read()
+            self.disk_hits += 1
+        else:
+            body = render_tile(crop, z, x, y, rules)
+            self.renders += 1
+            if path:
+                if self._pruned_version != version:
+                    self._pruned_version = version
+                    self.prune(keep=self.keep_versions)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write then rename so concurrent readers never see half a file
+                temp = f'{path}.{os.getpid()}.tmp'
+                with open(temp, 'wb') as file:
+                    file.write(body)
+                os.replace(temp, path)
+        self.memory.set(key, body)
+        return body
+
+    def prune(self, keep: int = 1) -> int:
+        """
+        Delete on-disk tiles of data versions older than both this process's
+        version and the keep newest versions on disk (counting this one);
+        returns the number of directories removed.
+
+        Newer versions, written by processes that have already seen a bump,
+        are never touched.
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return 0
+        current = get_data_version()
+        # The current version counts as kept even before its first tile is written
+        versions = sorted({int(name) for name in os.listdir(self.directory) if name.isdigit()} | {current},
+                          reverse=True)
+        removed = 0
+        for version in versions[keep:]:
+            if version < current:
+                shutil.rmtree(os.path.join(self.directory, str(version)), ignore_errors=True)
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            'memory': self.memory.stats(),
+            'disk_hits': self.disk_hits,
+            'renders': self.renders,
+        }
+
+
+tile_cache = TileCache(
+    _config.get('DIR', os.path.join(settings.BASE_DIR, 'data', 'tile_cache')),
+    max_entries=_config.get('MAX_ENTRIES', 1024),
+    keep_versions=KEEP_VERSIONS,
+)
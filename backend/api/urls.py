@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, metrics, views
 
 router = DefaultRouter()
 router.register(r'mars-sites', views.MarsSiteViewSet, basename='mars-sites')
@@ -9,4 +9,13 @@ router.register(r'regions', views.MarsRegionViewSet, basename='regions')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('metrics/', metrics.metrics_view, name='metrics'),
+    path(
+        'tiles/suitability/<str:crop>/<int:z>/<int:x>/<int:y>.png',
+        views.suitability_tile,
+        name='suitability-tile',
+    ),
+    path('async/crops/match_crop/', async_views.match_crop, name='async-match-crop'),
+    path('async/regions/list_regions/', async_views.list_regions, name='async-list-regions'),
+    path('async/mars-sites/list_sites/', async_views.list_sites, name='async-list-sites'),
 ]
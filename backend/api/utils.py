@@ -2,8 +2,10 @@
 Utility functions for crop-to-region matching algorithm.
 """
 
+import math
 import re
-from typing import List, Dict, Tuple
+from itertools import islice
+from typing import Iterable, List, Dict, Tuple
 
 
 def parse_ph_range(ph_str: str) -> Tuple[float, float]:
@@ -28,6 +30,80 @@ def parse_ph_range(ph_str: str) -> Tuple[float, float]:
     return None, None
 
 
+_INTERVAL = re.compile(r'(-?\d+\.?\d*)\s*(?:[–-]|to)\s*(-?\d+\.?\d*)')
+_NUMBER = re.compile(r'-?\d+\.?\d*')
+
+
+def parse_interval(text: str) -> Tuple[float, float]:
+    """Parse the first interval like '15–22' or '-5 to 10'; a single value gives (v, v)."""
+    if not text:
+        return None, None
+    text = text.replace('−', '-')
+
+    range_match = _INTERVAL.search(text)
+    if range_match:
+        low, high = float(range_match.group(1)), float(range_match.group(2))
+        return min(low, high), max(low, high)
+
+    single_match = _NUMBER.search(text)
+    if single_match:
+        value = float(single_match.group(0))
+        return value, value
+
+    return None, None
+
+
+def parse_temperature_range(temp_str: str) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+    """
+    Parse a temperature range like 'Day: 20–27, Night: 16–18' or '15–18'.
+
+    Returns the (day, night) intervals in °C. Without Day/Night labels the
+    same interval applies to both; missing values are (None, None).
+    """
+    if not temp_str:
+        return (None, None), (None, None)
+
+    labelled = {}
+    for label, low, high in re.findall(
+        r'(day|night)\s*:?\s*(-?\d+\.?\d*)\s*(?:[–-]|to)\s*(-?\d+\.?\d*)',
+        temp_str.replace('−', '-'), re.IGNORECASE,
+    ):
+        labelled[label.lower()] = (float(low), float(high))
+
+    interval = parse_interval(temp_str)
+    return labelled.get('day', interval), labelled.get('night', interval)
+
+
+def parse_humidity_range(humidity_str: str) -> Tuple[float, float]:
+    """
+    Parse a relative humidity range like '60–85% RH; pollination ~70%'.
+
+    Descriptive values such as 'Moderate to high' carry no numbers and
+    return (None, None).
+    """
+    if not humidity_str:
+        return None, None
+    low, high = parse_interval(humidity_str)
+    if low is None or not 0 <= low <= high <= 100:
+        return None, None
+    return low, high
+
+
+def tokenize_features(text: str) -> frozenset:
+    """
+    Split free text like 'Well-drained, fertile loam' into lowercase tokens.
+
+    Hyphenated compounds are kept whole as well as split, so both
+    'well-drained' and 'drained' are features.
+    """
+    words = re.findall(r'[a-z]+(?:-[a-z]+)*', (text or '').lower())
+    tokens = set(words)
+    for word in words:
+        if '-' in word:
+            tokens.update(word.split('-'))
+    return frozenset(tokens)
+
+
 def parse_latitude(lat_str: str) -> float:
     """Parse latitude string like '4.5895°S' or '68°N'."""
     if not lat_str:
@@ -50,6 +126,91 @@ def parse_latitude(lat_str: str) -> float:
     return None
 
 
+# Confidence flags stored next to each parsed numeric region column.
+CONFIDENCE_MEASURED = 'measured'
+CONFIDENCE_APPROXIMATE = 'approximate'
+CONFIDENCE_QUALITATIVE = 'qualitative'
+CONFIDENCE_MISSING = 'missing'
+
+_MISSING_MARKERS = re.compile(r'unknown|not found|not directly measured|n/a', re.IGNORECASE)
+
+
+def _normalize_numeric_text(text: str, signed: bool = True) -> str:
+    """Strip whitespace and quotes and, if signed, replace the Unicode minus sign."""
+    text = text.strip().strip('“”"').strip()
+    return text.replace('−', '-') if signed else text
+
+
+def parse_measurement(value_str: str, signed: bool = True) -> Tuple[float, str]:
+    """
+    Parse a measurement string like '2.0', '−4501' or '0.4 (Rocknest)'.
+
+    Returns the numeric value (or None) and a confidence flag. Plain numbers
+    are 'measured', numbers with extra annotations are 'approximate', values
+    such as '(unknown)' are 'missing' and purely descriptive values such as
+    'High (alkaline)' are 'qualitative'.
+
+    Quantities that cannot be negative, such as pH or weight percents, pass
+    signed=False: a Unicode minus there is read as a dash, not a sign, so
+    '−0.4' is an approximate 0.4 as it always was for match scoring.
+    """
+    if not value_str or not value_str.strip():
+        return None, CONFIDENCE_MISSING
+
+    value_str = _normalize_numeric_text(value_str, signed)
+
+    try:
+        value = float(value_str)
+        if math.isfinite(value):
+            return value, CONFIDENCE_MEASURED
+    except ValueError:
+        pass
+
+    numeric_match = re.search(r'(-?\d+\.?\d*)', value_str)
+    if numeric_match:
+        return float(numeric_match.group(1)), CONFIDENCE_APPROXIMATE
+
+    if _MISSING_MARKERS.search(value_str):
+        return None, CONFIDENCE_MISSING
+    return None, CONFIDENCE_QUALITATIVE
+
+
+def parse_coordinate(coord_str: str, hemispheres: str = 'NS') -> Tuple[float, str]:
+    """
+    Parse a coordinate string like '4.5895°S' or '137.4417°E'.
+
+    hemispheres gives the positive and negative hemisphere letters, 'NS' for
+    latitude and 'EW' for longitude. Returns the signed value in degrees and
+    a confidence flag as for parse_measurement.
+    """
+    if not coord_str or not coord_str.strip():
+        return None, CONFIDENCE_MISSING
+
+    coord_str = _normalize_numeric_text(coord_str)
+    positive, negative = hemispheres
+
+    pattern = r'(\d+\.?\d*)°\s*([%s%s])' % (positive, negative)
+    match = re.search(pattern, coord_str)
+    if match:
+        value = float(match.group(1))
+        if match.group(2) == negative:
+            value = -value
+        exact = match.group(0) == coord_str
+        return value, CONFIDENCE_MEASURED if exact else CONFIDENCE_APPROXIMATE
+
+    return parse_measurement(coord_str)
+
+
+def batched(iterable: Iterable, size: int):
+    """Yield lists of at most size items from iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
 def match_crop_to_regions(crop, regions: List[Dict], top_n: int = 3) -> List[Dict]:
     """
     Match a crop to regions based on compatibility factors.
@@ -62,116 +223,6 @@ def match_crop_to_regions(crop, regions: List[Dict], top_n: int = 3) -> List[Dic
     Returns:
         List of dictionaries with region name and score
     """
-    scores = []
-    
-    # Parse crop requirements
-    crop_ph_min, crop_ph_max = parse_ph_range(crop.preferred_ph_range)
-    crop_soil_texture = (crop.terrain_soil_texture or '').lower()
-    crop_temp_range = (crop.temperature_range_c or '').lower()
-    crop_moisture = (crop.moisture_regime or '').lower()
-    
-    for region in regions:
-        score = 0
-        reasons = []
-        
-        # 1. pH compatibility
-        if region.ph and crop_ph_min is not None and crop_ph_max is not None:
-            region_ph = parse_latitude(region.ph)  # Reusing parser for simplicity
-            if region_ph is None:
-                # Try to extract numeric pH value
-                ph_match = re.search(r'(\d+\.?\d*)', region.ph)
-                if ph_match:
-                    region_ph = float(ph_match.group(1))
-            
-            if region_ph is not None:
-                if crop_ph_min <= region_ph <= crop_ph_max:
-                    score += 3
-                    reasons.append(f"pH compatible ({region_ph:.1f})")
-                else:
-                    score -= 1
-                    reasons.append(f"pH mismatch ({region_ph:.1f})")
-        else:
-            reasons.append("pH data unavailable")
-        
-        # 2. Soil texture compatibility
-        region_terrain = (region.terrain_type or '').lower()
-        if region_terrain and crop_soil_texture:
-            # Check for compatible soil types
-            if 'loam' in crop_soil_texture and 'loam' in region_terrain:
-                score += 2
-                reasons.append("Loam soil match")
-            elif 'sandy' in crop_soil_texture and 'sandy' in region_terrain:
-                score += 2
-                reasons.append("Sandy soil match")
-            elif 'well-drained' in crop_soil_texture and 'drained' in region_terrain:
-                score += 1
-                reasons.append("Drainage compatibility")
-        
-        # 3. Temperature feasibility based on latitude
-        region_lat = parse_latitude(region.latitude_deg)
-        if region_lat is not None:
-            # Equatorial regions (good for most crops)
-            if -15 <= region_lat <= 15:
-                score += 2
-                reasons.append("Equatorial climate")
-            # Mid-latitude regions
-            elif -40 <= region_lat <= 40:
-                score += 1
-                reasons.append("Moderate climate")
-            # Polar regions (challenging)
-            else:
-                score -= 1
-                reasons.append("Polar climate")
-        
-        # 4. Perchlorate penalty
-        if region.perchlorate_wt_pct:
-            try:
-                perchlorate = float(region.perchlorate_wt_pct)
-                if perchlorate > 0.5:
-                    score -= 3
-                    reasons.append(f"High perchlorate ({perchlorate}%)")
-                elif perchlorate > 0.3:
-                    score -= 1
-                    reasons.append(f"Moderate perchlorate ({perchlorate}%)")
-                else:
-                    score += 1
-                    reasons.append(f"Low perchlorate ({perchlorate}%)")
-            except (ValueError, TypeError):
-                reasons.append("Perchlorate data unclear")
-        
-        # 5. Water availability bonus
-        if region.water_release_wt_pct:
-            try:
-                water = float(region.water_release_wt_pct)
-                if water > 1.5:
-                    score += 2
-                    reasons.append(f"Good water availability ({water}%)")
-                elif water > 1.0:
-                    score += 1
-                    reasons.append(f"Moderate water ({water}%)")
-            except (ValueError, TypeError):
-                pass
-        
-        # 6. Special considerations
-        region_notes = (region.notes or '').lower()
-        if 'ice' in region_notes and 'moisture' in crop_moisture:
-            score += 1
-            reasons.append("Water ice potential")
-        
-        if 'dust' in region_notes:
-            score -= 1
-            reasons.append("Dust challenges")
-        
-        scores.append({
-            'region': region.region,
-            'score': score,
-            'reasons': reasons,
-            'latitude': region_lat,
-            'perchlorate': region.perchlorate_wt_pct,
-            'ph': region.ph,
-            'terrain': region.terrain_type
-        })
-    
-    # Sort by score (descending) and return top_n
-    sorted_scores = sorted(scores, key=lambda x: x['score'], reverse=True)
-    return sorted_scores[:top_n]
+    from .scoring import RegionColumns
+
+    return RegionColumns.from_regions(regions).match(crop, top_n)
@@ -1,9 +1,26 @@
+import math
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from django.http import JsonResponse
-from .models import MarsCrop, MarsRegion
-from .utils import match_crop_to_regions
+from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from .models import MarsCrop, MarsRegion, MarsSite
+from . import parallel, suitability
+from .cache import make_etag, match_cache
+from .climate import energy_matches, region_year
+from .logistics import get_logistics_matrix
+from .metrics import span
+from .pagination import CROP_FIELDS, REGION_FIELDS, list_records, paginate_records, parse_fields, parse_limit, stream_records
+from .repository import get_repository, repository_stats
+from .ruleset import available_profiles
+from .scoring import get_region_columns, get_rules
+from .search import crop_not_found, get_crop_index, resolve_crop
+from .sites import site_store
+from .spatial import get_region_index
+from .tiles import tile_cache, valid_tile
+from .uncertainty import CONFIDENCE_LEVEL, DEFAULT_SAMPLES, MAX_SAMPLES, get_uncertain_regions
 import json
 import os
 
@@ -12,52 +29,13 @@ class MarsSiteViewSet(viewsets.ViewSet):
     """
     ViewSet for Mars exploration sites data.
     """
-    queryset = None  # Using custom actions, not standard CRUD
+    queryset = MarsSite.objects.all()
     
     @action(detail=False, methods=['get'])
     def list_sites(self, request):
         """Return all Mars exploration sites."""
         try:
-            # Load data from JSON file (you can replace this with database queries later)
-            data = [
-                {
-                    "id": "SIM-001",
-                    "name": "Gale Crater Base (Curiosity Site)",
-                    "location": "Near Equatorial/Ancient Lake Bed",
-                    "lat": -4.5895,
-                    "lon": 137.4417,
-                    "simulator_parameters": {
-                        "regolith_type": "Fine-Grained Sedimentary",
-                        "water_availability": "Moderate (Requires Drilling/Extraction)",
-                        "perchlorate_level": "High",
-                        "required_pretreatment": "Intensive Regolith Washing/Heating",
-                        "required_nutrient_additions": [
-                            {"nutrient": "Reactive Nitrogen", "priority": "Critical"},
-                            {"nutrient": "Potassium", "priority": "Low"}
-                        ],
-                        "hazards": ["Perchlorate Toxicity", "Nanophase Iron Oxide"]
-                    }
-                },
-                {
-                    "id": "SIM-002",
-                    "name": "Utopia Planitia Base (Subsurface Ice)",
-                    "location": "Northern Mid-Latitudes/Vast Plain",
-                    "lat": 46.7,
-                    "lon": 117.6,
-                    "simulator_parameters": {
-                        "regolith_type": "Volcanic/Basaltic",
-                        "water_availability": "High (Subsurface Ice Deposit)",
-                        "perchlorate_level": "Variable (Moderate)",
-                        "required_pretreatment": "Moderate Washing",
-                        "required_nutrient_additions": [
-                            {"nutrient": "Reactive Nitrogen", "priority": "Critical"},
-                            {"nutrient": "Organic Carbon", "priority": "High"}
-                        ],
-                        "hazards": ["Seasonal Dust Storms", "Potential Hexavalent Chromium ($Cr^{6+}$)"]
-                    }
-                }
-            ]
-            return Response(data, status=status.HTTP_200_OK)
+            return HttpResponse(site_store.list_body(), content_type='application/json')
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
@@ -65,49 +43,9 @@ class MarsSiteViewSet(viewsets.ViewSet):
     def get_site(self, request, pk=None):
         """Return specific Mars exploration site by ID."""
         try:
-            # This would typically query a database
-            sites = [
-                {
-                    "id": "SIM-001",
-                    "name": "Gale Crater Base (Curiosity Site)",
-                    "location": "Near Equatorial/Ancient Lake Bed",
-                    "lat": -4.5895,
-                    "lon": 137.4417,
-                    "simulator_parameters": {
-                        "regolith_type": "Fine-Grained Sedimentary",
-                        "water_availability": "Moderate (Requires Drilling/Extraction)",
-                        "perchlorate_level": "High",
-                        "required_pretreatment": "Intensive Regolith Washing/Heating",
-                        "required_nutrient_additions": [
-                            {"nutrient": "Reactive Nitrogen", "priority": "Critical"},
-                            {"nutrient": "Potassium", "priority": "Low"}
-                        ],
-                        "hazards": ["Perchlorate Toxicity", "Nanophase Iron Oxide"]
-                    }
-                },
-                {
-                    "id": "SIM-002",
-                    "name": "Utopia Planitia Base (Subsurface Ice)",
-                    "location": "Northern Mid-Latitudes/Vast Plain",
-                    "lat": 46.7,
-                    "lon": 117.6,
-                    "simulator_parameters": {
-                        "regolith_type": "Volcanic/Basaltic",
-                        "water_availability": "High (Subsurface Ice Deposit)",
-                        "perchlorate_level": "Variable (Moderate)",
-                        "required_pretreatment": "Moderate Washing",
-                        "required_nutrient_additions": [
-                            {"nutrient": "Reactive Nitrogen", "priority": "Critical"},
-                            {"nutrient": "Organic Carbon", "priority": "High"}
-                        ],
-                        "hazards": ["Seasonal Dust Storms", "Potential Hexavalent Chromium ($Cr^{6+}$)"]
-                    }
-                }
-            ]
-            
-            site = next((s for s in sites if s['id'] == pk), None)
-            if site:
-                return Response(site, status=status.HTTP_200_OK)
+            body = site_store.get_body(pk)
+            if body is not None:
+                return HttpResponse(body, content_type='application/json')
             else:
                 return Response({'error': 'Site not found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -122,62 +60,236 @@ class MarsCropViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'])
     def list_crops(self, request):
-        """Return all Mars crops."""
-        try:
-            crops = MarsCrop.objects.all()
-            crop_data = []
-            for crop in crops:
-                crop_data.append({
-                    'id': crop.id,
-                    'name': crop.crop,
-                    'germination': crop.germination_on_mars_simulant,
-                    'biomass': crop.biomass,
-                    'flowered_seed': crop.flowered_seed,
-                    'notes': crop.notes,
-                    'preferred_ph_range': crop.preferred_ph_range,
-                    'soil_texture': crop.terrain_soil_texture,
-                    'temperature_range': crop.temperature_range_c,
-                    'humidity_range': crop.humidity_rh_range,
-                    'moisture_regime': crop.moisture_regime
-                })
-            return Response(crop_data, status=status.HTTP_200_OK)
+        """
+        Return Mars crops.
+        
+        Supports ?fields= projection, keyset pagination with ?limit= and
+        ?cursor=, and ?stream=json|ndjson for incremental output.
+        """
+        return list_response(request, get_repository().crops, CROP_FIELDS)
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Autocomplete crop names.
+        
+        Matches names, common and scientific aliases by prefix, substring
+        and trigram similarity; ?limit= caps the results (default 10).
+        """
+        query = request.GET.get('q', '')
+        try:
+            limit = int(request.GET.get('limit', 10))
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            return Response({'error': 'limit must be a non-negative integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            with span('search'):
+                results = get_crop_index().search(query, limit)
+            return Response({'query': query, 'results': results}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     @action(detail=False, methods=['get'])
     def match_crop(self, request):
-        """Match a crop to best regions."""
+        """
+        Match a crop to best regions.
+        
+        ?profile=a,b scores with the named rule sets from api/rules and adds
+        each profile's matches under "profiles"; top_matches then holds the
+        first profile's matches. For an unknown profile the 400 body lists
+        the available ones.
+        
+        ?uncertainty=mc&samples=N ranks regions by their mean score over N
+        Monte Carlo draws of their uncertain measurements and adds the score
+        interval and rank stability of each match; ?seed= picks the draws.
+        
+        ?rank=energy breaks ties between equal scores by the annual
+        greenhouse heating the crop needs in each region, and adds that
+        region's heating and temperatures under "greenhouse".
+        
+        The crop must be named exactly, by an alias or by a prefix only one
+        crop shares; otherwise the 404 body lists suggestions.
+        """
         crop_name = request.GET.get('crop')
-        top_n = int(request.GET.get('top_n', 3))
+        try:
+            top_n = int(request.GET.get('top_n', 3))
+        except ValueError:
+            top_n = -1
         
         if not crop_name:
             return Response({'error': 'Crop name required'}, status=status.HTTP_400_BAD_REQUEST)
-        
+        if top_n < 0:
+            return Response({'error': 'top_n must be a non-negative integer'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            # Find the crop
-            crop = MarsCrop.objects.filter(crop__icontains=crop_name).first()
-            if not crop:
-                return Response({'error': f'Crop "{crop_name}" not found'}, status=status.HTTP_404_NOT_FOUND)
+            profile_names = [name.strip() for name in request.GET.get('profile', '').split(',') if name.strip()]
+            profiles = [get_rules(name) for name in dict.fromkeys(profile_names)]
+            default_rules = get_rules()
+        except ValueError as e:
+            return Response(
+                {'error': str(e), 'available_profiles': available_profiles()},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        
+        uncertainty = request.GET.get('uncertainty')
+        samples, seed = DEFAULT_SAMPLES, 0
+        if uncertainty is not None:
+            if uncertainty != 'mc':
+                return Response({'error': 'uncertainty must be "mc"'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                samples = int(request.GET.get('samples', DEFAULT_SAMPLES))
+                seed = int(request.GET.get('seed', 0))
+            except ValueError:
+                samples = seed = -1
+            if not 1 <= samples <= MAX_SAMPLES:
+                return Response({'error': f'samples must be an integer from 1 to {MAX_SAMPLES}'}, status=status.HTTP_400_BAD_REQUEST)
+            if seed < 0:
+                return Response({'error': 'seed must be a non-negative integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rank = request.GET.get('rank')
+        if rank is not None and rank != 'energy':
+            return Response({'error': 'rank must be "energy"'}, status=status.HTTP_400_BAD_REQUEST)
+        if rank and uncertainty:
+            return Response({'error': 'rank=energy cannot be combined with uncertainty'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Without profiles the default rules' digest keys the entry, so an
+        # edit of api/rules/default.json is not served from the cache
+        key = match_cache.key(
+            ' '.join(crop_name.lower().split()), top_n,
+            *((rules.digest for rules in profiles) if profiles else ('default', default_rules.digest)),
+            *((uncertainty, samples, seed) if uncertainty else ()),
+            *((rank,) if rank else ()),
+        )
+        cached = match_cache.get(key)
+        if cached is None:
+            try:
+                # Find the crop
+                with span('lookup'):
+                    crop = resolve_crop(crop_name)
+                if not crop:
+                    return Response(crop_not_found(crop_name), status=status.HTTP_404_NOT_FOUND)
+                
+                with span('score'):
+                    if uncertainty:
+                        regions = get_uncertain_regions()
+                        score = lambda rules: regions.match(crop, top_n, samples, rules, seed)
+                    elif rank:
+                        columns = get_region_columns()
+                        score = lambda rules: energy_matches(columns, crop, top_n, rules)
+                    else:
+                        score = lambda rules: profile_matches(crop, top_n, rules)
+                    if profiles:
+                        by_profile = {rules.name: score(rules) for rules in profiles}
+                        matches = by_profile[profiles[0].name]
+                    else:
+                        matches = score(default_rules)
+                
+                with span('render'):
+                    payload = {
+                        'crop': crop.crop,
+                        'crop_details': crop_details(crop),
+                        'top_matches': matches
+                    }
+                    if profiles:
+                        payload['profiles'] = by_profile
+                    if uncertainty:
+                        payload['uncertainty'] = {
+                            'method': uncertainty,
+                            'samples': samples,
+                            'seed': seed,
+                            'confidence_level': CONFIDENCE_LEVEL,
+                        }
+                    body = JSONRenderer().render(payload)
+            except Exception as e:
+                return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-            # Get all regions
-            regions = list(MarsRegion.objects.all())
+            cached = (make_etag(body), body)
+            match_cache.set(key, cached)
+        
+        etag, body = cached
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return HttpResponseNotModified(headers={'ETag': etag})
+        return HttpResponse(body, content_type='application/json', headers={'ETag': etag})
+    
+    @action(detail=False, methods=['get', 'post'])
+    def match_batch(self, request):
+        """
+        Match several crops to their best regions in one request.
+        
+        Crops are given as a comma-separated ?crops= list or a JSON body,
+        either {"crops": [...], "top_n": 3} or a bare list of names; "all"
+        matches every crop. All crops are scored against one shared set of
+        region columns. Names that do not resolve are listed in not_found,
+        with the closest crop names under suggestions.
+        """
+        if request.method == 'POST':
+            if isinstance(request.data, list):
+                crop_names, top_n = request.data, 3
+            elif isinstance(request.data, dict):
+                crop_names = request.data.get('crops')
+                top_n = request.data.get('top_n', 3)
+            else:
+                return Response({'error': 'The body must be a JSON object or a list of crops'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            crop_names = request.GET.get('crops')
+            top_n = request.GET.get('top_n', 3)
+        
+        if isinstance(crop_names, str):
+            crop_names = [name.strip() for name in crop_names.split(',') if name.strip()]
+        if not crop_names or not isinstance(crop_names, list):
+            return Response({'error': 'A list of crops (or "all") is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            top_n = int(top_n)
+        except (TypeError, ValueError):
+            top_n = -1
+        if top_n < 0:
+            return Response({'error': 'top_n must be a non-negative integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            if [str(name).lower() for name in crop_names] == ['all']:
+                selected = [(crop.crop, crop) for crop in get_repository().crops]
+            else:
+                # Same resolution as match_crop
+                index = get_crop_index()
+                selected = [(str(name), index.resolve(str(name))) for name in crop_names]
             
-            # Run matching algorithm
-            matches = match_crop_to_regions(crop, regions, top_n)
+            results = []
+            not_found = []
+            suggestions = {}
+            with span('score'):
+                for query, crop in selected:
+                    if crop is None:
+                        not_found.append(query)
+                        suggestions[query] = index.suggest(query)
+                        continue
+                    results.append({
+                        'query': query,
+                        'crop': crop.crop,
+                        'crop_details': crop_details(crop),
+                        'top_matches': parallel.match_regions(crop, top_n)
+                    })
             
             return Response({
-                'crop': crop.crop,
-                'crop_details': {
-                    'preferred_ph_range': crop.preferred_ph_range,
-                    'soil_texture': crop.terrain_soil_texture,
-                    'temperature_range': crop.temperature_range_c,
-                    'moisture_regime': crop.moisture_regime
-                },
-                'top_matches': matches
+                'top_n': top_n,
+                'results': results,
+                'not_found': not_found,
+                'suggestions': suggestions
             }, status=status.HTTP_200_OK)
-            
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """
+        Return hit/miss/eviction counters of the match_crop response cache.
+        
+        "repository" holds the data version and row counts of the in-process
+        data repository, or null while none is loaded.
+        """
+        stats = match_cache.stats()
+        stats['repository'] = repository_stats()
+        return Response(stats, status=status.HTTP_200_OK)
 
 
 class MarsRegionViewSet(viewsets.ViewSet):
@@ -188,24 +300,258 @@ class MarsRegionViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'])
     def list_regions(self, request):
-        """Return all Mars regions."""
+        """
+        Return Mars regions.
+        
+        Supports ?fields= projection, keyset pagination with ?limit= and
+        ?cursor=, and ?stream=json|ndjson for incremental output.
+        """
+        return list_response(request, get_repository().regions, REGION_FIELDS)
+    
+    @action(detail=False, methods=['get'])
+    def within_bbox(self, request):
+        """Return regions inside a latitude/longitude bounding box."""
+        try:
+            min_lat = float(request.GET['min_lat'])
+            max_lat = float(request.GET['max_lat'])
+            min_lon = float(request.GET['min_lon'])
+            max_lon = float(request.GET['max_lon'])
+        except (KeyError, ValueError):
+            min_lat = max_lat = min_lon = max_lon = math.nan
+        if not all(math.isfinite(value) for value in (min_lat, max_lat, min_lon, max_lon)):
+            return Response(
+                {'error': 'min_lat, max_lat, min_lon and max_lon are required finite numbers'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        
+        try:
+            with span('index'):
+                ids = get_region_index().within_bbox(min_lat, max_lat, min_lon, max_lon)
+            regions = get_repository().regions.in_order(ids.tolist())
+            region_data = [serialize_region(region) for region in regions]
+            return Response(region_data, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'])
+    def near(self, request):
+        """
+        Return regions within radius_km of a location, nearest first.
+        
+        lat must be within ±90°, radius_km and the optional limit must not
+        be negative.
+        """
+        try:
+            lat = float(request.GET['lat'])
+            lon = float(request.GET['lon'])
+            radius_km = float(request.GET['radius_km'])
+        except (KeyError, ValueError):
+            lat = lon = radius_km = math.nan
+        if not (all(math.isfinite(value) for value in (lat, lon, radius_km))
+                and -90 <= lat <= 90 and radius_km >= 0):
+            return Response(
+                {'error': 'lat (from -90 to 90), lon and radius_km (not negative) are required finite numbers'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         try:
-            regions = MarsRegion.objects.all()
+            limit = request.GET.get('limit')
+            limit = int(limit) if limit is not None else None
+        except ValueError:
+            limit = -1
+        if limit is not None and limit < 0:
+            return Response({'error': 'limit must be a non-negative integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            with span('index'):
+                ids, distances = get_region_index().near(lat, lon, radius_km, limit)
+            regions = get_repository().regions
             region_data = []
-            for region in regions:
-                region_data.append({
-                    'id': region.id,
-                    'name': region.region,
-                    'latitude': region.latitude_deg,
-                    'longitude': region.longitude_deg,
-                    'elevation': region.elevation_m,
-                    'perchlorate_wt_pct': region.perchlorate_wt_pct,
-                    'water_release_wt_pct': region.water_release_wt_pct,
-                    'ph': region.ph,
-                    'major_minerals': region.major_minerals,
-                    'terrain_type': region.terrain_type,
-                    'notes': region.notes
-                })
+            for pk, distance in zip(ids.tolist(), distances.tolist()):
+                region = regions.get(pk)
+                if region is not None:
+                    region_data.append({**serialize_region(region), 'distance_km': distance})
             return Response(region_data, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'])
+    def logistics(self, request):
+        """
+        Rank regions by traverse cost from a site or depot.
+        
+        ?from= takes a site or depot id, or a "lat,lon" location with a
+        latitude within ±90°; ?limit= (default 10) and ?max_km= bound the
+        results. Costs are in equivalent flat kilometres, penalising climbs
+        more than descents.
+        """
+        origin = request.GET.get('from', '').strip()
+        try:
+            limit = int(request.GET.get('limit', 10))
+            max_km = request.GET.get('max_km')
+            max_km = float(max_km) if max_km is not None else None
+        except ValueError:
+            limit = -1
+        if not origin:
+            return Response({'error': 'from is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 0 or (max_km is not None and not math.isfinite(max_km)):
+            return Response({'error': 'limit must be a non-negative integer and max_km a finite number'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            with span('index'):
+                matrix = get_logistics_matrix()
+            with span('score'):
+                index = matrix.origin_index(origin)
+                if index is not None:
+                    source = matrix.origin(index)
+                    results = matrix.route(index, limit, max_km)
+                else:
+                    try:
+                        lat, lon = (float(part) for part in origin.split(','))
+                    except ValueError:
+                        return Response({'error': f'Origin "{origin}" not found'}, status=status.HTTP_404_NOT_FOUND)
+                    if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90):
+                        return Response({'error': 'from must be a latitude from -90 to 90 and a longitude'}, status=status.HTTP_400_BAD_REQUEST)
+                    source = {'id': None, 'name': None, 'kind': 'location', 'lat': lat, 'lon': lon}
+                    results = matrix.route_from_point(lat, lon, limit=limit, max_km=max_km)
+            
+            regions = get_repository().regions
+            ranked = []
+            for result in results:
+                region = regions.get(result.pop('region_id'))
+                if region is not None:
+                    ranked.append({**serialize_region(region), **result})
+            return Response({'from': source, 'results': ranked}, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'])
+    def climate(self, request):
+        """
+        Simulate a region's surface climate over a Mars year.
+        
+        ?region= takes a region id; with ?crop= the response also holds the
+        greenhouse heating in kWh/m² that crop needs on every sol.
+        """
+        try:
+            region_id = int(request.GET['region'])
+        except (KeyError, ValueError):
+            return Response({'error': 'region must be a region id'}, status=status.HTTP_400_BAD_REQUEST)
+        crop_name = request.GET.get('crop')
+        
+        try:
+            region = get_repository().regions.get(region_id)
+            if region is None:
+                return Response({'error': 'Region not found'}, status=status.HTTP_404_NOT_FOUND)
+            crop = None
+            if crop_name:
+                crop = resolve_crop(crop_name)
+                if not crop:
+                    return Response(crop_not_found(crop_name), status=status.HTTP_404_NOT_FOUND)
+            
+            with span('simulate'):
+                year = region_year(region, crop)
+            if year is None:
+                return Response({'error': 'Region has no latitude to simulate'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'region': serialize_region(region),
+                'crop': crop.crop if crop else None,
+                **year,
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def list_response(request, table, field_map):
+    """Serve a repository table as a full list, one keyset page or a stream."""
+    try:
+        fields = parse_fields(request.GET.get('fields'), field_map)
+        output = request.GET.get('stream')
+        if output is not None and output not in ('json', 'ndjson'):
+            raise ValueError('stream must be "json" or "ndjson"')
+        paginated = 'limit' in request.GET or 'cursor' in request.GET
+        limit = parse_limit(request.GET.get('limit')) if paginated else None
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        if output is not None:
+            content_type = 'application/x-ndjson' if output == 'ndjson' else 'application/json'
+            return StreamingHttpResponse(
+                stream_records(table, field_map, fields, output),
+                content_type=content_type,
+            )
+        
+        if paginated:
+            results, next_cursor = paginate_records(
+                table, field_map, fields, limit, request.GET.get('cursor'),
+            )
+            return Response({'results': results, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+        
+        return Response(list_records(table, field_map, fields), status=status.HTTP_200_OK)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def profile_matches(crop, top_n, rules):
+    """Top matches of a crop under one rule set."""
+    if rules is not get_rules():
+        return get_region_columns().match(crop, top_n, rules)
+    
+    # Look up the precomputed matrix, scoring live until it is built
+    matches = suitability.top_matches(crop, top_n, rules)
+    if matches is None and parallel.ENABLED:
+        matches = parallel.match_regions(crop, top_n, rules)
+    elif matches is None:
+        matches = get_region_columns().match(crop, top_n, rules)
+    return matches
+
+
+def crop_details(crop):
+    """Return the growing requirements of a crop shown with its matches."""
+    return {
+        'preferred_ph_range': crop.preferred_ph_range,
+        'soil_texture': crop.terrain_soil_texture,
+        'temperature_range': crop.temperature_range_c,
+        'moisture_regime': crop.moisture_regime
+    }
+
+
+def serialize_region(region):
+    """Return the API representation of a MarsRegion."""
+    return {
+        'id': region.id,
+        'name': region.region,
+        'latitude': region.latitude_deg,
+        'longitude': region.longitude_deg,
+        'elevation': region.elevation_m,
+        'perchlorate_wt_pct': region.perchlorate_wt_pct,
+        'water_release_wt_pct': region.water_release_wt_pct,
+        'ph': region.ph,
+        'major_minerals': region.major_minerals,
+        'terrain_type': region.terrain_type,
+        'notes': region.notes
+    }
+
+
+def suitability_tile(request, crop, z, x, y):
+    """Serve a z/x/y PNG tile of a crop's suitability for the map."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not valid_tile(z, x, y):
+        return JsonResponse({'error': 'Tile out of range'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        match = resolve_crop(crop)
+        if not match:
+            return JsonResponse(crop_not_found(crop), status=status.HTTP_404_NOT_FOUND)
+        with span('tile'):
+            body = tile_cache.get(match, z, x, y)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    etag = make_etag(body)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return HttpResponseNotModified(headers={'ETag': etag})
+    return HttpResponse(body, content_type='image/png', headers={'ETag': etag})
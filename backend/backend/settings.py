@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.TimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -116,3 +117,96 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+# The reference data version is persisted in the database (api.DataVersion)
+# and cached per process for CACHE_SECONDS, the longest a bump made by
+# another process (e.g. load_csv_data) can take to invalidate local caches.
+DATA_VERSION = {
+    'CACHE_SECONDS': 5,
+}
+
+# Response cache for crops/match_crop. BACKEND optionally names an entry in
+# CACHES (e.g. a FileBasedCache) used as a second tier behind the in-process LRU.
+MATCH_CACHE = {
+    'MAX_ENTRIES': 256,
+    'BACKEND': None,
+    'TIMEOUT': 3600,
+}
+
+# Maximum number of concurrent CPU-bound scoring jobs for the async API views
+ASYNC_SCORING_WORKERS = 4
+
+# Sharded multi-process scoring for very large region tables. When enabled,
+# tables with at least MIN_REGIONS rows are split into SHARD_SIZE-row shards
+# scored by WORKERS processes (default: one per CPU) over shared memory.
+# Workers are spawned, not forked, as forking a threaded server can deadlock.
+PARALLEL_SCORING = {
+    'ENABLED': False,
+    'WORKERS': None,
+    'SHARD_SIZE': 500000,
+    'MIN_REGIONS': 200000,
+    'START_METHOD': 'spawn',
+}
+
+# Request timing (api.metrics). A PROFILE_SAMPLE_RATE fraction of requests is
+# run under cProfile; profiles of requests slower than PROFILE_SLOW_MS are
+# logged, and saved as .prof files when PROFILE_DIR is set.
+REQUEST_METRICS = {
+    'SERVER_TIMING': True,
+    'PROFILE_SAMPLE_RATE': 0.0,
+    'PROFILE_SLOW_MS': 500,
+    'PROFILE_DIR': None,
+}
+
+# Directory holding tiled raster layers written by the ingest_raster command
+RASTER_ROOT = BASE_DIR / 'data' / 'rasters'
+
+# Suitability map tiles: an in-process LRU of MAX_ENTRIES PNGs in front of
+# a directory of rendered tiles. Both are keyed by the data version; the
+# directory keeps the tiles of the KEEP_VERSIONS newest versions.
+TILE_CACHE = {
+    'MAX_ENTRIES': 1024,
+    'DIR': BASE_DIR / 'data' / 'tile_cache',
+    'KEEP_VERSIONS': 2,
+}
+
+# Traverse cost model (api.logistics). Costs are in equivalent flat km: each
+# km climbed adds CLIMB_PENALTY km, each km descended DESCENT_PENALTY km.
+# DEPOTS adds landing zones to the exploration sites, e.g.
+# {'id': 'DEPOT-1', 'name': 'Jezero supply depot', 'lat': 18.4, 'lon': 77.5}
+LOGISTICS = {
+    'CLIMB_PENALTY': 10.0,
+    'DESCENT_PENALTY': 2.0,
+    'ELEVATION_RADIUS_KM': 100.0,
+    'DEPOTS': [],
+}
+
+# Monte Carlo scoring for crops/match_crop?uncertainty=mc (api.uncertainty).
+# Approximate values are drawn from a normal with APPROXIMATE_SIGMA around
+# the parsed value; CHUNK_ELEMENTS sampled values are scored per block.
+UNCERTAINTY = {
+    'DEFAULT_SAMPLES': 1000,
+    'MAX_SAMPLES': 10000,
+    'CHUNK_ELEMENTS': 262144,
+    'CONFIDENCE_LEVEL': 0.95,
+    'APPROXIMATE_SIGMA': {'ph': 0.5, 'latitude': 2.0, 'perchlorate': 0.15, 'water': 0.5},
+}
+
+# Seasonal climate and greenhouse heating (api.climate), used by
+# regions/climate and crops/match_crop?rank=energy. OPTICAL_DEPTH is the
+# extinction of total sunlight at the elevation datum; U_VALUE is the
+# envelope loss in W/(m²·K) per m² of growing area.
+CLIMATE = {
+    'OPTICAL_DEPTH': 0.2,
+    'ALBEDO': 0.25,
+    'U_VALUE': 2.0,
+    'GLAZING_TRANSMITTANCE': 0.6,
+}
+
+# Memory-mapped snapshot of regions and crops written by build_snapshot (and
+# refreshed by load_csv_data once it exists). Workers use it while it
+# matches the database instead of loading every row through the ORM.
+SNAPSHOT = {
+    'ENABLED': True,
+    'DIR': BASE_DIR / 'data' / 'snapshot',
+}